@@ -0,0 +1,96 @@
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from dotenv import load_dotenv
+from langchain.agents import AgentExecutor, create_react_agent
+from langchain.prompts import PromptTemplate
+from langchain.tools import Tool
+from langchain.tools.render import render_text_description
+
+load_dotenv()
+
+class AgentRuntime:
+    """
+    Process-wide holder of the expensive, reusable parts of the ReAct agent.
+
+    The tools list, the ChatOpenAI client (and its pooled HTTP connections), the rendered
+    prompt and the agent runnable are built once per configuration and shared by every request.
+    Each request only gets a fresh AgentExecutor wrapping the shared agent, which is cheap.
+
+    The configuration key is (model name, tool names, prompt template), with the tool names taken from
+    a fresh build_tools() call on every request. When it changes, for instance after reload() picks up a
+    new .env or build_tools returns a different set, the next call to get_executor() rebuilds everything.
+
+    `create_agent` and `executor_class` let a runtime build a different agent flavour from the same
+    parts, e.g. the parallel-tools agent of backend/parallel_agent.py.
+    """
+    def __init__(self, template: str, build_tools: Callable[[], List[Tool]], executor_kwargs: Optional[Dict[str, Any]] = None,
+                 create_agent: Callable = create_react_agent, executor_class: Type[AgentExecutor] = AgentExecutor):
+        self.template = template
+        self.build_tools = build_tools
+        self.executor_kwargs = executor_kwargs or {}
+        self.create_agent = create_agent
+        self.executor_class = executor_class
+        self._lock = threading.Lock()
+        self._key = None
+        self._tools = None
+        self._llm = None
+        self._agent = None
+        self.build_count = 0
+
+    def _config_key(self, tools: List[Tool]) -> Tuple:
+        return (os.getenv("OPENAI_MODEL_NAME"), tuple(t.name for t in tools), self.template)
+
+    def _build(self, tools: List[Tool], key: Tuple):
+        from langchain_openai import ChatOpenAI
+        llm = ChatOpenAI(temperature=0, model_name=os.getenv("OPENAI_MODEL_NAME"), stop=["\nObservation"], streaming=True)
+        prompt = PromptTemplate.from_template(template=self.template).partial(
+            tools=render_text_description(tools),
+            tool_names=", ".join([t.name for t in tools])
+        )
+        agent = self.create_agent(llm=llm, tools=tools, prompt=prompt)
+
+        self._tools = tools
+        self._llm = llm
+        self._agent = agent
+        self._key = key
+        self.build_count += 1
+
+    def get_agent(self):
+        """
+        Returns the shared (agent, tools) pair, building it first if needed.
+        """
+        tools = self.build_tools()
+        key = self._config_key(tools)
+        with self._lock:
+            # Read under the lock, so the runtime and its key are seen as one consistent pair.
+            if self._agent is None or self._key != key:
+                self._build(tools, key)
+            return self._agent, self._tools
+
+    def get_executor(self, **kwargs) -> AgentExecutor:
+        """
+        Returns a new AgentExecutor bound to the shared agent and tools.
+
+        Keyword arguments override the default executor settings for this request only.
+        """
+        agent, tools = self.get_agent()
+        executor_kwargs = {**self.executor_kwargs, **kwargs}
+        return self.executor_class(agent=agent, tools=tools, **executor_kwargs)
+
+    def invalidate(self):
+        """
+        Drops the cached agent so the next request rebuilds it.
+        """
+        with self._lock:
+            self._key = None
+            self._tools = None
+            self._llm = None
+            self._agent = None
+
+    def reload(self):
+        """
+        Re-reads the .env file (overriding the current environment) and invalidates the cached agent.
+        """
+        load_dotenv(override=True)
+        self.invalidate()
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+from tools.vdb_registry import index_generation, vdb_registry
+
+load_dotenv()
+
+# Tools whose observations only depend on the indexed content. An answer is cached only when
+# every tool used to produce it is in this set: anything touching the shell, the file system,
+# the Python REPL or the clock is never served from the cache.
+CACHEABLE_TOOLS = {"retrieve_context_info"}
+
+class SemanticAnswerCache:
+    """
+    Opt-in cache of final answers looked up by semantic similarity of the question.
+
+    An entry is reused when the new question's embedding has cosine similarity >= `threshold`
+    with a cached question asked in the same scope (endpoint name + hash of the last
+    `history_turns` chat history messages), it is younger than `ttl` seconds, and no index has
+    been re-ingested since it was stored (see tools.vdb_registry.bump_index_generation).
+    """
+    def __init__(self, enabled: bool = False, threshold: float = 0.95, ttl: Optional[float] = 3600,
+                 max_entries: int = 1024, history_turns: int = 2, embeddings=None):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.history_turns = history_turns
+        self.embeddings = embeddings
+        self._lock = threading.Lock()
+        self._entries = []
+        self._generation = index_generation()
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_env(cls) -> "SemanticAnswerCache":
+        ttl = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+        return cls(
+            enabled=os.getenv("ANSWER_CACHE_ENABLED", "false").lower() in ("1", "true", "yes"),
+            threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+            ttl=ttl or None,
+            max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "1024")),
+            history_turns=int(os.getenv("ANSWER_CACHE_HISTORY_TURNS", "2"))
+        )
+
+    def _embed(self, question: str) -> np.ndarray:
+        embeddings = self.embeddings or vdb_registry.get_embeddings()
+        vector = np.asarray(embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _scope(self, endpoint: str, chat_history: List[Any]) -> str:
+        recent = chat_history[-self.history_turns:] if self.history_turns else []
+        digest = hashlib.sha1(endpoint.encode("utf-8"))
+        for message in recent:
+            digest.update(repr(message).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _drop_stale(self):
+        generation = index_generation()
+        if generation != self._generation:
+            self._entries = []
+            self._generation = generation
+        if self.ttl is not None:
+            now = time.time()
+            self._entries = [entry for entry in self._entries if now - entry["created"] <= self.ttl]
+
+    def lookup(self, endpoint: str, question: str, chat_history: List[Any]) -> Optional[Dict[str, Any]]:
+        """
+        Returns a cached result for a similar enough question, or None.
+        """
+        if not self.enabled:
+            return None
+        vector = self._embed(question)
+        scope = self._scope(endpoint, chat_history)
+        with self._lock:
+            self._drop_stale()
+            candidates = [entry for entry in self._entries if entry["scope"] == scope]
+            if candidates:
+                scores = np.stack([entry["vector"] for entry in candidates]) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self.hits += 1
+                    print(f"Answer cache hit (similarity {scores[best]:.3f})")
+                    return {**candidates[best]["result"], "query": question}
+            self.misses += 1
+        return None
+
+    def store(self, endpoint: str, question: str, chat_history: List[Any], result: Dict[str, Any], tools_used: Iterable[str] = ()):
+        """
+        Caches a result unless caching is disabled or a non-cacheable tool took part in producing it.
+        """
+        if not self.enabled:
+            return
+        if any(tool_name not in CACHEABLE_TOOLS for tool_name in tools_used):
+            with self._lock:
+                self.skipped += 1
+            return
+        entry = {
+            "scope": self._scope(endpoint, chat_history),
+            "vector": self._embed(question),
+            "result": result,
+            "created": time.time()
+        }
+        with self._lock:
+            self._drop_stale()
+            self._entries.append(entry)
+            if len(self._entries) > self.max_entries:
+                self._entries = self._entries[-self.max_entries:]
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = []
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "skipped": self.skipped,
+                "entries": len(self._entries)
+            }
+
+answer_cache = SemanticAnswerCache.from_env()
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+from tools.token_count import count_tokens
+
+load_dotenv()
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+SUMMARY_TEMPLATE = """Progressively summarize the conversation below, adding to the previous summary and returning a new summary.
+Keep names, numbers, decisions, file paths and open questions; drop pleasantries. Use at most {max_tokens} tokens.
+
+Previous summary:
+{summary}
+
+New lines of conversation:
+{new_lines}
+
+New summary:"""
+
+def _as_pair(message: Any) -> Tuple[str, str]:
+    """
+    Accepts the ("human" | "ai", text) tuples the apps store, {"role", "content"} dicts and langchain messages.
+    """
+    if isinstance(message, (tuple, list)):
+        return str(message[0]), str(message[1])
+    if isinstance(message, dict):
+        return str(message.get("role", "human")), str(message.get("content", ""))
+    return str(getattr(message, "type", "human")), str(getattr(message, "content", message))
+
+def _format_lines(messages: Sequence[Any]) -> str:
+    return "\n".join(f"{role}: {text}" for role, text in map(_as_pair, messages))
+
+class ChatHistoryManager:
+    """
+    Keeps the chat history handed to the LLM bounded.
+
+    The most recent messages are kept verbatim, at most `max_turns` human/AI turns and `token_budget` tokens;
+    everything older is folded into a running summary passed as a leading ("system", ...) message.
+
+    Summaries are cached by a hash chain over the folded messages, so when the window moves by one turn
+    only the newly folded messages are summarized, on top of the previous summary. The full history stays
+    with the caller (st.session_state, server sessions); only what goes into the prompt is bounded.
+
+    Parameters:
+        max_turns (int): Verbatim turns kept (HISTORY_MAX_TURNS, default 6).
+        token_budget (int): Tokens of verbatim history kept (HISTORY_TOKEN_BUDGET, default 1500).
+        summary_tokens (int): Target length of the summary (HISTORY_SUMMARY_TOKENS, default 300).
+        summarize (callable): summarize(previous_summary, new_lines) -> str; defaults to the chat model.
+    """
+    def __init__(self, max_turns: Optional[int] = None, token_budget: Optional[int] = None, summary_tokens: Optional[int] = None,
+                 summarize: Optional[Callable[[str, str], str]] = None, cache_size: int = 1024):
+        self.max_turns = max_turns if max_turns is not None else int(os.getenv("HISTORY_MAX_TURNS", "6"))
+        self.token_budget = token_budget if token_budget is not None else int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+        self.summary_tokens = summary_tokens if summary_tokens is not None else int(os.getenv("HISTORY_SUMMARY_TOKENS", "300"))
+        self._summarize = summarize
+        self._chain = None
+        self.cache_size = cache_size
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.summaries_made = 0
+
+    def _summary_chain(self):
+        if self._chain is None:
+            from langchain_core.output_parsers import StrOutputParser
+            from langchain_core.prompts import PromptTemplate
+            from langchain_openai import ChatOpenAI
+            llm = ChatOpenAI(model=os.getenv("OPENAI_MODEL_NAME"), temperature=0, max_tokens=self.summary_tokens * 2)
+            self._chain = PromptTemplate.from_template(SUMMARY_TEMPLATE) | llm | StrOutputParser()
+        return self._chain
+
+    def split(self, chat_history: Sequence[Any]) -> int:
+        """
+        Index of the first message kept verbatim: everything before it gets summarized.
+        """
+        kept_tokens = 0
+        start = len(chat_history)
+        while start > 0:
+            role, text = _as_pair(chat_history[start - 1])
+            tokens = count_tokens(text) + 4
+            if len(chat_history) - (start - 1) > 2 * self.max_turns or kept_tokens + tokens > self.token_budget:
+                break
+            kept_tokens += tokens
+            start -= 1
+        # Don't keep an AI answer without the question it answers.
+        while start < len(chat_history) and _as_pair(chat_history[start])[0] not in ("human", "user"):
+            start += 1
+        return start
+
+    def _plan(self, chat_history: Sequence[Any]):
+        folded = self.split(chat_history)
+        if folded == 0:
+            return folded, None, None, None
+        keys = []
+        digest = hashlib.sha1()
+        for message in chat_history[:folded]:
+            digest.update(repr(_as_pair(message)).encode("utf-8"))
+            keys.append(digest.hexdigest())
+        with self._lock:
+            for known in range(folded, 0, -1):
+                summary = self._summaries.get(keys[known - 1])
+                if summary is not None:
+                    self._summaries.move_to_end(keys[known - 1])
+                    return folded, keys, known, summary
+        return folded, keys, 0, ""
+
+    def _remember(self, key: str, summary: str):
+        with self._lock:
+            self._summaries[key] = summary
+            while len(self._summaries) > self.cache_size:
+                self._summaries.popitem(last=False)
+            self.summaries_made += 1
+
+    def _bounded(self, chat_history: Sequence[Any], folded: int, summary: str) -> List[Any]:
+        head = [("system", SUMMARY_PREFIX + summary)] if summary else []
+        return head + list(chat_history[folded:])
+
+    def bound(self, chat_history: Sequence[Any]) -> List[Any]:
+        """
+        Returns the history to put in the prompt: [summary message] + the recent messages.
+        """
+        folded, keys, known, summary = self._plan(chat_history)
+        if folded == 0:
+            return list(chat_history)
+        if known < folded:
+            new_lines = _format_lines(chat_history[known:folded])
+            try:
+                if self._summarize is not None:
+                    summary = self._summarize(summary, new_lines)
+                else:
+                    summary = self._summary_chain().invoke({"summary": summary or "(none)", "new_lines": new_lines, "max_tokens": self.summary_tokens})
+                self._remember(keys[-1], summary)
+            except Exception as e:
+                # Better a stale summary than a failed answer: the next call retries from the last cached one.
+                print(f"Chat history summarization failed: {e}")
+        return self._bounded(chat_history, folded, summary)
+
+    async def abound(self, chat_history: Sequence[Any]) -> List[Any]:
+        """
+        Async variant of bound, for the API server.
+        """
+        folded, keys, known, summary = self._plan(chat_history)
+        if folded == 0:
+            return list(chat_history)
+        if known < folded:
+            new_lines = _format_lines(chat_history[known:folded])
+            try:
+                if self._summarize is not None:
+                    summary = self._summarize(summary, new_lines)
+                else:
+                    summary = await self._summary_chain().ainvoke({"summary": summary or "(none)", "new_lines": new_lines, "max_tokens": self.summary_tokens})
+                self._remember(keys[-1], summary)
+            except Exception as e:
+                print(f"Chat history summarization failed: {e}")
+        return self._bounded(chat_history, folded, summary)
+
+chat_history_manager = ChatHistoryManager()
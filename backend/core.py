@@ -1,6 +1,7 @@
+import asyncio
 import os
-import ast
-from typing import Any, Dict, List, Optional
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
 from xml.dom.minidom import Document
 from dotenv import load_dotenv
 
@@ -9,46 +10,18 @@ from langchain_core.prompts import PromptTemplate
 from langchain.chains.retrieval import create_retrieval_chain
 from langchain.chains.history_aware_retriever import create_history_aware_retriever
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_pinecone import PineconeVectorStore
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain import hub
-from langchain_core.retrievers import RetrieverLike
-from langchain_core.runnables import (
-    RunnableConfig
-)
-class CombinedRetriever(RetrieverLike):
-    def __init__(self, retrievers):
-        self.retrievers = retrievers
-
-    def get_relevant_documents(self, query):
-        results = []
-        for retriever in self.retrievers:
-            results.extend(retriever.invoke(query))
-        return results
-
-    def as_retriever(self):
-        return self
-
-    def with_config(self, config):
-        return self
-
-    def retrieve(self, input):
-        query = input['input']
-        return self.get_relevant_documents(query)
-    
-    def invoke(
-        self, input: str, config: Optional[RunnableConfig] = None, **kwargs: Any
-    ) -> List[Document]:
-        return self.get_relevant_documents(input)
-    
-def run_llm(query: str, chat_history:List[Dict[str, Any]]):
-    embeddings = OpenAIEmbeddings(model=os.environ["OPENAI_EMBEDDINGS_MODEL"])
-    
-    # Initialize multiple indexes
-    index_names = ast.literal_eval(os.environ['MULTI_INDEX_LIST'])
-    vector_stores = [PineconeVectorStore(index_name=index_name, embedding=embeddings) for index_name in index_names]
-    
-    chat = ChatOpenAI(model=os.environ["OPENAI_MODEL_NAME"], temperature=0, verbose=True)
+from tools.combined_retriever import CombinedRetriever
+from tools.vdb_registry import index_generation, vdb_registry
+from backend.answer_cache import answer_cache
+from backend.chat_history import chat_history_manager
+from backend.instrumentation import instrumentation
+from backend.prompt_hub import pull_prompt
+from backend.streaming import ANSWER_TAG, astream_events, stream_events
+from langchain_core.callbacks import BaseCallbackHandler
+
+def build_qa_chain():
+    from langchain_openai import ChatOpenAI
+    chat = ChatOpenAI(model=os.environ["OPENAI_MODEL_NAME"], temperature=0, verbose=True, streaming=True)
 
     template ="""Use the following pieces of context to answer the question at the end.
     If you don't know the answer, just say that you don't know, don't try to make up an answer.
@@ -59,28 +32,107 @@ def run_llm(query: str, chat_history:List[Dict[str, Any]]):
     Helpful Answer:"""
     
     retrieval_qa_chat_prompt = PromptTemplate(template=template,input_variables=["context", "input"])
-    rephrase_prompt = hub.pull("langchain-ai/chat-langchain-rephrase")
+    # Served from the local hub cache after the first download (see backend/prompt_hub.py).
+    rephrase_prompt = pull_prompt(os.getenv("REPHRASE_PROMPT", "langchain-ai/chat-langchain-rephrase"))
     
-    stuff_documents_chain = create_stuff_documents_chain(chat, retrieval_qa_chat_prompt)
+    # The tag lets the streaming handler tell answer tokens apart from the question rephrasing call.
+    stuff_documents_chain = create_stuff_documents_chain(chat.with_config(tags=[ANSWER_TAG]), retrieval_qa_chat_prompt)
     
     # Create a combined retriever for all indexes
-    all_retrievers = [store.as_retriever() for store in vector_stores]
-    combined_retriever = CombinedRetriever(all_retrievers)
+    combined_retriever = CombinedRetriever(vdb_registry.index_names())
     
     history_aware_retriever = create_history_aware_retriever(chat, combined_retriever, rephrase_prompt)
     
     qa = create_retrieval_chain(
         retriever=history_aware_retriever, combine_docs_chain=stuff_documents_chain
     )
-    result = qa.invoke(input={"input": query, "chat_history": chat_history})
-    new_result = {
+    return qa
+
+class QAChainCache:
+    """
+    Holds the retrieval QA chain built by build_qa_chain, so run_llm doesn't rebuild the ChatOpenAI client,
+    the prompts and the retrievers on every question.
+
+    The chain is keyed on (model name, index names, rephrase prompt, index generation) and rebuilt on the
+    next request once any of them changes, e.g. after bump_index_generation records a re-ingestion.
+    """
+    def __init__(self, build: Callable[[], Any] = build_qa_chain):
+        self.build = build
+        self._lock = threading.Lock()
+        self._key = None
+        self._chain = None
+        self.build_count = 0
+
+    def _config_key(self) -> Tuple:
+        return (os.environ["OPENAI_MODEL_NAME"], tuple(vdb_registry.index_names()),
+                os.getenv("REPHRASE_PROMPT", "langchain-ai/chat-langchain-rephrase"), index_generation())
+
+    def get(self):
+        key = self._config_key()
+        with self._lock:
+            if self._chain is None or self._key != key:
+                self._chain = self.build()
+                self._key = key
+                self.build_count += 1
+            return self._chain
+
+    def invalidate(self):
+        with self._lock:
+            self._key = None
+            self._chain = None
+
+qa_chain_cache = QAChainCache()
+
+def run_llm(query: str, chat_history:List[Dict[str, Any]], callbacks: Optional[List[BaseCallbackHandler]] = None):
+    cached = answer_cache.lookup("retrieval_qa", query, chat_history)
+    if cached is not None:
+        return cached
+
+    with instrumentation.trace("retrieval_qa") as tracing:
+        handlers = (callbacks or []) + tracing
+        qa = qa_chain_cache.get()
+        result = qa.invoke(input={"input": query, "chat_history": chat_history_manager.bound(chat_history)}, config={"callbacks": handlers} if handlers else None)
+    new_result = _qa_result(result)
+    answer_cache.store("retrieval_qa", query, chat_history, new_result)
+    return new_result
+
+def _qa_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
         "query": result["input"],
         "result": result["answer"],
         "source_documents": result["context"]
         
     }
+
+async def arun_llm(query: str, chat_history:List[Dict[str, Any]], callbacks: Optional[List[BaseCallbackHandler]] = None):
+    """
+    Async variant of run_llm for the API server. Building the chain may download the rephrase prompt
+    when the cached chain is (re)built, so that step and the answer cache calls run in worker threads.
+    """
+    cached = await asyncio.to_thread(answer_cache.lookup, "retrieval_qa", query, chat_history)
+    if cached is not None:
+        return cached
+
+    with instrumentation.trace("retrieval_qa") as tracing:
+        handlers = (callbacks or []) + tracing
+        qa = await asyncio.to_thread(qa_chain_cache.get)
+        result = await qa.ainvoke(input={"input": query, "chat_history": await chat_history_manager.abound(chat_history)}, config={"callbacks": handlers} if handlers else None)
+    new_result = _qa_result(result)
+    await asyncio.to_thread(answer_cache.store, "retrieval_qa", query, chat_history, new_result)
     return new_result
 
+def stream_run_llm(query: str, chat_history:List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming variant of run_llm: yields answer tokens as they arrive, ending with {"type": "final", "result": ...}.
+    """
+    yield from stream_events(lambda callbacks: run_llm(query, chat_history, callbacks=callbacks), mode="tagged")
+
+def astream_run_llm(query: str, chat_history:List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async variant of stream_run_llm, built on arun_llm.
+    """
+    return astream_events(lambda callbacks: arun_llm(query, chat_history, callbacks=callbacks), mode="tagged")
+
 if __name__ == "__main__":
     query = "What is kubernetes?"
     result = run_llm(query=query,chat_history=[])
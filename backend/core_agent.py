@@ -1,20 +1,23 @@
+import asyncio
 import os
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
-from langchain.agents import AgentExecutor, create_react_agent
-from langchain.agents.format_scratchpad import format_log_to_str
-from langchain.prompts import PromptTemplate
-from langchain.tools.render import render_text_description
-from langchain_openai import ChatOpenAI
 from langchain.tools import Tool
-from langchain_openai import ChatOpenAI
-from langchain_experimental.tools import PythonREPLTool
-from langchain_community.chat_models import ChatOllama
 from tools.shell_tools  import run_shell
+from tools.shell_jobs import cancel_shell_job, shell_job_output, shell_job_status
+from tools.python_sandbox import run_python
+from tools.tool_context import session_scope
 from tools.file_tools import create_file_in_folder, delete_file, list_files_in_directory, load_file
 from tools.os_tools import get_os
 from tools.utils_tools import get_current_date_time
 from tools.vdb_tools import retrieve_context_info
+from backend.agent_runtime import AgentRuntime
+from backend.parallel_agent import PARALLEL_FORMAT_GUIDELINES, ParallelAgentExecutor, create_parallel_react_agent
+from backend.answer_cache import answer_cache
+from backend.chat_history import chat_history_manager
+from backend.instrumentation import instrumentation
+from backend.streaming import astream_events, stream_events
+from langchain_core.callbacks import BaseCallbackHandler
 
 load_dotenv()
 
@@ -24,14 +27,9 @@ def find_tool_by_name(name: str, tools: List[Tool]) -> Tool:
             return tool
     return None
 
-def chat_with_agent(question: str, chat_history: List[Dict[str, Any]]) -> str:
-    print("React Agent")
-    
-    tools = [retrieve_context_info, get_current_date_time, PythonREPLTool(), get_os, run_shell, create_file_in_folder, load_file, list_files_in_directory, delete_file]    
-    
-    llm = ChatOpenAI(temperature=0, model_name=os.getenv("OPENAI_MODEL_NAME"), stop=["\nObservation"])
-    # llm = ChatOllama(temperature=0.3, model="llama3.1")
-    
+def build_tools() -> List[Tool]:
+    return [retrieve_context_info, get_current_date_time, run_python, get_os, run_shell, shell_job_status, shell_job_output, cancel_shell_job, create_file_in_folder, load_file, list_files_in_directory, delete_file]
+
 #     template = """
 #     Answer the following questions as best you can. You have access to the following tools:
 
@@ -63,12 +61,12 @@ def chat_with_agent(question: str, chat_history: List[Dict[str, Any]]) -> str:
 #     Thought: {agent_scratchpad}
 # """
 
-    template = """
+AGENT_TEMPLATE = """
     Answer the following questions as accurately and efficiently as possible. You have access to the following tools:
 
     {tools}
     
-    You can use the tools as many times as needed to answer the question, with the freedom to adjust parameters for optimal usage. You can also use Python for problem-solving with the PythonREPLTool.
+    You can use the tools as many times as needed to answer the question, with the freedom to adjust parameters for optimal usage. You can also use Python for problem-solving with the run_python tool; variables and imports persist between its calls.
 
     Guidelines for any code execution:
         Always debug the code until it runs without errors.
@@ -78,6 +76,8 @@ def chat_with_agent(question: str, chat_history: List[Dict[str, Any]]) -> str:
         Ensure compatibility with the OS you're running on.
         Open a shell before issuing a command and close it after completion.
         For actions that change or create system settings, always verify the changes before proceeding.
+        For long-running commands (installs, builds, test runs), start them with run_shell using the "background:" prefix,
+        keep working on other steps, and follow them with shell_job_status and shell_job_output (cancel_shell_job stops them).
     
     Format:
         When responding to a question, follow this structure:
@@ -100,21 +100,52 @@ def chat_with_agent(question: str, chat_history: List[Dict[str, Any]]) -> str:
     Question: {input}
     Thought: {agent_scratchpad}
     """
-    prompt = PromptTemplate.from_template(template=template).partial(
-        tools=render_text_description(tools), 
-        tool_names=", ".join([t.name for t in tools])
-    )
 
-    agent = create_react_agent(llm=llm, tools=tools, prompt=prompt)
-    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True, handle_parsing_errors=True, max_execution_time=120, max_iterations=120)
+AGENT_EXECUTOR_KWARGS = {"verbose": True, "handle_parsing_errors": True, "max_execution_time": 120, "max_iterations": 120}
+
+agent_runtime = AgentRuntime(
+    template=AGENT_TEMPLATE,
+    build_tools=build_tools,
+    executor_kwargs=AGENT_EXECUTOR_KWARGS
+)
+
+# Same agent, but the model may emit several independent actions per step and they run concurrently.
+parallel_agent_runtime = AgentRuntime(
+    template=AGENT_TEMPLATE.replace("    Begin!", PARALLEL_FORMAT_GUIDELINES + "\n    Begin!"),
+    build_tools=build_tools,
+    executor_kwargs=AGENT_EXECUTOR_KWARGS,
+    create_agent=create_parallel_react_agent,
+    executor_class=ParallelAgentExecutor
+)
+
+def get_agent_runtime() -> AgentRuntime:
+    """
+    Returns the runtime selected by AGENT_MODE: "react" (default, one tool per step) or "parallel".
+    """
+    return parallel_agent_runtime if os.getenv("AGENT_MODE", "react").lower() == "parallel" else agent_runtime
+
+def chat_with_agent(question: str, chat_history: List[Dict[str, Any]], callbacks: Optional[List[BaseCallbackHandler]] = None,
+                    session_id: Optional[str] = None) -> str:
+    print("React Agent")
+    
+    cached = answer_cache.lookup("agent", question, chat_history)
+    if cached is not None:
+        return cached
+
+    # llm = ChatOllama(temperature=0.3, model="llama3.1")
+    agent_executor = get_agent_runtime().get_executor(return_intermediate_steps=True)
 
     # chat_history_str = format_chat_history(chat_history)
-    result = agent_executor.invoke(
-        input={
-            "input": question,
-            "chat_history": chat_history
-        }
-    )
+    # The session scope gives the conversation its own tool state, e.g. the run_python interpreter.
+    with session_scope(session_id), instrumentation.trace("agent") as tracing:
+        handlers = (callbacks or []) + tracing
+        result = agent_executor.invoke(
+            input={
+                "input": question,
+                "chat_history": chat_history_manager.bound(chat_history)
+            },
+            config={"callbacks": handlers} if handlers else None
+        )
     # chat_history.append({
     #     "question": question,
     #     "thought": "Your thought process here",  # Update with actual thought if needed
@@ -123,14 +154,64 @@ def chat_with_agent(question: str, chat_history: List[Dict[str, Any]]) -> str:
     #     "observation": "The result of the action",
     #     "final_answer": result
     # })
+    new_result, tools_used = _agent_result(result)
+    if tools_used is not None:
+        answer_cache.store("agent", question, chat_history, new_result, tools_used=tools_used)
+    return new_result
+
+def _agent_result(result: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[List[str]]]:
+    """
+    Returns the answer dict and the tools used to produce it, or None instead of the tools
+    when the agent stopped early and the answer must not be cached.
+    """
     new_result = {
         "query": result["input"],
         "result": result["output"]
         # "source_documents": result["context"]
         
     }
+    if result["output"].startswith("Agent stopped"):
+        return new_result, None
+    return new_result, [action.tool for action, _ in result["intermediate_steps"]]
+
+async def achat_with_agent(question: str, chat_history: List[Dict[str, Any]], callbacks: Optional[List[BaseCallbackHandler]] = None,
+                           session_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Async variant of chat_with_agent for the API server: the agent runs through ainvoke, so one event
+    loop can multiplex many conversations; the blocking answer cache calls are moved to worker threads.
+    """
+    cached = await asyncio.to_thread(answer_cache.lookup, "agent", question, chat_history)
+    if cached is not None:
+        return cached
+
+    agent_executor = get_agent_runtime().get_executor(return_intermediate_steps=True)
+    with session_scope(session_id), instrumentation.trace("agent") as tracing:
+        handlers = (callbacks or []) + tracing
+        result = await agent_executor.ainvoke(
+            input={
+                "input": question,
+                "chat_history": await chat_history_manager.abound(chat_history)
+            },
+            config={"callbacks": handlers} if handlers else None
+        )
+    new_result, tools_used = _agent_result(result)
+    if tools_used is not None:
+        await asyncio.to_thread(answer_cache.store, "agent", question, chat_history, new_result, tools_used=tools_used)
     return new_result
 
+def stream_chat_with_agent(question: str, chat_history: List[Dict[str, Any]], session_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming variant of chat_with_agent: yields the agent's thoughts, tool calls and final answer
+    tokens as they happen (see backend/streaming.py), ending with {"type": "final", "result": ...}.
+    """
+    yield from stream_events(lambda callbacks: chat_with_agent(question, chat_history, callbacks=callbacks, session_id=session_id))
+
+def astream_chat_with_agent(question: str, chat_history: List[Dict[str, Any]], session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async variant of stream_chat_with_agent, built on achat_with_agent.
+    """
+    return astream_events(lambda callbacks: achat_with_agent(question, chat_history, callbacks=callbacks, session_id=session_id))
+
 def format_chat_history(chat_history: List[Dict[str, Any]]) -> str:
     formatted_history = ""
     for entry in chat_history:
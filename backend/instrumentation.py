@@ -0,0 +1,308 @@
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+from tools.token_count import count_tokens
+from tools.vdb_registry import vdb_registry
+
+load_dotenv()
+
+# Trace of the request running in the current context. Tool and retrieval threads started with a copied
+# context (CombinedRetriever, ParallelAgentExecutor) see it too, which is how per-index latencies get here.
+_current_trace: contextvars.ContextVar[Optional["RequestTrace"]] = contextvars.ContextVar("current_trace", default=None)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 50, 120)
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+class MetricsRegistry:
+    """
+    In-process Prometheus-style metrics: counters and histograms keyed by (name, labels),
+    rendered in the text exposition format by render().
+    """
+    HELP = {
+        "agent_requests_total": ("counter", "Sampled requests by endpoint and outcome."),
+        "agent_request_seconds": ("histogram", "End-to-end latency of sampled requests."),
+        "agent_iterations": ("histogram", "LLM calls (ReAct iterations) per sampled request."),
+        "agent_llm_seconds": ("histogram", "Latency of individual LLM calls."),
+        "agent_llm_tokens_total": ("counter", "Prompt and completion tokens, reported by the provider or estimated with tiktoken."),
+        "agent_tool_calls_total": ("counter", "Tool calls by tool and status."),
+        "agent_tool_seconds": ("histogram", "Latency of tool calls."),
+        "agent_tool_observation_chars_total": ("counter", "Characters of tool output fed back to the LLM."),
+        "agent_retrieval_seconds": ("histogram", "Latency of vector store searches per index.")
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple], _Histogram] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    @staticmethod
+    def _labels(labels: Tuple, extra: Optional[Tuple[str, str]] = None) -> str:
+        items = list(labels) + ([extra] if extra else [])
+        if not items:
+            return ""
+        escaped = [(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in items]
+        return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            names = sorted({name for name, _ in self._counters} | {name for name, _ in self._histograms})
+            for name in names:
+                kind, text = self.HELP.get(name, ("untyped", name))
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (metric, labels), value in sorted(self._counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{self._labels(labels)} {value:g}")
+                for (metric, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f"{name}_bucket{self._labels(labels, ('le', f'{bound:g}'))} {count}")
+                    lines.append(f"{name}_bucket{self._labels(labels, ('le', '+Inf'))} {histogram.count}")
+                    lines.append(f"{name}_sum{self._labels(labels)} {histogram.sum:g}")
+                    lines.append(f"{name}_count{self._labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+class RequestTrace:
+    """
+    Everything recorded about one sampled request: LLM calls, tool calls and retrievals, each tagged with
+    the ReAct step (the number of LLM calls finished so far) it belongs to.
+    """
+    def __init__(self, endpoint: str):
+        self.request_id = uuid.uuid4().hex
+        self.endpoint = endpoint
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.events: List[Dict[str, Any]] = []
+        self.llm_calls = 0
+        self._lock = threading.Lock()
+
+    def add(self, event: Dict[str, Any]):
+        with self._lock:
+            event.setdefault("step", self.llm_calls)
+            self.events.append(event)
+
+    def record_retrieval(self, index_name: str, seconds: float):
+        self.add({"type": "retrieval", "index": index_name, "latency_ms": round(1000 * seconds, 2)})
+        metrics.observe("agent_retrieval_seconds", seconds, index=index_name)
+
+    def summary(self, status: str) -> Dict[str, Any]:
+        with self._lock:
+            events = list(self.events)
+        llm = [e for e in events if e["type"] == "llm"]
+        tools = [e for e in events if e["type"] == "tool"]
+        return {
+            "request_id": self.request_id,
+            "endpoint": self.endpoint,
+            "status": status,
+            "started_at": self.started_at,
+            "latency_ms": round(1000 * (time.perf_counter() - self.started), 2),
+            "iterations": len(llm),
+            "llm_ms": round(sum(e["latency_ms"] for e in llm), 2),
+            "prompt_tokens": sum(e["prompt_tokens"] for e in llm),
+            "completion_tokens": sum(e["completion_tokens"] for e in llm),
+            "tool_ms": round(sum(e["latency_ms"] for e in tools), 2),
+            "events": events
+        }
+
+def _token_usage(response: Any) -> Tuple[Optional[int], Optional[int]]:
+    usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+    if usage.get("prompt_tokens") is not None:
+        return usage.get("prompt_tokens"), usage.get("completion_tokens")
+    for generations in getattr(response, "generations", []) or []:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if metadata:
+                return metadata.get("input_tokens"), metadata.get("output_tokens")
+    return None, None
+
+def _completion_text(response: Any) -> str:
+    return "".join(generation.text for generations in getattr(response, "generations", []) or [] for generation in generations)
+
+class InstrumentationHandler(BaseCallbackHandler):
+    """
+    Callback handler feeding a RequestTrace: LLM latency and tokens (tiktoken estimates when the provider
+    reports none, as with streaming), tool name, latency and observation size, and iteration count.
+    """
+    run_inline = True
+
+    def __init__(self, trace: RequestTrace):
+        self.trace = trace
+        self._llm: Dict[UUID, Tuple[float, str]] = {}
+        self._tools: Dict[UUID, Tuple[float, str]] = {}
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any):
+        self._llm[run_id] = (time.perf_counter(), "\n".join(prompts))
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any):
+        text = "\n".join(str(getattr(message, "content", message)) for batch in messages for message in batch)
+        self._llm[run_id] = (time.perf_counter(), text)
+
+    def _end_llm(self, run_id: UUID, response: Any, error: Optional[BaseException]):
+        started, prompt = self._llm.pop(run_id, (time.perf_counter(), ""))
+        seconds = time.perf_counter() - started
+        prompt_tokens, completion_tokens = _token_usage(response) if response is not None else (None, None)
+        estimated = prompt_tokens is None
+        if estimated:
+            prompt_tokens = count_tokens(prompt) if prompt else 0
+            completion_tokens = count_tokens(_completion_text(response)) if response is not None else 0
+        event = {
+            "type": "llm",
+            "latency_ms": round(1000 * seconds, 2),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens or 0,
+            "tokens_estimated": estimated
+        }
+        if error is not None:
+            event["error"] = str(error)
+        self.trace.add(event)
+        with self.trace._lock:
+            self.trace.llm_calls += 1
+        metrics.observe("agent_llm_seconds", seconds, endpoint=self.trace.endpoint)
+        metrics.inc("agent_llm_tokens_total", prompt_tokens, endpoint=self.trace.endpoint, kind="prompt")
+        metrics.inc("agent_llm_tokens_total", completion_tokens or 0, endpoint=self.trace.endpoint, kind="completion")
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any):
+        self._end_llm(run_id, response, None)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end_llm(run_id, None, error)
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any):
+        self._tools[run_id] = (time.perf_counter(), (serialized or {}).get("name", "tool"))
+
+    def _end_tool(self, run_id: UUID, output: str, status: str):
+        started, name = self._tools.pop(run_id, (time.perf_counter(), "tool"))
+        seconds = time.perf_counter() - started
+        self.trace.add({
+            "type": "tool",
+            "tool": name,
+            "status": status,
+            "latency_ms": round(1000 * seconds, 2),
+            "observation_chars": len(output)
+        })
+        metrics.inc("agent_tool_calls_total", tool=name, status=status)
+        metrics.observe("agent_tool_seconds", seconds, tool=name)
+        metrics.inc("agent_tool_observation_chars_total", len(output), tool=name)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any):
+        self._end_tool(run_id, str(output), "ok")
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end_tool(run_id, str(error), "error")
+
+def _record_retrieval(index_name: str, seconds: float):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record_retrieval(index_name, seconds)
+
+vdb_registry.latency_listeners.append(_record_retrieval)
+
+class Instrumentation:
+    """
+    Samples requests and, for the sampled ones, collects a RequestTrace through InstrumentationHandler,
+    appends its summary to a JSONL file and folds it into the Prometheus metrics.
+
+    Parameters (environment variable, default):
+        sample_rate (INSTRUMENTATION_SAMPLE_RATE, 1.0): Fraction of requests traced; 0 turns it off.
+        jsonl_path (INSTRUMENTATION_JSONL, ".instrumentation.jsonl"): Where traces go; empty disables the file.
+        max_bytes (INSTRUMENTATION_JSONL_MAX_MB, 50): Size at which the file is rotated to `<path>.1`.
+        backups (INSTRUMENTATION_JSONL_BACKUPS, 3): Rotated files kept (`<path>.1` is the most recent).
+    """
+    def __init__(self, sample_rate: Optional[float] = None, jsonl_path: Optional[str] = None,
+                 max_bytes: Optional[int] = None, backups: Optional[int] = None):
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv("INSTRUMENTATION_SAMPLE_RATE", "1.0"))
+        self.jsonl_path = jsonl_path if jsonl_path is not None else os.getenv("INSTRUMENTATION_JSONL", ".instrumentation.jsonl")
+        self.max_bytes = max_bytes or int(float(os.getenv("INSTRUMENTATION_JSONL_MAX_MB", "50")) * 1024 * 1024)
+        self.backups = backups if backups is not None else int(os.getenv("INSTRUMENTATION_JSONL_BACKUPS", "3"))
+        self._write_lock = threading.Lock()
+
+    def _rotate(self):
+        # <path>.N is dropped, every other backup moves up by one, the current file becomes <path>.1.
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.jsonl_path}.{i}"):
+                os.replace(f"{self.jsonl_path}.{i}", f"{self.jsonl_path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.jsonl_path, f"{self.jsonl_path}.1")
+        else:
+            os.remove(self.jsonl_path)
+
+    def _write(self, summary: Dict[str, Any]):
+        if not self.jsonl_path:
+            return
+        line = json.dumps(summary, default=str)
+        with self._write_lock:
+            try:
+                if os.path.getsize(self.jsonl_path) >= self.max_bytes:
+                    self._rotate()
+            except FileNotFoundError:
+                pass
+            with open(self.jsonl_path, 'a', encoding="utf-8") as file:
+                file.write(line + "\n")
+
+    @contextmanager
+    def trace(self, endpoint: str) -> Iterator[List[BaseCallbackHandler]]:
+        """
+        Wraps one request. Yields the callbacks to pass to the chain: [InstrumentationHandler] when the
+        request is sampled, [] otherwise.
+        """
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            yield []
+            return
+        trace = RequestTrace(endpoint)
+        token = _current_trace.set(trace)
+        status = "error"
+        try:
+            yield [InstrumentationHandler(trace)]
+            status = "ok"
+        finally:
+            _current_trace.reset(token)
+            summary = trace.summary(status)
+            metrics.inc("agent_requests_total", endpoint=endpoint, status=status)
+            metrics.observe("agent_request_seconds", summary["latency_ms"] / 1000, endpoint=endpoint)
+            metrics.observe("agent_iterations", summary["iterations"], buckets=COUNT_BUCKETS, endpoint=endpoint)
+            try:
+                self._write(summary)
+            except OSError as e:
+                print(f"Could not write instrumentation trace: {e}")
+
+instrumentation = Instrumentation()
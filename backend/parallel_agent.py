@@ -0,0 +1,171 @@
+import asyncio
+import contextvars
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, List, Sequence, Tuple, Union
+from langchain.agents import AgentExecutor
+from langchain.agents.output_parsers import ReActSingleInputOutputParser
+from langchain_core.agents import AgentAction, AgentFinish, AgentStep
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.prompts import BasePromptTemplate
+from langchain_core.runnables import Runnable, RunnablePassthrough
+from langchain_core.tools import BaseTool
+
+# Tools that change the machine they run on. Within one agent step they split the actions into waves:
+# the read-only actions between two of them run concurrently, each of them runs alone, in the model's order.
+SIDE_EFFECT_TOOLS = frozenset({"run_shell", "run_python", "cancel_shell_job", "create_file_in_folder", "delete_file"})
+
+# Shared by all executors so concurrent requests don't each spin up their own threads.
+_tool_executor = ThreadPoolExecutor(max_workers=int(os.getenv("PARALLEL_TOOL_WORKERS", "8")), thread_name_prefix="agent-tool")
+
+PARALLEL_FORMAT_GUIDELINES = """
+    Parallel actions:
+        When you need several lookups that do not depend on each other, list all of them in the same step,
+        each as its own Action / Action Input pair, before a single Observation:
+
+        Thought: you should always think about what to do
+        Action: the first action to take
+        Action Input: the input to the first action
+        Action: the second action to take
+        Action Input: the input to the second action
+        Observation: the result of the first action
+        Observation: the result of the second action
+
+        Only group actions whose inputs do not depend on each other's results.
+"""
+
+_ACTION_PATTERN = re.compile(
+    r"Action\s*\d*\s*:[\s]*(.*?)[\s]*Action\s*\d*\s*Input\s*\d*\s*:[\s]*(.*?)(?=\n\s*Action\s*\d*\s*:|\n\s*Thought\s*:|\Z)",
+    re.DOTALL
+)
+
+class MultiActionReActParser(ReActSingleInputOutputParser):
+    """
+    ReAct parser that accepts several Action / Action Input pairs in one LLM output and returns them as a list.
+
+    The first action keeps the thought that precedes it in its log, the others only their own
+    "Action: ..." text, which is how format_parallel_log recognizes actions of the same step.
+    A single action, a final answer or a malformed output are handled by the base parser.
+    """
+    def parse(self, text: str) -> Union[AgentAction, List[AgentAction], AgentFinish]:
+        matches = list(_ACTION_PATTERN.finditer(text))
+        if len(matches) < 2 or "Final Answer:" in text:
+            return super().parse(text)
+        actions = []
+        for i, match in enumerate(matches):
+            log = text[:match.end()] if i == 0 else text[match.start():match.end()]
+            tool_input = match.group(2).strip().strip(" ").strip('"')
+            actions.append(AgentAction(match.group(1).strip(), tool_input, log))
+        return actions
+
+    @property
+    def _type(self) -> str:
+        return "multi-action-react"
+
+def format_parallel_log(intermediate_steps: List[Tuple[AgentAction, str]], observation_prefix: str = "Observation: ",
+                        llm_prefix: str = "Thought: ") -> str:
+    """
+    Like format_log_to_str, but actions of the same step are written back to back, each followed by its
+    observation, with a single "Thought: " once the step is complete.
+    """
+    thoughts = ""
+    for i, (action, observation) in enumerate(intermediate_steps):
+        thoughts += action.log
+        thoughts += f"\n{observation_prefix}{observation}\n"
+        next_action = intermediate_steps[i + 1][0] if i + 1 < len(intermediate_steps) else None
+        if next_action is None or not next_action.log.lstrip().startswith("Action"):
+            thoughts += llm_prefix
+    return thoughts
+
+def create_parallel_react_agent(llm: BaseLanguageModel, tools: Sequence[BaseTool], prompt: BasePromptTemplate) -> Runnable:
+    """
+    Same contract as langchain's create_react_agent (the prompt must already have `tools` and `tool_names`
+    filled in, as AgentRuntime does), but the agent may return several actions per step.
+    """
+    llm_with_stop = llm.bind(stop=["\nObservation"])
+    return (
+        RunnablePassthrough.assign(agent_scratchpad=lambda x: format_parallel_log(x["intermediate_steps"]))
+        | prompt
+        | llm_with_stop
+        | MultiActionReActParser()
+    )
+
+class _Deferred:
+    """
+    Observation placeholder: the tool call it wraps has not been run yet.
+    """
+    def __init__(self, run: Callable[[], Any]):
+        self.run = run
+
+class ParallelAgentExecutor(AgentExecutor):
+    """
+    AgentExecutor that runs the actions of one step concurrently.
+
+    The base class plans the step and calls _perform_agent_action once per action; here that call only
+    records the work, and _iter_next_step then runs the recorded actions wave by wave (see _waves): the
+    read-only actions of a wave concurrently on the shared tool thread pool, a side-effecting tool alone on
+    the calling thread once everything listed before it has finished. Steps are yielded in the order the
+    model listed the actions. The async path does the same with asyncio.gather.
+    """
+    serial_tools: frozenset = SIDE_EFFECT_TOOLS
+
+    def _perform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None) -> AgentStep:
+        perform = super()._perform_agent_action
+        return AgentStep(action=agent_action, observation=_Deferred(
+            lambda: perform(name_to_tool_map, color_mapping, agent_action, run_manager)
+        ))
+
+    async def _aperform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None) -> AgentStep:
+        perform = super()._aperform_agent_action
+        return AgentStep(action=agent_action, observation=_Deferred(
+            lambda: perform(name_to_tool_map, color_mapping, agent_action, run_manager)
+        ))
+
+    def _is_serial(self, step: AgentStep) -> bool:
+        return step.action.tool in self.serial_tools
+
+    def _waves(self, deferred: List[AgentStep]) -> List[List[int]]:
+        """
+        Splits the step at each side-effecting action: runs of read-only actions form one wave,
+        each side-effecting action a wave of its own, in the order the model listed them.
+        """
+        waves: List[List[int]] = []
+        for i, step in enumerate(deferred):
+            if self._is_serial(step) or not waves or self._is_serial(deferred[waves[-1][0]]):
+                waves.append([i])
+            else:
+                waves[-1].append(i)
+        return waves
+
+    def _iter_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None) -> Iterator[Union[AgentFinish, AgentAction, AgentStep]]:
+        deferred = []
+        for item in super()._iter_next_step(name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager):
+            if isinstance(item, AgentStep) and isinstance(item.observation, _Deferred):
+                deferred.append(item)
+            else:
+                yield item
+        if not deferred:
+            return
+
+        for wave in self._waves(deferred):
+            if len(wave) == 1:
+                yield deferred[wave[0]].observation.run()
+                continue
+            futures = [_tool_executor.submit(contextvars.copy_context().run, deferred[i].observation.run) for i in wave]
+            for future in futures:
+                yield future.result()
+
+    async def _aiter_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None) -> AsyncIterator[Union[AgentFinish, AgentAction, AgentStep]]:
+        deferred = []
+        async for item in super()._aiter_next_step(name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager):
+            if isinstance(item, AgentStep) and isinstance(item.observation, _Deferred):
+                deferred.append(item)
+            else:
+                yield item
+        if not deferred:
+            return
+
+        for wave in self._waves(deferred):
+            for step in await asyncio.gather(*[deferred[i].observation.run() for i in wave]):
+                yield step
@@ -0,0 +1,133 @@
+import json
+import os
+import sys
+import threading
+import warnings
+from typing import Any, Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class HubPromptCache:
+    """
+    Local artifact cache for LangChain hub prompts.
+
+    A prompt is fetched from the hub once and saved as JSON under `directory`
+    (HUB_CACHE_DIR, default .hub_cache), and its repo is pinned to the commit that was fetched (pins.json).
+    After that, pulling the same repo loads the pinned artifact from disk, then from memory, without
+    contacting the hub. A reference can also name a version explicitly ("owner/repo:commit").
+    refresh() re-fetches the latest commit and moves the pin.
+
+    With `offline` (HUB_OFFLINE=true) a prompt missing from the cache is an error instead of a download.
+    """
+    def __init__(self, directory: Optional[str] = None, offline: Optional[bool] = None, fetch: Optional[Callable[[str], Any]] = None):
+        self.directory = directory or os.getenv("HUB_CACHE_DIR", ".hub_cache")
+        self.offline = offline if offline is not None else os.getenv("HUB_OFFLINE", "false").lower() in ("1", "true", "yes")
+        self._fetch = fetch
+        self._lock = threading.Lock()
+        self._prompts: Dict[Tuple[str, str], Any] = {}
+        self._pins: Optional[Dict[str, str]] = None
+        self.fetches = 0
+        self.disk_loads = 0
+
+    def _pins_file(self) -> str:
+        return os.path.join(self.directory, "pins.json")
+
+    def _artifact_file(self, repo: str, commit: str) -> str:
+        return os.path.join(self.directory, repo.replace("/", "__"), f"{commit}.json")
+
+    def pins(self) -> Dict[str, str]:
+        """
+        Repo ("owner/repo") -> pinned commit hash.
+        """
+        if self._pins is None:
+            try:
+                with open(self._pins_file(), encoding="utf-8") as file:
+                    self._pins = json.load(file)
+            except FileNotFoundError:
+                self._pins = {}
+        return dict(self._pins)
+
+    def _write(self, path: str, text: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, 'w', encoding="utf-8") as file:
+            file.write(text)
+        os.replace(tmp, path)
+
+    def _load(self, repo: str, commit: str) -> Optional[Any]:
+        prompt = self._prompts.get((repo, commit))
+        if prompt is not None:
+            return prompt
+        try:
+            with open(self._artifact_file(repo, commit), encoding="utf-8") as file:
+                text = file.read()
+        except FileNotFoundError:
+            return None
+        from langchain_core.load import loads
+        with warnings.catch_warnings():
+            # loads() is flagged as beta; hub.pull deserializes the same way.
+            warnings.simplefilter("ignore")
+            prompt = self._prompts[(repo, commit)] = loads(text)
+        self.disk_loads += 1
+        return prompt
+
+    def _download(self, ref: str) -> Any:
+        if self._fetch is not None:
+            return self._fetch(ref)
+        from langchain import hub
+        return hub.pull(ref)
+
+    def _store(self, repo: str, commit: str, prompt: Any, pin: bool):
+        from langchain_core.load import dumps
+        self._write(self._artifact_file(repo, commit), dumps(prompt, pretty=True))
+        self._prompts[(repo, commit)] = prompt
+        if pin:
+            self._pins = {**self.pins(), repo: commit}
+            self._write(self._pins_file(), json.dumps(self._pins, indent=2, sort_keys=True))
+
+    def pull(self, ref: str) -> Any:
+        """
+        Returns the prompt for "owner/repo" (the pinned version) or "owner/repo:commit",
+        downloading it only when it is not cached yet.
+        """
+        repo, _, explicit = ref.partition(":")
+        with self._lock:
+            commit = explicit or self.pins().get(repo, "")
+            if commit:
+                prompt = self._load(repo, commit)
+                if prompt is not None:
+                    return prompt
+            if self.offline:
+                raise RuntimeError(f"Hub prompt {ref} is not in the local cache ({self.directory}) and HUB_OFFLINE is set.")
+            # Only a first pull without a version pins the repo; explicit versions never move the pin.
+            return self._fetch_and_store(repo, commit, pin=not commit)
+
+    def _fetch_and_store(self, repo: str, commit: str, pin: bool) -> Any:
+        prompt = self._download(f"{repo}:{commit}" if commit else repo)
+        self.fetches += 1
+        # Stored under the requested hash when there is one, so a short hash finds its artifact next time.
+        commit = commit or (getattr(prompt, "metadata", None) or {}).get("lc_hub_commit_hash") or "latest"
+        self._store(repo, commit, prompt, pin)
+        return prompt
+
+    def refresh(self, repo: str) -> str:
+        """
+        Fetches the latest commit of `repo`, pins it and returns its hash.
+        """
+        with self._lock:
+            self._fetch_and_store(repo, "", pin=True)
+        return self.pins()[repo]
+
+prompt_hub = HubPromptCache()
+
+def pull_prompt(ref: str) -> Any:
+    """
+    Cached drop-in for langchain.hub.pull.
+    """
+    return prompt_hub.pull(ref)
+
+if __name__ == "__main__":
+    # `python -m backend.prompt_hub owner/repo ...` pins the latest version of each repo (e.g. before going offline).
+    for repo in sys.argv[1:]:
+        print(f"{repo}: {prompt_hub.refresh(repo)}")
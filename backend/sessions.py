@@ -0,0 +1,86 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class ChatSession:
+    """
+    Server-side state of one conversation. The history uses the same ("human"/"ai", text) tuples as
+    the Streamlit app; the lock makes turns of the same session run one at a time.
+    """
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.history: List[Tuple[str, str]] = []
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+    def add_turn(self, question: str, answer: str):
+        self.history.append(("human", question))
+        self.history.append(("ai", answer))
+
+class SessionStore:
+    """
+    In-memory LRU of chat sessions for the API server.
+
+    Sessions idle for more than `ttl` seconds are dropped, and the least recently used ones are evicted
+    once there are more than `max_sessions`. Their ids are kept until pop_evicted() so the caller can
+    release their tool state (interpreter, shell, jobs, memo) like for a deleted session. State is per
+    process, so run a single worker or pin clients to a worker when scaling out.
+    """
+    def __init__(self, ttl: float = 3600, max_sessions: int = 10000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._evicted: List[str] = []
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used <= self.ttl and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+            self._evicted.append(session.id)
+
+    def pop_evicted(self) -> List[str]:
+        """
+        Returns the ids of the sessions evicted since the last call.
+        """
+        evicted, self._evicted = self._evicted, []
+        return evicted
+
+    def create(self) -> ChatSession:
+        session = ChatSession(uuid.uuid4().hex)
+        self._sessions[session.id] = session
+        self._evict()
+        return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        self._evict()
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def get_or_create(self, session_id: Optional[str]) -> ChatSession:
+        session = self.get(session_id) if session_id else None
+        return session or self.create()
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @classmethod
+    def from_env(cls) -> "SessionStore":
+        return cls(
+            ttl=float(os.getenv("SESSION_TTL", "3600")),
+            max_sessions=int(os.getenv("SESSION_MAX", "10000"))
+        )
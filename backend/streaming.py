@@ -0,0 +1,154 @@
+import asyncio
+import queue
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+
+FINAL_ANSWER_PREFIX = "Final Answer:"
+ANSWER_TAG = "final_answer"
+
+class StreamingEventHandler(BaseCallbackHandler):
+    """
+    Callback handler that turns a run into a stream of event dicts pushed onto a queue:
+
+        {"type": "thought", "text": ...}                  - reasoning text before an action
+        {"type": "tool_start", "tool": ..., "input": ...}
+        {"type": "tool_end", "tool": ..., "output": ...}
+        {"type": "token", "text": ...}                    - final answer tokens, as they arrive
+
+    In "react" mode answer tokens are the ones following "Final Answer:" in the LLM output.
+    In "tagged" mode they are every token of the LLM calls tagged with ANSWER_TAG.
+
+    `events` is anything with a put() method: a queue.Queue, or a _LoopQueue for async runs.
+    """
+    # The handler only enqueues events, so async runs can call it on the event loop thread.
+    run_inline = True
+
+    def __init__(self, events: Any, mode: str = "react"):
+        self.events = events
+        self.mode = mode
+        self._buffers: Dict[UUID, str] = {}
+        self._answering = set()
+        self._answer_runs = set()
+        self._tools: Dict[UUID, str] = {}
+
+    def _start(self, run_id: UUID, tags: Optional[List[str]]):
+        self._buffers[run_id] = ""
+        if ANSWER_TAG in (tags or []):
+            self._answer_runs.add(run_id)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, tags: Optional[List[str]] = None, **kwargs: Any):
+        self._start(run_id, tags)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, tags: Optional[List[str]] = None, **kwargs: Any):
+        self._start(run_id, tags)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any):
+        if self.mode == "tagged":
+            if run_id in self._answer_runs and token:
+                self.events.put({"type": "token", "text": token})
+            return
+
+        if run_id in self._answering:
+            if token:
+                self.events.put({"type": "token", "text": token})
+            return
+        buffer = self._buffers.get(run_id, "") + token
+        self._buffers[run_id] = buffer
+        position = buffer.find(FINAL_ANSWER_PREFIX)
+        if position >= 0:
+            self._answering.add(run_id)
+            if position > 0:
+                self.events.put({"type": "thought", "text": buffer[:position].strip()})
+            rest = buffer[position + len(FINAL_ANSWER_PREFIX):].lstrip()
+            if rest:
+                self.events.put({"type": "token", "text": rest})
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any):
+        self._buffers.pop(run_id, None)
+        self._answering.discard(run_id)
+        self._answer_runs.discard(run_id)
+
+    def on_agent_action(self, action: Any, *, run_id: UUID, **kwargs: Any):
+        thought = action.log.split("Action:")[0].strip()
+        if thought:
+            self.events.put({"type": "thought", "text": thought})
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any):
+        name = (serialized or {}).get("name", "tool")
+        self._tools[run_id] = name
+        self.events.put({"type": "tool_start", "tool": name, "input": input_str})
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any):
+        self.events.put({"type": "tool_end", "tool": self._tools.pop(run_id, "tool"), "output": str(output)})
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self.events.put({"type": "tool_end", "tool": self._tools.pop(run_id, "tool"), "output": f"Error: {error}"})
+
+_DONE = object()
+
+def stream_events(run: Callable[[List[BaseCallbackHandler]], Dict[str, Any]], mode: str = "react") -> Iterator[Dict[str, Any]]:
+    """
+    Runs `run(callbacks)` on a background thread and yields its events as they are produced,
+    ending with {"type": "final", "result": <return value of run>} (or {"type": "error", "error": ...}).
+    """
+    events = queue.Queue()
+    handler = StreamingEventHandler(events, mode=mode)
+
+    def target():
+        try:
+            events.put({"type": "final", "result": run([handler])})
+        except Exception as e:
+            events.put({"type": "error", "error": str(e)})
+        finally:
+            events.put(_DONE)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    while True:
+        event = events.get()
+        if event is _DONE:
+            break
+        yield event
+    thread.join()
+
+class _LoopQueue:
+    """
+    asyncio.Queue that can be fed from any thread (sync callbacks of async runs may run in executor threads).
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+
+    def put(self, event: Any):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+async def astream_events(run: Callable[[List[BaseCallbackHandler]], Awaitable[Dict[str, Any]]], mode: str = "react") -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async counterpart of stream_events: awaits `run(callbacks)` as a task on the running loop and yields
+    its events. Closing the generator early (e.g. the HTTP client went away) cancels the run.
+    """
+    events = _LoopQueue(asyncio.get_running_loop())
+    handler = StreamingEventHandler(events, mode=mode)
+
+    async def target():
+        try:
+            events.put({"type": "final", "result": await run([handler])})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            events.put({"type": "error", "error": str(e)})
+        finally:
+            events.put(_DONE)
+
+    task = asyncio.create_task(target())
+    try:
+        while True:
+            event = await events.queue.get()
+            if event is _DONE:
+                break
+            yield event
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,56 @@
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+from benchmarks.offline import apply_offline_env, offline_backend, quiet
+from benchmarks.fakes import ScriptedReActLLM
+
+apply_offline_env()
+from backend.core_agent import chat_with_agent, get_agent_runtime
+
+def run_steps(steps: int, turns: int, llm_latency: float, history_turns: int) -> Dict[str, Any]:
+    """
+    Runs `turns` chat_with_agent turns whose scripted model calls get_current_date_time `steps` times
+    before answering. The overhead is the turn time minus the simulated model latency.
+    """
+    llm = ScriptedReActLLM(steps=steps, latency=llm_latency)
+    chat_history = []
+    for i in range(history_turns):
+        chat_history += [("human", f"Earlier question {i}?"), ("ai", f"Earlier answer {i}.")]
+    durations = []
+    with offline_backend(llm, {}), quiet():
+        chat_with_agent("Warm-up question?", chat_history)
+        llm.calls = 0
+        for turn in range(turns):
+            start = time.perf_counter()
+            result = chat_with_agent(f"Benchmark question {turn}?", chat_history)
+            durations.append(time.perf_counter() - start)
+    if not result["result"].startswith("Finished after"):
+        raise RuntimeError(f"Unexpected agent answer: {result['result']!r}")
+    seconds = sum(durations) / turns
+    overhead = seconds - llm.calls / turns * llm_latency
+    return {
+        "steps": steps,
+        "turns": turns,
+        "llm_calls_per_turn": llm.calls / turns,
+        "seconds_per_turn": seconds,
+        "overhead_ms_per_turn": 1000 * overhead,
+        "overhead_ms_per_step": 1000 * overhead / (steps + 1)
+    }
+
+def run(step_counts: List[int], turns: int, llm_latency: float, history_turns: int) -> Dict[str, Any]:
+    return {
+        "agent_class": get_agent_runtime().executor_class.__name__,
+        "llm_latency": llm_latency,
+        "history_turns": history_turns,
+        "results": [run_steps(steps, turns, llm_latency, history_turns) for steps in step_counts]
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure chat_with_agent overhead per turn and per ReAct step with a scripted local model.")
+    parser.add_argument("--steps", type=int, nargs="+", default=[0, 1, 2, 4, 8])
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--history-turns", type=int, default=2)
+    args = parser.parse_args()
+    print(json.dumps(run(args.steps, args.turns, args.llm_latency, args.history_turns), indent=2))
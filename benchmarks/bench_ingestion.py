@@ -0,0 +1,64 @@
+import argparse
+import json
+import time
+from benchmarks.fakes import FakeVectorStore, HashEmbeddings, fake_chunks
+from ingestion_pipeline import PipelineStats, run_pipeline
+from ingestion_scheduler import AdaptiveRateLimiter, IngestionScheduler
+
+def run_sequential(chunks, embedding_latency: float, upsert_latency: float, batch_size: int):
+    embeddings = HashEmbeddings(latency=embedding_latency)
+    store = FakeVectorStore(latency=upsert_latency)
+    start = time.perf_counter()
+    run_pipeline(chunks, embeddings, store, stats=PipelineStats(), batch_size=batch_size)
+    return {"mode": "sequential", "seconds": time.perf_counter() - start, "stored": len(store)}
+
+def run_scheduled(chunks, embedding_latency: float, upsert_latency: float, batch_size: int,
+                  embed_workers: int, upsert_workers: int, rate_limit_every: int, fail_rate: float):
+    embeddings = HashEmbeddings(latency=embedding_latency, rate_limit_every=rate_limit_every)
+    store = FakeVectorStore(latency=upsert_latency, fail_rate=fail_rate)
+    limiter = AdaptiveRateLimiter(max_backoff=0.5)
+    scheduler = IngestionScheduler(embeddings, store, embed_workers=embed_workers, upsert_workers=upsert_workers,
+                                   max_items_per_batch=batch_size, limiter=limiter)
+    start = time.perf_counter()
+    scheduler.run(chunks)
+    if scheduler.failed_batches:
+        scheduler.retry_failed()
+    return {
+        "mode": "scheduled",
+        "seconds": time.perf_counter() - start,
+        "stored": len(store),
+        "throttled": limiter.throttled,
+        "failed_batches": len(scheduler.failed_batches)
+    }
+
+def run_sizes(sizes, embedding_latency: float, upsert_latency: float, batch_size: int, embed_workers: int, upsert_workers: int):
+    """
+    Ingestion throughput (chunks per second) of both pipelines as the corpus grows.
+    """
+    results = []
+    for size in sizes:
+        chunks = fake_chunks(size)
+        for result in (run_sequential(chunks, embedding_latency, upsert_latency, batch_size),
+                       run_scheduled(chunks, embedding_latency, upsert_latency, batch_size, embed_workers, upsert_workers, 0, 0.0)):
+            results.append({"chunks": size, **result, "chunks_per_second": size / result["seconds"] if result["seconds"] else 0.0})
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sequential and scheduled ingestion against fake services.")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--upsert-latency", type=float, default=0.02)
+    parser.add_argument("--embed-workers", type=int, default=8)
+    parser.add_argument("--upsert-workers", type=int, default=4)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    chunks = fake_chunks(args.chunks)
+    results = [
+        run_sequential(chunks, args.embedding_latency, args.upsert_latency, args.batch_size),
+        run_scheduled(chunks, args.embedding_latency, args.upsert_latency, args.batch_size,
+                      args.embed_workers, args.upsert_workers, args.rate_limit_every, args.fail_rate)
+    ]
+    print(json.dumps(results, indent=2))
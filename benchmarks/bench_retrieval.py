@@ -0,0 +1,54 @@
+import argparse
+import asyncio
+import itertools
+import json
+from typing import Any, Dict, List
+from benchmarks.offline import apply_offline_env, fake_indexes, offline_backend, quiet
+from benchmarks.fakes import HashEmbeddings, ScriptedReActLLM
+from benchmarks.timing import ameasure, measure
+
+apply_offline_env()
+from backend.core import run_llm
+from tools.combined_retriever import CombinedRetriever
+
+def run_fan_out(index_count: int, queries: int, chunks_per_index: int, search_latency: float) -> Dict[str, Any]:
+    """
+    Times CombinedRetriever (sync and async) and a full run_llm call over `index_count` in-memory indexes,
+    each search sleeping `search_latency` seconds. With a parallel fan-out the overhead should stay flat
+    as indexes are added.
+    """
+    embeddings = HashEmbeddings()
+    stores = fake_indexes(index_count, chunks_per_index, embeddings, search_latency)
+    llm = ScriptedReActLLM(steps=0)
+    questions = itertools.cycle([f"vegan pizza delivery question {i}" for i in range(queries)])
+    with offline_backend(llm, stores), quiet():
+        retriever = CombinedRetriever(list(stores))
+        sync = measure(lambda: retriever.invoke(next(questions)), queries)
+        concurrent = asyncio.run(ameasure(lambda: retriever.ainvoke(next(questions)), queries))
+        end_to_end = measure(lambda: run_llm(next(questions), []), queries)
+    search_ms = 1000 * search_latency
+    return {
+        "indexes": index_count,
+        "chunks_per_index": chunks_per_index,
+        "sync_ms": sync,
+        "sync_overhead_ms": sync["mean"] - search_ms,
+        "async_ms": concurrent,
+        "async_overhead_ms": concurrent["mean"] - search_ms,
+        "run_llm_ms": end_to_end,
+        "run_llm_overhead_ms": end_to_end["mean"] - search_ms
+    }
+
+def run(index_counts: List[int], queries: int, chunks_per_index: int, search_latency: float) -> Dict[str, Any]:
+    return {
+        "search_latency": search_latency,
+        "results": [run_fan_out(count, queries, chunks_per_index, search_latency) for count in index_counts]
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure CombinedRetriever and run_llm overhead against a growing number of in-memory indexes.")
+    parser.add_argument("--indexes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--chunks-per-index", type=int, default=500)
+    parser.add_argument("--search-latency", type=float, default=0.02)
+    args = parser.parse_args()
+    print(json.dumps(run(args.indexes, args.queries, args.chunks_per_index, args.search_latency), indent=2))
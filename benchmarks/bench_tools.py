@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import tempfile
+from typing import Any, Dict
+from benchmarks.timing import measure
+from tools.dir_listing import scan_cache
+from tools.file_tools import list_files_in_directory, load_file
+from tools.shell_tools import run_shell, shell_manager
+
+def bench_shell(repeat: int) -> Dict[str, Any]:
+    """
+    run_shell on the pooled persistent shells, next to a fresh `sh -c` per command as the baseline.
+    """
+    shell = shell_manager.shell
+    return {
+        "run_shell_ms": measure(lambda: run_shell.invoke("echo benchmark"), repeat),
+        "subprocess_baseline_ms": measure(lambda: subprocess.run([shell, "-c", "echo benchmark"], capture_output=True), repeat)
+    }
+
+def _write_log(path: str, megabytes: int):
+    generator = random.Random(0)
+    levels = ["DEBUG", "INFO", "INFO", "INFO", "WARNING", "ERROR"]
+    with open(path, "w") as file:
+        line = 0
+        while file.tell() < megabytes * 1024 * 1024:
+            line += 1
+            file.write(f"2024-01-01 00:00:{line % 60:02d} {generator.choice(levels)} request {line} handled in {generator.randint(1, 900)}ms\n")
+    return line
+
+def bench_files(directory: str, megabytes: int, repeat: int) -> Dict[str, Any]:
+    """
+    load_file modes against a generated log of `megabytes` MB.
+    """
+    path = os.path.join(directory, "bench.log")
+    lines = _write_log(path, megabytes)
+    middle = lines // 2
+    modes = {
+        "head": {"mode": "head", "lines": 50},
+        "tail": {"mode": "tail", "lines": 50},
+        "lines_middle": {"mode": "lines", "start": middle, "end": middle + 50},
+        "bytes_middle": {"mode": "bytes", "start": os.path.getsize(path) // 2, "end": os.path.getsize(path) // 2 + 4096},
+        "search": {"mode": "search", "pattern": "ERROR .* in 9[0-9]{2}ms", "context": 2, "max_matches": 20}
+    }
+    results = {"file_mb": megabytes, "file_lines": lines}
+    for name, request in modes.items():
+        definition = repr({"file_path": path, **request})
+        results[f"{name}_ms"] = measure(lambda: load_file.invoke(definition), repeat)
+    return results
+
+def bench_listing(directory: str, files: int, repeat: int) -> Dict[str, Any]:
+    """
+    Recursive list_files_in_directory over a generated tree of `files` files, with a cold and a warm scan cache.
+    """
+    root = os.path.join(directory, "tree")
+    for i in range(files):
+        folder = os.path.join(root, f"package_{i % 20}", f"module_{i % 7}")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"file_{i}.py"), "w") as file:
+            file.write("pass\n")
+    definition = repr({"directory_path": root, "recursive": True, "pattern": "*.py", "limit": 100})
+
+    def cold():
+        scan_cache.clear()
+        list_files_in_directory.invoke(definition)
+    return {
+        "files": files,
+        "cold_ms": measure(cold, repeat),
+        "warm_ms": measure(lambda: list_files_in_directory.invoke(definition), repeat)
+    }
+
+def run(repeat: int, file_mb: int, tree_files: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as directory:
+        return {
+            "shell": bench_shell(repeat),
+            "load_file": bench_files(directory, file_mb, repeat),
+            "list_files_in_directory": bench_listing(directory, tree_files, repeat)
+        }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the latency of the shell and file tools.")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--file-mb", type=int, default=50)
+    parser.add_argument("--tree-files", type=int, default=5000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.repeat, args.file_mb, args.tree_files), indent=2))
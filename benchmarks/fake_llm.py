@@ -0,0 +1,77 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from benchmarks.fakes import HashEmbeddings
+
+# Minimal OpenAI-compatible server for load tests: `uvicorn benchmarks.fake_llm:app --port 8100`, then point
+# OPENAI_BASE_URL / OPENAI_API_BASE at http://127.0.0.1:8100/v1.
+# Chat completions answer in ReAct format ("Final Answer: ...") after FAKE_LLM_LATENCY seconds and stream one word
+# every FAKE_LLM_TOKEN_DELAY seconds; embeddings are deterministic hash vectors.
+
+app = FastAPI(title="fake-llm")
+LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.5"))
+TOKEN_DELAY = float(os.getenv("FAKE_LLM_TOKEN_DELAY", "0.02"))
+embeddings = HashEmbeddings(dimension=int(os.getenv("FAKE_LLM_EMBEDDING_DIMENSION", "64")))
+
+def _answer(body: Dict[str, Any]) -> str:
+    question = ""
+    for message in body.get("messages", []):
+        content = message.get("content") or ""
+        if isinstance(content, str):
+            lines = [line.strip() for line in content.splitlines() if line.strip().startswith("Question:")]
+            question = lines[-1][len("Question:"):].strip() if lines else question
+    return f"Thought: I can answer this directly.\nFinal Answer: This is a fake answer to: {question[-200:]}"
+
+def _chunk(completion_id: str, model: str, delta: Dict[str, Any], finish_reason=None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "fake")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    answer = _answer(body)
+    await asyncio.sleep(LATENCY)
+
+    if not body.get("stream"):
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(answer.split()), "total_tokens": len(answer.split())}
+        }
+
+    async def stream():
+        yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+        for i, word in enumerate(answer.split(" ")):
+            await asyncio.sleep(TOKEN_DELAY)
+            yield _chunk(completion_id, model, {"content": word if i == 0 else " " + word})
+        yield _chunk(completion_id, model, {}, finish_reason="stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+@app.post("/v1/embeddings")
+async def create_embeddings(request: Request):
+    body = await request.json()
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    return {
+        "object": "list",
+        "model": body.get("model", "fake"),
+        "data": [{"object": "embedding", "index": i, "embedding": embeddings.vector(str(text))} for i, text in enumerate(inputs)],
+        "usage": {"prompt_tokens": 0, "total_tokens": 0}
+    }
@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+class FakeRateLimitError(Exception):
+    """
+    Mimics the provider's HTTP 429 error (see ingestion_scheduler.is_rate_limit_error).
+    """
+    status_code = 429
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic embeddings derived from a hash of the text, with optional per-call latency
+    and injected failures, standing in for OpenAIEmbeddings.
+
+    Parameters:
+        dimension (int): Size of the vectors.
+        latency (float): Seconds slept per call (plus `latency_per_text` per text).
+        rate_limit_every (int): Raise FakeRateLimitError on every n-th call (0 disables it).
+        fail_rate (float): Probability of raising a generic error on a call.
+    """
+    def __init__(self, dimension: int = 64, latency: float = 0.0, latency_per_text: float = 0.0,
+                 rate_limit_every: int = 0, fail_rate: float = 0.0, seed: int = 0):
+        self.dimension = dimension
+        self.latency = latency
+        self.latency_per_text = latency_per_text
+        self.rate_limit_every = rate_limit_every
+        self.fail_rate = fail_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.texts_embedded = 0
+
+    def vector(self, text: str) -> List[float]:
+        seed = int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+        vector = np.random.default_rng(seed).normal(size=self.dimension)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def _call(self, count: int):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+            fail = self._random.random() < self.fail_rate
+        time.sleep(self.latency + self.latency_per_text * count)
+        if self.rate_limit_every and calls % self.rate_limit_every == 0:
+            raise FakeRateLimitError("Rate limit reached (fake)")
+        if fail:
+            raise RuntimeError("Embedding service error (fake)")
+        with self._lock:
+            self.texts_embedded += count
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._call(len(texts))
+        return [self.vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._call(1)
+        return self.vector(text)
+
+class FakeVectorStore:
+    """
+    In-memory vector store accepting precomputed vectors (add_vectors), with optional latency
+    and injected failures, standing in for a remote index in the ingestion and retrieval benchmarks.
+    """
+    def __init__(self, embedding: Optional[Embeddings] = None, latency: float = 0.0, fail_rate: float = 0.0, seed: int = 0):
+        self.embedding = embedding
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.rows: Dict[str, Tuple[List[float], str, dict]] = {}
+        self.upserts = 0
+
+    def add_vectors(self, vectors: List[List[float]], texts: List[str], metadatas: Optional[List[dict]] = None,
+                    ids: Optional[List[str]] = None) -> List[str]:
+        time.sleep(self.latency)
+        with self._lock:
+            if self._random.random() < self.fail_rate:
+                raise RuntimeError("Upsert failed (fake)")
+            metadatas = metadatas or [{} for _ in texts]
+            ids = ids or [str(len(self.rows) + i) for i in range(len(texts))]
+            for row_id, vector, text, metadata in zip(ids, vectors, texts, metadatas):
+                self.rows[row_id] = (vector, text, metadata)
+            self.upserts += 1
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs) -> bool:
+        with self._lock:
+            for row_id in ids or []:
+                self.rows.pop(row_id, None)
+        return True
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> List[Tuple[Document, float]]:
+        time.sleep(self.latency)
+        return self._search(query, k)
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> List[Tuple[Document, float]]:
+        await asyncio.sleep(self.latency)
+        return self._search(query, k)
+
+    def _search(self, query: str, k: int) -> List[Tuple[Document, float]]:
+        with self._lock:
+            rows = list(self.rows.values())
+        if not rows:
+            return []
+        matrix = np.asarray([vector for vector, _, _ in rows])
+        scores = matrix @ np.asarray(self.embedding.embed_query(query))
+        top = np.argsort(-scores)[:k]
+        return [(Document(page_content=rows[i][1], metadata=dict(rows[i][2])), float(scores[i])) for i in top]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+def fake_chunks(count: int, words: int = 120, seed: int = 0) -> List[Document]:
+    """
+    Generates `count` synthetic chunks of roughly `words` words each.
+    """
+    generator = random.Random(seed)
+    vocabulary = ["vegan", "menu", "pizza", "restaurant", "payment", "schedule", "delivery", "salad",
+                  "tofu", "burger", "open", "closed", "botafogo", "card", "pix", "dessert"]
+    return [
+        Document(page_content=" ".join(generator.choice(vocabulary) for _ in range(words)), metadata={"source": f"fake/{i}.txt"})
+        for i in range(count)
+    ]
+
+class ScriptedReActLLM(BaseChatModel):
+    """
+    Chat model answering in ReAct format from a fixed script, standing in for ChatOpenAI in the agent.
+
+    Each turn takes `steps` tool calls ("Action: <tool>", "Action Input: bench-step-<n>") followed by a
+    "Final Answer"; the step is worked out from the prompt itself, so one instance serves concurrent turns.
+    Every call sleeps `latency` seconds and, when streamed, `token_delay` seconds per word.
+    """
+    steps: int = 1
+    tool: str = "get_current_date_time"
+    latency: float = 0.0
+    token_delay: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-react"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        prompt = "\n".join(str(message.content) for message in messages)
+        done = prompt.count("Action Input: bench-step-")
+        if done < self.steps:
+            return f"Thought: I need step {done + 1}.\nAction: {self.tool}\nAction Input: bench-step-{done + 1}"
+        return f"Thought: I now know the final answer\nFinal Answer: Finished after {done} steps."
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        self.calls += 1
+        time.sleep(self.latency)
+        for i, word in enumerate(self._reply(messages).split(" ")):
+            time.sleep(self.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+import httpx
+from benchmarks.timing import percentiles
+
+async def _blocking_turn(client: httpx.AsyncClient, session_id: str, question: str, mode: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    response = await client.post("/chat", json={"question": question, "session_id": session_id, "mode": mode})
+    response.raise_for_status()
+    return {"latency": time.perf_counter() - start, "first_token": None}
+
+async def _streaming_turn(client: httpx.AsyncClient, session_id: str, question: str, mode: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    first_token = None
+    async with client.stream("POST", "/chat/stream", json={"question": question, "session_id": session_id, "mode": mode}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("event: token") and first_token is None:
+                first_token = time.perf_counter() - start
+            elif line.startswith("event: error"):
+                raise RuntimeError("stream ended with an error event")
+    return {"latency": time.perf_counter() - start, "first_token": first_token}
+
+async def _conversation(client: httpx.AsyncClient, index: int, turns: int, stream: bool, mode: str, results: List, errors: List):
+    response = await client.post("/sessions")
+    session_id = response.json()["session_id"]
+    for turn in range(turns):
+        try:
+            run_turn = _streaming_turn if stream else _blocking_turn
+            results.append(await run_turn(client, session_id, f"Question {turn} from user {index}?", mode))
+        except Exception as e:
+            errors.append(str(e))
+
+async def run_load(url: str, users: int, turns: int, stream: bool, mode: str, timeout: float) -> Dict[str, Any]:
+    results, errors = [], []
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[_conversation(client, i, turns, stream, mode, results, errors) for i in range(users)])
+        elapsed = time.perf_counter() - start
+    return {
+        "users": users,
+        "turns_per_user": turns,
+        "stream": stream,
+        "mode": mode,
+        "seconds": elapsed,
+        "completed": len(results),
+        "errors": len(errors),
+        "first_errors": errors[:3],
+        "turns_per_second": len(results) / elapsed if elapsed else 0.0,
+        "latency": percentiles([r["latency"] for r in results]),
+        "first_token": percentiles([r["first_token"] for r in results if r["first_token"] is not None])
+    }
+
+def _start(module: str, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", "uvicorn", module, "--port", str(port), "--log-level", "warning"], env=env)
+
+def _wait_ready(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive concurrent conversations against the API server backed by a local fake LLM.")
+    parser.add_argument("--url", default=None, help="Target an already running server instead of starting one")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--mode", choices=["agent", "retrieval"], default="agent")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--llm-port", type=int, default=8100)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    processes: List[subprocess.Popen] = []
+    url: Optional[str] = args.url
+    try:
+        if url is None:
+            llm_url = f"http://127.0.0.1:{args.llm_port}/v1"
+            env = {
+                **os.environ,
+                "OPENAI_API_KEY": "fake",
+                "OPENAI_BASE_URL": llm_url,
+                "OPENAI_API_BASE": llm_url,
+                "OPENAI_MODEL_NAME": os.getenv("OPENAI_MODEL_NAME", "gpt-4o-mini"),
+                "FAKE_LLM_LATENCY": str(args.llm_latency),
+                "FAKE_LLM_TOKEN_DELAY": str(args.token_delay),
+                "ANSWER_CACHE_ENABLED": "false",
+                "LANGCHAIN_TRACING_V2": "false"
+            }
+            processes.append(_start("benchmarks.fake_llm:app", args.llm_port, env))
+            _wait_ready(f"http://127.0.0.1:{args.llm_port}/docs")
+            processes.append(_start("server:app", args.port, env))
+            url = f"http://127.0.0.1:{args.port}"
+            _wait_ready(f"{url}/health")
+        result = asyncio.run(run_load(url, args.users, args.turns, args.stream, args.mode, args.timeout))
+        print(json.dumps(result, indent=2))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
@@ -0,0 +1,82 @@
+import os
+from contextlib import ExitStack, contextmanager, redirect_stdout
+from typing import Dict, Iterator
+from unittest import mock
+from langchain_core.prompts import PromptTemplate
+from benchmarks.fakes import FakeVectorStore, HashEmbeddings, ScriptedReActLLM, fake_chunks
+
+# Runs the real backend (chat_with_agent, run_llm, CombinedRetriever) against local stand-ins:
+# the ChatOpenAI clients become a ScriptedReActLLM, the vector store handles FakeVectorStores, and the
+# LangChain hub prompt a local copy, so the benchmarks measure the framework, not the network.
+
+# Local copy of langchain-ai/chat-langchain-rephrase.
+REPHRASE_PROMPT = PromptTemplate.from_template(
+    "Given the following conversation and a follow up question, rephrase the follow up question to be a standalone question.\n\n"
+    "Chat History:\n{chat_history}\nFollow Up Input: {input}\nStandalone Question:"
+)
+
+# Offline defaults: no answer cache, no trace files, and placeholders for the variables the modules read at import.
+OFFLINE_ENV = {
+    "ANSWER_CACHE_ENABLED": "false",
+    "INSTRUMENTATION_SAMPLE_RATE": "0",
+    "OPENAI_API_KEY": "offline",
+    "OPENAI_MODEL_NAME": "offline",
+    "OPENAI_EMBEDDINGS_MODEL": "offline",
+    "PINECONE_API_KEY": "offline"
+}
+
+def apply_offline_env():
+    """
+    Sets OFFLINE_ENV before the backend modules are imported (values already in the environment win)
+    and turns LangSmith tracing off.
+    """
+    for key, value in OFFLINE_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+def fake_indexes(count: int, chunks_per_index: int, embeddings: HashEmbeddings, latency: float) -> Dict[str, FakeVectorStore]:
+    """
+    Builds `count` in-memory indexes of `chunks_per_index` synthetic chunks each.
+    """
+    stores = {}
+    for i in range(count):
+        chunks = fake_chunks(chunks_per_index, seed=i)
+        store = FakeVectorStore(embedding=embeddings, latency=latency)
+        texts = [chunk.page_content for chunk in chunks]
+        store.add_vectors([embeddings.vector(text) for text in texts], texts, [chunk.metadata for chunk in chunks])
+        stores[f"bench-index-{i}"] = store
+    return stores
+
+@contextmanager
+def offline_backend(llm: ScriptedReActLLM, stores: Dict[str, FakeVectorStore]) -> Iterator[None]:
+    """
+    Patches the backend to use `llm` for every chat model and `stores` as the indexes of vdb_registry.
+    The agent runtimes are invalidated on entry and exit, so they are rebuilt with the right model.
+    """
+    import langchain_openai
+    from backend import core_agent
+    from backend.prompt_hub import prompt_hub
+    from tools.vdb_registry import vdb_registry
+
+    runtimes = (core_agent.agent_runtime, core_agent.parallel_agent_runtime)
+    with ExitStack() as stack:
+        # The backend imports ChatOpenAI where it builds the clients, so patching the package is enough.
+        stack.enter_context(mock.patch.object(langchain_openai, "ChatOpenAI", lambda **kwargs: llm))
+        stack.enter_context(mock.patch.object(prompt_hub, "pull", lambda ref: REPHRASE_PROMPT))
+        stack.enter_context(mock.patch.object(vdb_registry, "index_names", lambda: list(stores)))
+        stack.enter_context(mock.patch.object(vdb_registry, "get_store", lambda index_name: stores[index_name]))
+        for runtime in runtimes:
+            runtime.invalidate()
+        try:
+            yield
+        finally:
+            for runtime in runtimes:
+                runtime.invalidate()
+
+@contextmanager
+def quiet() -> Iterator[None]:
+    """
+    Silences the backend's prints (verbose executor, progress messages) so stdout carries only the JSON results.
+    """
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        yield
@@ -0,0 +1,71 @@
+import argparse
+import json
+import platform
+import subprocess
+import time
+from typing import Any, Dict
+from benchmarks.offline import apply_offline_env
+
+apply_offline_env()
+from benchmarks import bench_agent, bench_ingestion, bench_retrieval, bench_tools
+
+# Offline benchmark suite: `python -m benchmarks.suite --output results.json`.
+# Every external service is replaced by a local stand-in (benchmarks/offline.py), so the numbers are the
+# framework overhead of this repo and can be compared run to run to catch regressions.
+
+SIZES = {
+    "quick": {"steps": [0, 1, 4], "turns": 3, "indexes": [1, 4, 16], "queries": 5, "chunks_per_index": 200,
+              "corpus": [200, 1000], "repeat": 10, "file_mb": 5, "tree_files": 500},
+    "full": {"steps": [0, 1, 2, 4, 8], "turns": 10, "indexes": [1, 2, 4, 8, 16, 32], "queries": 30, "chunks_per_index": 1000,
+             "corpus": [500, 2000, 8000], "repeat": 50, "file_mb": 50, "tree_files": 5000}
+}
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def run(size: str, only, llm_latency: float, search_latency: float, embedding_latency: float, upsert_latency: float) -> Dict[str, Any]:
+    params = SIZES[size]
+    suites = {
+        "agent": lambda: bench_agent.run(params["steps"], params["turns"], llm_latency, history_turns=2),
+        "retrieval": lambda: bench_retrieval.run(params["indexes"], params["queries"], params["chunks_per_index"], search_latency),
+        "ingestion": lambda: bench_ingestion.run_sizes(params["corpus"], embedding_latency, upsert_latency, batch_size=50,
+                                                       embed_workers=8, upsert_workers=4),
+        "tools": lambda: bench_tools.run(params["repeat"], params["file_mb"], params["tree_files"])
+    }
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "size": size
+        }
+    }
+    for name, benchmark in suites.items():
+        if only and name not in only:
+            continue
+        start = time.perf_counter()
+        results[name] = benchmark()
+        results["meta"][f"{name}_seconds"] = time.perf_counter() - start
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the offline benchmarks and print the results as JSON.")
+    parser.add_argument("--size", choices=list(SIZES), default="quick")
+    parser.add_argument("--only", nargs="+", choices=["agent", "retrieval", "ingestion", "tools"])
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per model call")
+    parser.add_argument("--search-latency", type=float, default=0.02, help="Simulated seconds per index search")
+    parser.add_argument("--embedding-latency", type=float, default=0.01, help="Simulated seconds per embeddings call")
+    parser.add_argument("--upsert-latency", type=float, default=0.005, help="Simulated seconds per upsert")
+    parser.add_argument("--output", help="Also write the JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.size, args.only, args.llm_latency, args.search_latency, args.embedding_latency, args.upsert_latency)
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report + "\n")
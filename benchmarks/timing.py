@@ -0,0 +1,37 @@
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"mean": statistics.fmean(ordered), "p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99), "max": ordered[-1]}
+
+def measure(function: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """
+    Calls `function` `warmup` times untimed, then `repeat` times, and returns the percentiles of the
+    call durations in milliseconds.
+    """
+    for _ in range(warmup):
+        function()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(1000 * (time.perf_counter() - start))
+    return {"calls": repeat, **percentiles(durations)}
+
+async def ameasure(function: Callable[[], Awaitable[Any]], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """
+    Async counterpart of measure(), awaiting `function()` on each call.
+    """
+    for _ in range(warmup):
+        await function()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await function()
+        durations.append(1000 * (time.perf_counter() - start))
+    return {"calls": repeat, **percentiles(durations)}
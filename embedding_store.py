@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+class EmbeddingStore:
+    """
+    Append-only on-disk store of chunk embeddings for one embedding model.
+
+    Layout of `<root>/<model>/`:
+        meta.json    - {"dimension": ..., "dtype": "float32" | "float16"}
+        vectors.bin  - raw row-major matrix, one row per stored text, read through a memory map.
+        keys.txt     - sha256 of each row's text, one per line, in row order.
+
+    Rows are only ever appended (vectors first, then keys), and meta.json is written after the first
+    rows. On open, a missing or short vectors.bin or keys.txt counts as empty or truncated, rows left
+    incomplete by a crash are trimmed from both files, and files without a meta.json are discarded.
+    """
+    def __init__(self, model: str, root: Optional[str] = None, dtype: Optional[str] = None):
+        self.model = model
+        self.root = root or os.getenv("EMBEDDING_STORE_DIR", ".embedding_store")
+        self.path = os.path.join(self.root, model.replace("/", "_"))
+        self.dtype = dtype or os.getenv("EMBEDDING_STORE_DTYPE", "float32")
+        self.dimension = None
+        self._lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+        self._map = None
+        self._mapped_rows = 0
+        self.hits = 0
+        self.misses = 0
+        self._open()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _open(self):
+        if not os.path.exists(self._file("meta.json")):
+            # A crash before the first meta.json leaves rows of unknown shape: start over.
+            for name in ("vectors.bin", "keys.txt"):
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+            return
+        with open(self._file("meta.json"), 'r') as file:
+            meta = json.load(file)
+        self.dimension = meta["dimension"]
+        self.dtype = meta["dtype"]
+        row_bytes = self.dimension * np.dtype(self.dtype).itemsize
+        vectors_size = os.path.getsize(self._file("vectors.bin")) if os.path.exists(self._file("vectors.bin")) else 0
+        complete_rows = vectors_size // row_bytes
+        keys = []
+        if os.path.exists(self._file("keys.txt")):
+            with open(self._file("keys.txt"), 'r') as file:
+                for line in file:
+                    if not line.endswith("\n") or len(keys) >= complete_rows:
+                        break
+                    keys.append(line.strip())
+        # Drop whatever an interrupted append left behind so both files have exactly one row per key.
+        with open(self._file("vectors.bin"), 'ab') as file:
+            file.truncate(len(keys) * row_bytes)
+        with open(self._file("keys.txt"), 'w') as file:
+            file.write("".join(key + "\n" for key in keys))
+        self._rows = {key: row for row, key in enumerate(keys)}
+
+    def _remap(self):
+        count = len(self._rows)
+        if count and count != self._mapped_rows:
+            self._map = np.memmap(self._file("vectors.bin"), dtype=self.dtype, mode="r", shape=(count, self.dimension))
+            self._mapped_rows = count
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        with self._lock:
+            rows = [self._rows.get(key) for key in keys]
+            self._remap()
+            vectors = self._map
+        found = [None if row is None else np.asarray(vectors[row], dtype=np.float32).tolist() for row in rows]
+        hits = sum(vector is not None for vector in found)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]):
+        if not keys:
+            return
+        matrix = np.asarray(vectors, dtype=self.dtype)
+        with self._lock:
+            first_write = self.dimension is None
+            if first_write:
+                self.dimension = matrix.shape[1]
+                os.makedirs(self.path, exist_ok=True)
+            new = {}
+            for i, key in enumerate(keys):
+                if key not in self._rows and key not in new:
+                    new[key] = i
+            new = list(new.items())
+            if not new:
+                return
+            with open(self._file("vectors.bin"), 'ab') as file:
+                file.write(matrix[[i for _, i in new]].tobytes())
+            with open(self._file("keys.txt"), 'a') as file:
+                file.write("".join(key + "\n" for key, _ in new))
+            if first_write:
+                # Written last, so an existing meta.json always describes rows that were written before it.
+                tmp = self._file("meta.json.tmp")
+                with open(tmp, 'w') as file:
+                    json.dump({"dimension": self.dimension, "dtype": self.dtype}, file)
+                os.replace(tmp, self._file("meta.json"))
+            for key, _ in new:
+                self._rows[key] = len(self._rows)
+
+class StoreBackedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves embed_documents from an EmbeddingStore and only sends the texts
+    it has never seen to the underlying model. Queries are passed through untouched.
+    """
+    def __init__(self, embeddings: Embeddings, store: EmbeddingStore):
+        self.embeddings = embeddings
+        self.store = store
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [EmbeddingStore.key(text) for text in texts]
+        vectors = self.store.get_many(keys)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self.embeddings.embed_documents([texts[i] for i in missing])
+            self.store.put_many([keys[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+def with_embedding_store(embeddings: Embeddings, model: str) -> Embeddings:
+    """
+    Wraps `embeddings` with the persistent store unless EMBEDDING_STORE_ENABLED is "false".
+    """
+    if os.getenv("EMBEDDING_STORE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return embeddings
+    return StoreBackedEmbeddings(embeddings, EmbeddingStore(model))
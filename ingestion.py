@@ -6,33 +6,29 @@ import consts
 load_dotenv()
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import ReadTheDocsLoader
-from langchain_pinecone import PineconeVectorStore
+from tools.vdb_registry import bump_index_generation, vector_store_backend
+from ingestion_pipeline import PipelineStats, rewrite_sources
+from ingestion_parallel import parallel_html_chunks
+from ingestion_scheduler import scheduler_from_env
+from embedding_store import with_embedding_store
 
-embeddings = OpenAIEmbeddings(model=os.getenv("OPENAI_EMBEDDINGS_MODEL"))
+embeddings = with_embedding_store(OpenAIEmbeddings(model=os.getenv("OPENAI_EMBEDDINGS_MODEL")), os.getenv("OPENAI_EMBEDDINGS_MODEL"))
 
 
 def ingest_docs():
-    print("Loading the documentation from disk...")
-    loader = ReadTheDocsLoader("langchain-docs/api.python.langchain.com/en/latest")
-    raw_documents = loader.load()
-    print(f"Loaded {len(raw_documents)} documents.")
-    print("Splitting...")
+    print("Streaming the documentation from disk...")
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
-    documents = text_splitter.split_documents(raw_documents)
     
-    
-    print("Updating references...")
-    for doc in documents:
-        new_url = doc.metadata["source"]
-        new_url = new_url.replace("langchain-docs", "https:/")
-        doc.metadata.update({"source": new_url})
-    
-    print(f"Adding {len(documents)} documents to Pinecone...")
-    PineconeVectorStore.from_documents(
-        documents, embeddings, index_name=consts.INDEX_NAME
-    )
-    print("Data embedded and stored in Pinecone index.")
+    store_cls, name = vector_store_backend(consts.INDEX_NAME)
+    print(f"Adding documents to {store_cls.__name__}...")
+    store = store_cls(index_name=name, embedding=embeddings)
+    stats = PipelineStats()
+    chunks = parallel_html_chunks("langchain-docs/api.python.langchain.com/en/latest", text_splitter, stats=stats)
+    chunks = rewrite_sources(chunks, "langchain-docs", "https:/")
+    scheduler_from_env(embeddings, store).run(chunks, stats=stats)
+    stats.print_report()
+    bump_index_generation(consts.INDEX_NAME)
+    print(f"Data embedded and stored in index {consts.INDEX_NAME}.")
 
 
 if __name__ == "__main__":
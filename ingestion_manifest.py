@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from langchain_core.documents import Document
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_hash(chunk: Document) -> str:
+    """
+    Identity of a chunk: its exact text plus its source, so moving text between files counts as a change.
+    """
+    digest = hashlib.sha256(chunk.metadata.get("source", "").encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(chunk.page_content.encode("utf-8"))
+    return digest.hexdigest()
+
+class IngestionManifest:
+    """
+    Record of what has been ingested into one index, stored as JSON under INGESTION_MANIFEST_DIR
+    (default ".ingestion_manifest"):
+
+        {"files": {path: {"mtime_ns": ..., "size": ..., "sha256": ..., "chunks": {chunk_hash: vector_id}}}}
+
+    It lets a re-ingestion skip untouched files (same mtime and size, or same content hash),
+    embed only the chunks whose hash is new and delete the vectors of chunks that disappeared.
+    """
+    def __init__(self, index_name: str, root: Optional[str] = None):
+        self.index_name = index_name
+        self.root = root or os.getenv("INGESTION_MANIFEST_DIR", ".ingestion_manifest")
+        self.path = os.path.join(self.root, index_name.replace(":", "_") + ".json")
+        self._lock = threading.Lock()
+        self.files: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding="utf-8") as file:
+                self.files = json.load(file).get("files", {})
+
+    def save(self):
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, 'w', encoding="utf-8") as file:
+                json.dump({"index_name": self.index_name, "files": self.files}, file)
+            os.replace(tmp, self.path)
+
+    def is_unchanged(self, path: str) -> bool:
+        """
+        Cheap check: True when the file's mtime and size match the manifest, or, failing that,
+        when its content hash does (the stat fields are then refreshed).
+        """
+        entry = self.files.get(path)
+        if entry is None:
+            return False
+        stat = os.stat(path)
+        if entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return True
+        if entry["sha256"] == file_hash(path):
+            entry["mtime_ns"] = stat.st_mtime_ns
+            entry["size"] = stat.st_size
+            return True
+        return False
+
+    def chunk_ids(self, path: str) -> Dict[str, str]:
+        return dict(self.files.get(path, {}).get("chunks", {}))
+
+    def update_file(self, path: str, chunks: Dict[str, str]):
+        stat = os.stat(path)
+        self.files[path] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": file_hash(path),
+            "chunks": chunks
+        }
+
+    def remove_file(self, path: str):
+        self.files.pop(path, None)
+
+def vector_id(index_name: str, chunk_digest: str) -> str:
+    return hashlib.sha1(f"{index_name}\x00{chunk_digest}".encode("utf-8")).hexdigest()
+
+class IncrementalIngestor:
+    """
+    Ingests source files into an index while keeping it in sync with an IngestionManifest.
+
+    For each file: untouched files are skipped without being parsed; otherwise the file is split,
+    chunks whose hash is already in the manifest are kept, new chunks are embedded and upserted
+    through the scheduler, and vectors of chunks no longer present are deleted.
+    Vector ids are derived from the chunk hash, so re-upserting a chunk is idempotent.
+    """
+    def __init__(self, manifest: IngestionManifest, store, scheduler):
+        self.manifest = manifest
+        self.store = store
+        self.scheduler = scheduler
+        self.scheduler.make_ids = lambda batch: [vector_id(manifest.index_name, chunk.metadata["chunk_hash"]) for chunk in batch]
+        self.scheduler.on_batch = self._record_batch
+        self._upserted = {}
+
+    def _record_batch(self, batch: List[Document], ids: List[str]):
+        for chunk, row_id in zip(batch, ids):
+            self._upserted[chunk.metadata["chunk_hash"]] = row_id
+
+    def ingest_file(self, path: str, load_chunks: Callable[[str], Iterable[Document]], stats=None) -> Dict[str, Any]:
+        """
+        Brings one file's vectors up to date. `load_chunks(path)` must yield the file's chunks.
+        """
+        if self.manifest.is_unchanged(path):
+            print(f"Skipping unchanged file {path}")
+            self.manifest.save()
+            return {"file": path, "skipped": True, "added": 0, "removed": 0, "kept": len(self.manifest.chunk_ids(path))}
+
+        previous = self.manifest.chunk_ids(path)
+        current = set()
+        kept = {}
+
+        def new_chunks():
+            for chunk in load_chunks(path):
+                digest = chunk_hash(chunk)
+                if digest in current:
+                    continue
+                current.add(digest)
+                if digest in previous:
+                    kept[digest] = previous[digest]
+                    continue
+                chunk.metadata["chunk_hash"] = digest
+                yield chunk
+
+        self._upserted = {}
+        self.scheduler.run(new_chunks(), stats=stats)
+        added = dict(self._upserted)
+        # Failed chunks are retried by the next run through the manifest, not by the scheduler.
+        self.scheduler.failed_batches = []
+
+        removed = [row_id for digest, row_id in previous.items() if digest not in current]
+        if removed:
+            self.store.delete(ids=removed)
+
+        self.manifest.update_file(path, {**kept, **added})
+        if len(added) + len(kept) < len(current):
+            # Some batches failed: forget the file's stat/hash so the next run retries the missing chunks.
+            self.manifest.files[path]["mtime_ns"] = None
+            self.manifest.files[path]["sha256"] = None
+        self.manifest.save()
+        summary = {"file": path, "skipped": False, "added": len(added), "removed": len(removed), "kept": len(kept)}
+        print(f"Ingested {path}: {summary['added']} added, {summary['removed']} removed, {summary['kept']} unchanged chunks")
+        return summary
+
+    def prune(self, present_paths: Iterable[str]) -> int:
+        """
+        Deletes the vectors of every manifest file that is not in `present_paths` (i.e. was deleted from disk).
+        """
+        present = set(present_paths)
+        removed = 0
+        for path in [path for path in self.manifest.files if path not in present]:
+            ids = list(self.manifest.chunk_ids(path).values())
+            if ids:
+                self.store.delete(ids=ids)
+            removed += len(ids)
+            self.manifest.remove_file(path)
+        self.manifest.save()
+        return removed
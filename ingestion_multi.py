@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import Iterator, List, Optional
 from xml.dom.minidom import Document
 from dotenv import load_dotenv
 
@@ -8,23 +8,31 @@ import consts
 load_dotenv()
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import ReadTheDocsLoader, JSONLoader, TextLoader
+from langchain_community.document_loaders import JSONLoader, TextLoader
 from langchain_pinecone import PineconeVectorStore
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import CharacterTextSplitter
+from tools.vdb_registry import bump_index_generation, vector_store_backend
+from ingestion_pipeline import PipelineStats, load_stream, rewrite_sources, split_stream
+from ingestion_scheduler import scheduler_from_env
+from embedding_store import with_embedding_store
+from ingestion_manifest import IncrementalIngestor, IngestionManifest
+from ingestion_parallel import parallel_html_chunks
 
-embeddings = OpenAIEmbeddings(model=os.getenv("OPENAI_EMBEDDINGS_MODEL"))
+embeddings = with_embedding_store(OpenAIEmbeddings(model=os.getenv("OPENAI_EMBEDDINGS_MODEL")), os.getenv("OPENAI_EMBEDDINGS_MODEL"))
 
-def load_json_doc(json_file:str) -> List[Document]:
-    print("Loading JSON files...")
+def stream_json_doc(json_file:str, stats: Optional[PipelineStats] = None) -> Iterator[Document]:
+    print("Streaming JSON files...")
     loader = JSONLoader(
     jq_schema='.',
     file_path=json_file,
     text_content=False)
-    document = loader.load();
     text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=30, separator="\n")
-    docs = text_splitter.split_documents(document)
-    return docs
+    stats = stats or PipelineStats()
+    return split_stream(load_stream(loader, stats), text_splitter, stats)
+
+def load_json_doc(json_file:str) -> List[Document]:
+    return list(stream_json_doc(json_file))
 
 def load_text(json_file:str) -> List[Document]:
     print("Loading JSON files...")
@@ -38,48 +46,56 @@ def load_text(json_file:str) -> List[Document]:
     return docs
 
 
-def load_pdf(pdf_file:str) -> List[Document]:
-    print("Loading PDF...")
+def stream_pdf(pdf_file:str, stats: Optional[PipelineStats] = None) -> Iterator[Document]:
+    print("Streaming PDF...")
     loader = PyPDFLoader(file_path=pdf_file)
-    document = loader.load()
     text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=30, separator="\n")
-    docs = text_splitter.split_documents(document)
-    return docs
+    stats = stats or PipelineStats()
+    return split_stream(load_stream(loader, stats), text_splitter, stats)
 
-def load_text(text_file:str) -> List[Document]:
-    print("Loading text...")
+def load_pdf(pdf_file:str) -> List[Document]:
+    return list(stream_pdf(pdf_file))
+
+def stream_text(text_file:str, stats: Optional[PipelineStats] = None) -> Iterator[Document]:
+    print("Streaming text...")
     loader = TextLoader(text_file)
-    document = loader.load()
-    print("Document loaded...")
-    print("Splitting...")
     text_splitter = CharacterTextSplitter(chunk_size=1536, chunk_overlap=200, separator="\n")
-    docs = text_splitter.split_documents(document)
-    return docs
+    stats = stats or PipelineStats()
+    return split_stream(load_stream(loader, stats), text_splitter, stats)
+
+def load_text(text_file:str) -> List[Document]:
+    return list(stream_text(text_file))
 
-def load_html_docs(files_root_folder:str, update_refs: bool=False) -> List[Document]:
-    print("Loading HTML files...")
-    loader = ReadTheDocsLoader(files_root_folder)
-    raw_documents = loader.load()
-    print(f"Loaded {len(raw_documents)} documents.")
-    print("Splitting...")
+def stream_html_docs(files_root_folder:str, update_refs: bool=False, stats: Optional[PipelineStats] = None,
+                     workers: Optional[int] = None) -> Iterator[Document]:
+    """
+    Streams the chunks of a ReadTheDocs HTML dump. Parsing and splitting run on a pool of `workers`
+    processes (default: INGESTION_PARSE_WORKERS or the CPU count), or in this process with 1; the pages
+    are cleaned the same way either way, see ingestion_parallel.py.
+    """
+    print("Streaming HTML files...")
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=600, chunk_overlap=50)
-    documents = text_splitter.split_documents(raw_documents)
+    stats = stats or PipelineStats()
+    documents = parallel_html_chunks(files_root_folder, text_splitter, workers=workers, stats=stats)
     if update_refs:
-        print("Updating references...")
-        for doc in documents:
-            new_url = doc.metadata["source"]
-            new_url = new_url.replace("langchain-docs", "https:/")
-            doc.metadata.update({"source": new_url})
+        documents = rewrite_sources(documents, "langchain-docs", "https:/")
     return documents
 
+def load_html_docs(files_root_folder:str, update_refs: bool=False, workers: Optional[int] = None) -> List[Document]:
+    return list(stream_html_docs(files_root_folder, update_refs=update_refs, workers=workers))
+
 def ingest_docs():
-    documents = load_text("ivegan/ivegan.txt")
-    print(f"Adding {len(documents)} documents to Pinecone...")
-    index_name = "ivegan-index"
-    PineconeVectorStore.from_documents(
-        documents, embeddings, index_name=index_name
-    )
-    print(f"Data embedded and stored in Pinecone index {index_name}.")
+    index_name = os.getenv("INGESTION_INDEX_NAME", "ivegan-index")
+    store_cls, name = vector_store_backend(index_name)
+    print(f"Adding documents to {store_cls.__name__}...")
+    store = store_cls(index_name=name, embedding=embeddings)
+    stats = PipelineStats()
+    ingestor = IncrementalIngestor(IngestionManifest(index_name), store, scheduler_from_env(embeddings, store))
+    summary = ingestor.ingest_file("ivegan/ivegan.txt", lambda path: stream_text(path, stats), stats=stats)
+    stats.print_report()
+    if summary["added"] or summary["removed"]:
+        bump_index_generation(index_name)
+    print(f"Data embedded and stored in index {index_name}.")
 
 if __name__ == "__main__":
     ingest_docs()
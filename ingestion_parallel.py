@@ -0,0 +1,101 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+from langchain_core.documents import Document
+from ingestion_pipeline import PipelineStats
+
+_text_splitter = None
+
+# Where ReadTheDocs themes put the page content, in the order ReadTheDocsLoader tries them (it has no
+# other fallback); the rest of the page is navigation.
+CONTENT_TAGS = [
+    ("main", {"id": "main-content"}),
+    ("div", {"role": "main"}),
+]
+
+def list_html_files(files_root_folder: str, patterns: Sequence[str] = ("*.htm", "*.html")) -> List[str]:
+    """
+    Returns the files ReadTheDocsLoader would read, sorted so that runs are deterministic.
+    """
+    root = Path(files_root_folder)
+    files = set()
+    for pattern in patterns:
+        files.update(str(path) for path in root.rglob(pattern) if not path.is_dir())
+    return sorted(files)
+
+def clean_html(html: str) -> str:
+    """
+    Returns the text of the page's main content element without blank lines, or an empty string when
+    the page has none: the default lookup of ReadTheDocsLoader (no custom tag, no link-ratio filter).
+    Every worker count goes through this function, so the chunks never depend on it.
+    """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    for tag, attrs in CONTENT_TAGS:
+        element = soup.find(tag, attrs)
+        if element is not None:
+            return "\n".join(line for line in element.get_text().split("\n") if line)
+    return ""
+
+def _init_worker(text_splitter):
+    global _text_splitter
+    _text_splitter = text_splitter
+
+def _parse_shard(paths: List[str]) -> Tuple[List[Document], float, float]:
+    """
+    Parses and splits a shard of HTML files inside a worker process.
+    Returns the chunks and the seconds the worker spent parsing and splitting them.
+    """
+    parse_seconds = split_seconds = 0.0
+    chunks = []
+    for path in paths:
+        start = time.perf_counter()
+        with open(path) as file:
+            text = clean_html(file.read())
+        split_start = time.perf_counter()
+        chunks.extend(_text_splitter.split_documents([Document(page_content=text, metadata={"source": path})]))
+        parse_seconds += split_start - start
+        split_seconds += time.perf_counter() - split_start
+    return chunks, parse_seconds, split_seconds
+
+def parallel_html_chunks(files_root_folder: str, text_splitter, workers: Optional[int] = None, shard_size: int = 32,
+                         stats: Optional[PipelineStats] = None) -> Iterator[Document]:
+    """
+    Parses and splits the HTML files under `files_root_folder` on a pool of `workers` processes.
+
+    Files are cut into shards of `shard_size` files; at most two shards per worker are in flight,
+    and chunks are yielded shard by shard in sorted file order, so the output is the same for any
+    worker count. The "parse" and "split" stages of `stats` record files and chunks with summed worker seconds.
+    With `workers` set to 1 the shards are parsed in this process, without starting a pool.
+    """
+    workers = workers or int(os.getenv("INGESTION_PARSE_WORKERS", "0")) or os.cpu_count() or 1
+    stats = stats or PipelineStats()
+    files = list_html_files(files_root_folder)
+    shards = [files[i:i + shard_size] for i in range(0, len(files), shard_size)]
+
+    if workers <= 1:
+        print(f"Parsing {len(files)} HTML files in {len(shards)} shards in-process...")
+        _init_worker(text_splitter)
+        for shard in shards:
+            chunks, parse_seconds, split_seconds = _parse_shard(shard)
+            stats.record("parse", len(shard), parse_seconds)
+            stats.record("split", len(chunks), split_seconds)
+            yield from chunks
+        return
+
+    print(f"Parsing {len(files)} HTML files in {len(shards)} shards with {workers} worker processes...")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(text_splitter,)) as executor:
+        pending = deque()
+        next_shard = 0
+        while next_shard < len(shards) or pending:
+            while next_shard < len(shards) and len(pending) < 2 * workers:
+                pending.append((len(shards[next_shard]), executor.submit(_parse_shard, shards[next_shard])))
+                next_shard += 1
+            file_count, future = pending.popleft()
+            chunks, parse_seconds, split_seconds = future.result()
+            stats.record("parse", file_count, parse_seconds)
+            stats.record("split", len(chunks), split_seconds)
+            yield from chunks
@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+import uuid
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+class PipelineStats:
+    """
+    Per-stage counters of an ingestion run: items produced and seconds spent in each stage.
+    """
+    def __init__(self):
+        self.stages = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, items: int, seconds: float):
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"items": 0, "seconds": 0.0})
+            entry["items"] += items
+            entry["seconds"] += seconds
+
+    def report(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "elapsed_seconds": elapsed,
+            "stages": {
+                stage: {
+                    "items": entry["items"],
+                    "seconds": entry["seconds"],
+                    "items_per_second": entry["items"] / entry["seconds"] if entry["seconds"] else 0.0
+                }
+                for stage, entry in self.stages.items()
+            }
+        }
+
+    def print_report(self):
+        report = self.report()
+        print(f"Ingestion finished in {report['elapsed_seconds']:.2f}s")
+        for stage, entry in report["stages"].items():
+            print(f"  {stage:<8} {entry['items']:>8} items  {entry['seconds']:>8.2f}s  {entry['items_per_second']:>10.1f}/s")
+
+def load_stream(loader, stats: PipelineStats) -> Iterator[Document]:
+    """
+    Yields raw documents one at a time from the loader's lazy_load().
+    """
+    iterator = iter(loader.lazy_load())
+    while True:
+        start = time.perf_counter()
+        try:
+            document = next(iterator)
+        except StopIteration:
+            return
+        stats.record("load", 1, time.perf_counter() - start)
+        yield document
+
+def split_stream(documents: Iterable[Document], text_splitter, stats: PipelineStats) -> Iterator[Document]:
+    """
+    Splits each raw document as it arrives, so only one document's chunks are held at a time.
+    """
+    for document in documents:
+        start = time.perf_counter()
+        chunks = text_splitter.split_documents([document])
+        stats.record("split", len(chunks), time.perf_counter() - start)
+        yield from chunks
+
+def rewrite_sources(chunks: Iterable[Document], old: str, new: str) -> Iterator[Document]:
+    """
+    Rewrites the "source" metadata of each chunk, e.g. turning local paths into public URLs.
+    """
+    for chunk in chunks:
+        chunk.metadata.update({"source": chunk.metadata["source"].replace(old, new)})
+        yield chunk
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def _is_pinecone(store) -> bool:
+    # Checked by module name so that importing the pipeline doesn't load the Pinecone client.
+    return any(cls.__module__.startswith("langchain_pinecone") for cls in type(store).__mro__)
+
+def upsert_vectors(store, ids: List[str], vectors: List[List[float]], texts: List[str], metadatas: List[dict],
+                   namespace: Optional[str] = None):
+    """
+    Writes precomputed embeddings to a vector store without embedding the texts again.
+
+    Pinecone upserts go through PineconeVectorStore.add_embeddings, in requests of PINECONE_UPSERT_BATCH_SIZE
+    (default 32) vectors to stay under Pinecone's request size limit with large metadata, into `namespace`
+    (default: the store's own).
+    """
+    if hasattr(store, "add_vectors"):
+        store.add_vectors(vectors, texts, metadatas=metadatas, ids=ids)
+    elif _is_pinecone(store):
+        store.add_embeddings(texts=texts, embeddings=vectors, metadatas=metadatas, ids=ids, namespace=namespace,
+                             batch_size=int(os.getenv("PINECONE_UPSERT_BATCH_SIZE", "32")))
+    else:
+        raise TypeError(f"Don't know how to upsert precomputed vectors into {type(store).__name__}.")
+
+def embed_batch(embeddings: Embeddings, batch: List[Document], stats: PipelineStats) -> Tuple[List[str], List[List[float]]]:
+    texts = [chunk.page_content for chunk in batch]
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    stats.record("embed", len(batch), time.perf_counter() - start)
+    return texts, vectors
+
+def upsert_batch(store, batch: List[Document], texts: List[str], vectors: List[List[float]], stats: PipelineStats,
+                 ids: Optional[List[str]] = None) -> List[str]:
+    ids = ids or [str(uuid.uuid4()) for _ in batch]
+    start = time.perf_counter()
+    upsert_vectors(store, ids, vectors, texts, [chunk.metadata for chunk in batch])
+    stats.record("upsert", len(batch), time.perf_counter() - start)
+    return ids
+
+def run_pipeline(chunks: Iterable[Document], embeddings: Embeddings, store, stats: Optional[PipelineStats] = None,
+                 batch_size: int = 100, on_batch: Optional[Callable[[List[Document], List[str]], None]] = None) -> PipelineStats:
+    """
+    Embeds and upserts a stream of chunks batch by batch.
+
+    Chunks are pulled lazily from `chunks`, so peak memory is one batch of chunks and vectors
+    regardless of the size of the corpus.
+    """
+    stats = stats or PipelineStats()
+    for batch in batched(chunks, batch_size):
+        texts, vectors = embed_batch(embeddings, batch, stats)
+        ids = upsert_batch(store, batch, texts, vectors, stats)
+        if on_batch is not None:
+            on_batch(batch, ids)
+    return stats
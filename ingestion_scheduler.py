@@ -0,0 +1,241 @@
+import hashlib
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from ingestion_pipeline import PipelineStats, embed_batch, upsert_batch
+from tools.token_count import count_tokens
+
+class ChunkBatch(list):
+    """
+    List of chunks sent to the embeddings API in one request.
+
+    Behaves exactly like a plain list, with extra attributes:
+        tokens (int): Token count of the chunks, counted once when batching.
+        ids (list): Vector ids, fixed by the first upsert attempt and reused by every retry.
+    """
+    def __init__(self, chunks=(), tokens: int = 0):
+        super().__init__(chunks)
+        self.tokens = tokens
+        self.ids = None
+
+def chunk_id(chunk: Document) -> str:
+    """
+    Deterministic vector id of a chunk: its source, its offset in the source when the splitter records it
+    (add_start_index) and its text. Re-ingesting the same chunk overwrites its vector instead of duplicating it.
+    """
+    digest = hashlib.sha1(str(chunk.metadata.get("source", "")).encode("utf-8"))
+    digest.update(f"\x00{chunk.metadata.get('start_index', '')}\x00".encode("utf-8"))
+    digest.update(chunk.page_content.encode("utf-8"))
+    return digest.hexdigest()
+
+def token_batches(chunks: Iterable[Document], max_tokens: int = 8000, max_items: int = 256) -> Iterator[ChunkBatch]:
+    """
+    Groups chunks into batches of at most `max_tokens` tokens and `max_items` chunks.
+    """
+    batch = ChunkBatch()
+    for chunk in chunks:
+        chunk_tokens = count_tokens(chunk.page_content)
+        if batch and (batch.tokens + chunk_tokens > max_tokens or len(batch) >= max_items):
+            yield batch
+            batch = ChunkBatch()
+        batch.append(chunk)
+        batch.tokens += chunk_tokens
+    if batch:
+        yield batch
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return type(error).__name__ == "RateLimitError" or getattr(error, "status_code", None) == 429
+
+class AdaptiveRateLimiter:
+    """
+    Token-bucket limiter on requests and tokens per minute. When the provider answers with a
+    rate-limit error, penalize() pauses every caller for a backoff delay that doubles on each
+    consecutive penalty and halves again after successful calls (reward()).
+    """
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 max_backoff: float = 60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._request_allowance = requests_per_minute or 0.0
+        self._token_allowance = tokens_per_minute or 0.0
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self.backoff = 0.0
+        self.throttled = 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._last
+        self._last = now
+        if self.requests_per_minute:
+            self._request_allowance = min(self.requests_per_minute, self._request_allowance + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._token_allowance = min(self.tokens_per_minute, self._token_allowance + elapsed * self.tokens_per_minute / 60)
+
+    def acquire(self, tokens: int = 0):
+        """
+        Blocks until a request of `tokens` tokens fits within the limits.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                tokens_needed = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else 0
+                wait = self._paused_until - now
+                if self.requests_per_minute and self._request_allowance < 1:
+                    wait = max(wait, (1 - self._request_allowance) * 60 / self.requests_per_minute)
+                if self.tokens_per_minute and self._token_allowance < tokens_needed:
+                    wait = max(wait, (tokens_needed - self._token_allowance) * 60 / self.tokens_per_minute)
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._request_allowance -= 1
+                    if self.tokens_per_minute:
+                        self._token_allowance -= tokens_needed
+                    return
+            time.sleep(wait)
+
+    def penalize(self):
+        with self._lock:
+            self.throttled += 1
+            self.backoff = min(self.max_backoff, max(1.0, self.backoff * 2))
+            self._paused_until = max(self._paused_until, time.monotonic() + self.backoff * random.uniform(0.8, 1.2))
+
+    def reward(self):
+        with self._lock:
+            self.backoff = self.backoff / 2 if self.backoff > 0.1 else 0.0
+
+class IngestionScheduler:
+    """
+    Embeds and upserts chunk batches concurrently.
+
+    Chunks are grouped by token count, embedded by `embed_workers` threads and upserted by
+    `upsert_workers` threads. At most `max_in_flight` batches are held at once, so memory stays
+    bounded while the input stream is consumed lazily. A batch that fails is retried with exponential
+    backoff (rate-limit errors also slow down the shared limiter); batches that still fail after
+    `max_retries` are kept in `failed_batches` and can be re-run with retry_failed().
+
+    Vector ids come from `make_ids` (default: chunk_id for each chunk) and are kept with the batch,
+    so a retry overwrites whatever a failed attempt wrote instead of duplicating it.
+    """
+    def __init__(self, embeddings: Embeddings, store, embed_workers: int = 4, upsert_workers: int = 2,
+                 max_tokens_per_batch: int = 8000, max_items_per_batch: int = 256, max_retries: int = 5,
+                 max_in_flight: Optional[int] = None, limiter: Optional[AdaptiveRateLimiter] = None,
+                 on_batch: Optional[Callable[[List[Document], List[str]], None]] = None,
+                 make_ids: Optional[Callable[[List[Document]], List[str]]] = None):
+        self.embeddings = embeddings
+        self.store = store
+        self.embed_workers = embed_workers
+        self.upsert_workers = upsert_workers
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.max_items_per_batch = max_items_per_batch
+        self.max_retries = max_retries
+        self.max_in_flight = max_in_flight or 2 * (embed_workers + upsert_workers)
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.on_batch = on_batch
+        self.make_ids = make_ids
+        self.failed_batches = []
+        self._callback_lock = threading.Lock()
+        self._failed_lock = threading.Lock()
+
+    def _with_retries(self, stage: str, function, *args):
+        attempt = 0
+        while True:
+            try:
+                result = function(*args)
+                self.limiter.reward()
+                return result
+            except Exception as e:
+                attempt += 1
+                if is_rate_limit_error(e):
+                    self.limiter.penalize()
+                if attempt > self.max_retries:
+                    raise
+                delay = min(30.0, 0.5 * 2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+                print(f"{stage} failed ({e}), retrying in {delay:.1f}s ({attempt}/{self.max_retries})")
+                time.sleep(delay)
+
+    def _embed(self, batch: ChunkBatch, stats: PipelineStats):
+        def call():
+            self.limiter.acquire(batch.tokens)
+            return embed_batch(self.embeddings, batch, stats)
+        return self._with_retries("embed", call)
+
+    def _process(self, batch: ChunkBatch, stats: PipelineStats, upsert_pool: ThreadPoolExecutor, slots: threading.Semaphore):
+        try:
+            texts, vectors = self._embed(batch, stats)
+        except Exception as e:
+            self._fail(batch, e)
+            slots.release()
+            return
+        upsert_pool.submit(self._upsert, batch, texts, vectors, stats, slots)
+
+    def _upsert(self, batch: ChunkBatch, texts: List[str], vectors: List[List[float]], stats: PipelineStats, slots: threading.Semaphore):
+        # Ids are fixed before the first attempt and stay with the batch, so a retried upsert (here or in
+        # retry_failed) overwrites a partial write instead of duplicating it.
+        if batch.ids is None:
+            batch.ids = self.make_ids(batch) if self.make_ids is not None else [chunk_id(chunk) for chunk in batch]
+        ids = batch.ids
+        try:
+            self._with_retries("upsert", upsert_batch, self.store, batch, texts, vectors, stats, ids)
+            if self.on_batch is not None:
+                with self._callback_lock:
+                    self.on_batch(batch, ids)
+        except Exception as e:
+            self._fail(batch, e)
+        finally:
+            slots.release()
+
+    def _fail(self, batch: ChunkBatch, error: Exception):
+        print(f"Giving up on a batch of {len(batch)} chunks: {error}")
+        with self._failed_lock:
+            self.failed_batches.append(batch)
+
+    def _run_batches(self, batches: Iterable[ChunkBatch], stats: PipelineStats) -> PipelineStats:
+        slots = threading.Semaphore(self.max_in_flight)
+        with ThreadPoolExecutor(max_workers=self.upsert_workers, thread_name_prefix="upsert") as upsert_pool:
+            with ThreadPoolExecutor(max_workers=self.embed_workers, thread_name_prefix="embed") as embed_pool:
+                for batch in batches:
+                    slots.acquire()
+                    embed_pool.submit(self._process, batch, stats, upsert_pool, slots)
+            # Leaving the embed pool waits for every embedding, so all upserts are submitted
+            # before leaving the upsert pool waits for them in turn.
+        return stats
+
+    def run(self, chunks: Iterable[Document], stats: Optional[PipelineStats] = None) -> PipelineStats:
+        stats = stats or PipelineStats()
+        batches = token_batches(chunks, self.max_tokens_per_batch, self.max_items_per_batch)
+        self._run_batches(batches, stats)
+        if self.failed_batches:
+            print(f"{len(self.failed_batches)} batches failed, call retry_failed() to re-run them.")
+        return stats
+
+    def retry_failed(self, stats: Optional[PipelineStats] = None) -> PipelineStats:
+        """
+        Re-runs only the batches that failed in previous runs.
+        """
+        with self._failed_lock:
+            batches, self.failed_batches = self.failed_batches, []
+        return self._run_batches(batches, stats or PipelineStats())
+
+def scheduler_from_env(embeddings: Embeddings, store, **kwargs) -> IngestionScheduler:
+    """
+    Builds an IngestionScheduler from the INGESTION_* environment knobs; keyword arguments take precedence.
+    """
+    rpm = float(os.getenv("INGESTION_REQUESTS_PER_MINUTE", "0"))
+    tpm = float(os.getenv("INGESTION_TOKENS_PER_MINUTE", "0"))
+    options = {
+        "embed_workers": int(os.getenv("INGESTION_EMBED_WORKERS", "4")),
+        "upsert_workers": int(os.getenv("INGESTION_UPSERT_WORKERS", "2")),
+        "max_tokens_per_batch": int(os.getenv("INGESTION_MAX_TOKENS_PER_BATCH", "8000")),
+        "max_items_per_batch": int(os.getenv("INGESTION_BATCH_SIZE", "100")),
+        "max_retries": int(os.getenv("INGESTION_MAX_RETRIES", "5")),
+        "limiter": AdaptiveRateLimiter(requests_per_minute=rpm or None, tokens_per_minute=tpm or None)
+    }
+    options.update(kwargs)
+    return IngestionScheduler(embeddings, store, **options)
@@ -1,6 +1,5 @@
+import uuid
 from typing import Set
-from backend.core_agent import chat_with_agent
-from backend.core import run_llm
 import streamlit as st
 from streamlit_chat import message
 
@@ -14,6 +13,10 @@ if ("user_prompt_history" not in st.session_state
     st.session_state["chat_answers_history"] = []
     st.session_state["chat_history"] = []
 
+# Keys the per-conversation tool state (the run_python interpreter) to this browser session.
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = uuid.uuid4().hex
+
 def create_sources_string(sources_url: Set[str]) -> str:
     if not sources_url or not has_substring(sources_url, ".html"):
         return ""
@@ -34,21 +37,42 @@ def get_page_name(url: str) -> str:
     return url.split("/")[-1].replace(".html", "").replace(".", " ").replace("_", " ").capitalize()
 
 if prompt:
+    # Imported on the first question rather than at startup, so the page renders before LangChain,
+    # the tools and the model clients have loaded (later reruns find them in sys.modules).
+    from backend.core_agent import stream_chat_with_agent
+    
+    # Thoughts and tool calls go in the collapsed status; the answer streams into the chat area below it.
+    status = st.status("Working...", expanded=False)
+    answer_placeholder = st.empty()
+    answer = ""
+    generated_response = None
+    # generated_response = run_llm(query=prompt, chat_history=st.session_state["chat_history"])
+    for event in stream_chat_with_agent(question=prompt, chat_history=st.session_state["chat_history"], session_id=st.session_state["session_id"]):
+        if event["type"] == "thought":
+            status.markdown(f"*{event['text']}*")
+        elif event["type"] == "tool_start":
+            status.update(label=f"Running {event['tool']}...")
+            status.markdown(f"**{event['tool']}**: `{event['input']}`")
+        elif event["type"] == "token":
+            answer += event["text"]
+            answer_placeholder.markdown(answer)
+        elif event["type"] == "final":
+            generated_response = event["result"]
+        elif event["type"] == "error":
+            generated_response = {"query": prompt, "result": f"An error occurred: {event['error']}"}
+    answer_placeholder.markdown(generated_response["result"])
+    status.update(label="Done", state="complete")
+    # sources = set([doc.metadata.get("source") for doc in generated_response["source_documents"]])
+    
+    # formated_response = f"{generated_response['result']}\n\n\n{create_sources_string(sources)}\n"
+    
+    formated_response = f"{generated_response['result']}\n"
+    
+    st.session_state["user_prompt_history"].append(prompt)
+    st.session_state["chat_answers_history"].append(formated_response)
+    st.session_state["chat_history"].append(("human", prompt))
+    st.session_state["chat_history"].append(("ai", generated_response["result"]))
     
-    with st.spinner("Working..."):
-        # generated_response = run_llm(query=prompt, chat_history=st.session_state["chat_history"])
-        generated_response = chat_with_agent(question=prompt, chat_history=st.session_state["chat_history"])
-        # sources = set([doc.metadata.get("source") for doc in generated_response["source_documents"]])
-        
-        # formated_response = f"{generated_response['result']}\n\n\n{create_sources_string(sources)}\n"
-        
-        formated_response = f"{generated_response['result']}\n"
-        
-        st.session_state["user_prompt_history"].append(prompt)
-        st.session_state["chat_answers_history"].append(formated_response)
-        st.session_state["chat_history"].append(("human", prompt))
-        st.session_state["chat_history"].append(("ai", generated_response["result"]))
-        
 if st.session_state["chat_answers_history"]:
     for i, (generated_response, user_query) in enumerate(zip(st.session_state["chat_answers_history"], st.session_state["user_prompt_history"])):
         message(user_query, is_user=True, key=f"user_{i}")
@@ -0,0 +1,125 @@
+import json
+from typing import Any, AsyncIterator, Dict, Literal, Optional
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+load_dotenv()
+from backend.core import arun_llm, astream_run_llm
+from backend.core_agent import achat_with_agent, astream_chat_with_agent
+from backend.instrumentation import metrics
+from backend.sessions import ChatSession, SessionStore
+from tools.python_sandbox import python_sandbox
+from tools.shell_jobs import shell_jobs
+from tools.shell_tools import shell_manager
+from tools.tool_memo import tool_memo
+
+# Async HTTP entry point: `uvicorn server:app --port 8000`.
+# Every request runs on the event loop through the ainvoke paths, so one worker serves many conversations at once.
+
+app = FastAPI(title="multi-tool-react-agent")
+sessions = SessionStore.from_env()
+
+class ChatRequest(BaseModel):
+    question: str
+    session_id: Optional[str] = None
+    mode: Literal["agent", "retrieval"] = "agent"
+
+def _chat(request: ChatRequest, session: ChatSession):
+    chat_history = list(session.history)
+    if request.mode == "retrieval":
+        return arun_llm(query=request.question, chat_history=chat_history)
+    return achat_with_agent(question=request.question, chat_history=chat_history, session_id=session.id)
+
+def _stream_chat(request: ChatRequest, session: ChatSession) -> AsyncIterator[Dict[str, Any]]:
+    chat_history = list(session.history)
+    if request.mode == "retrieval":
+        return astream_run_llm(query=request.question, chat_history=chat_history)
+    return astream_chat_with_agent(question=request.question, chat_history=chat_history, session_id=session.id)
+
+async def _release_session(session_id: str):
+    """
+    Frees the tool state of a deleted or evicted session: its interpreter, shell, background jobs and memo.
+    """
+    # These take locks and kill worker processes: run them off the event loop.
+    await run_in_threadpool(python_sandbox.reset, session_id)
+    await run_in_threadpool(shell_manager.reset, session_id)
+    await run_in_threadpool(shell_jobs.reset, session_id)
+    tool_memo.clear(session_id)
+
+async def _release_evicted():
+    for session_id in sessions.pop_evicted():
+        await _release_session(session_id)
+
+async def _get_session(session_id: str) -> ChatSession:
+    session = sessions.get(session_id)
+    await _release_evicted()
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Unknown session {session_id}")
+    return session
+
+async def _get_or_create_session(session_id: Optional[str]) -> ChatSession:
+    session = sessions.get_or_create(session_id)
+    await _release_evicted()
+    return session
+
+def _sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "sessions": len(sessions)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """
+    Prometheus text exposition of the sampled request, LLM, tool and retrieval metrics.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/sessions")
+async def create_session():
+    session = sessions.create()
+    await _release_evicted()
+    return {"session_id": session.id}
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    session = await _get_session(session_id)
+    return {"session_id": session.id, "chat_history": session.history}
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Unknown session {session_id}")
+    await _release_session(session_id)
+    return {"deleted": session_id}
+
+@app.post("/chat")
+async def chat(request: ChatRequest):
+    session = await _get_or_create_session(request.session_id)
+    async with session.lock:
+        result = await _chat(request, session)
+        session.add_turn(request.question, result["result"])
+    return {"session_id": session.id, "query": request.question, "result": result["result"]}
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Server-sent events: a "session" event first, then the events of backend/streaming.py
+    (thought, tool_start, tool_end, token) and a closing "final" or "error" event.
+    """
+    session = await _get_or_create_session(request.session_id)
+
+    async def events():
+        yield _sse({"type": "session", "session_id": session.id})
+        async with session.lock:
+            async for event in _stream_chat(request, session):
+                if event["type"] == "final":
+                    session.add_turn(request.question, event["result"]["result"])
+                    event = {"type": "final", "result": event["result"]["result"]}
+                yield _sse(event)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
@@ -0,0 +1,161 @@
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, List, Optional
+from langchain_core.documents import Document
+from langchain_core.retrievers import RetrieverLike
+from langchain_core.runnables import (
+    RunnableConfig
+)
+from tools.retrieval_merge import MERGE_STRATEGIES
+from tools.vdb_registry import VectorStoreRegistry, vdb_registry
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("RETRIEVAL_MAX_WORKERS", "8")), thread_name_prefix="retrieval")
+
+class RetrievalResult(list):
+    """
+    List of documents returned by CombinedRetriever.
+
+    Behaves exactly like a plain list, with extra attributes describing the fan-out:
+        partial (bool): True when at least one index did not answer in time or failed.
+        timed_out (list): Names of the indexes that missed the deadline.
+        failed (dict): Index name -> error message for the indexes that raised.
+    """
+    def __init__(self, documents=(), timed_out=None, failed=None):
+        super().__init__(documents)
+        self.timed_out = timed_out or []
+        self.failed = failed or {}
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.timed_out or self.failed)
+
+class CombinedRetriever(RetrieverLike):
+    """
+    Retriever that queries every index in parallel and merges the results into a single ranking.
+
+    Sync calls fan out over a shared thread pool and async calls use the stores' native async search,
+    so the latency of a query is the slowest index instead of the sum of all of them.
+    Indexes that do not answer within `timeout` seconds are left out and the result is flagged as partial.
+
+    In the sync path the deadline of a search runs from when a pool thread starts it, not from when it
+    was queued; a search still queued after `timeout` seconds is cancelled and counted as timed out, so a
+    call takes at most twice `timeout`. A search that started and missed its deadline cannot be stopped:
+    it keeps its pool thread until the client call returns, so size RETRIEVAL_MAX_WORKERS for the
+    concurrent fan-outs expected while an index is slow.
+
+    Each index returns its `per_index_k` best (document, score) pairs; the merge strategy
+    ("score" global top-k, "rrf" reciprocal-rank fusion or "concat") then keeps the best `k`
+    chunks overall, dropping duplicated chunks and chunks contained in another one.
+    """
+    def __init__(self, index_names: List[str], registry: VectorStoreRegistry = vdb_registry, timeout: Optional[float] = None,
+                 k: Optional[int] = None, per_index_k: Optional[int] = None, merge: Optional[str] = None):
+        self.index_names = index_names
+        self.registry = registry
+        self.timeout = timeout if timeout is not None else float(os.getenv("RETRIEVAL_INDEX_TIMEOUT", "10"))
+        self.k = k if k is not None else int(os.getenv("RETRIEVAL_TOP_K", "4"))
+        self.per_index_k = per_index_k if per_index_k is not None else self.k
+        self.merge = merge or os.getenv("RETRIEVAL_MERGE", "score")
+        if self.merge not in MERGE_STRATEGIES:
+            raise ValueError(f"Unknown merge strategy '{self.merge}', expected one of {list(MERGE_STRATEGIES)}.")
+
+    def _merge(self, scored):
+        return MERGE_STRATEGIES[self.merge](scored, self.k)
+
+    def _search(self, started, index_name, query):
+        started[index_name] = time.monotonic()
+        return self.registry.search_with_score(index_name, query, self.per_index_k)
+
+    def _wait(self, futures, started):
+        """
+        Waits until every search finished, missed the deadline counted from its start, or was
+        cancelled because it was still queued `timeout` seconds after the fan-out began.
+        """
+        queued_deadline = time.monotonic() + self.timeout
+        while True:
+            now = time.monotonic()
+            live = []
+            deadlines = []
+            for index_name, future in futures.items():
+                if future.done():
+                    continue
+                if index_name in started:
+                    deadline = started[index_name] + self.timeout
+                elif now < queued_deadline:
+                    deadline = queued_deadline
+                elif future.cancel():
+                    continue
+                else:
+                    # Picked up by a pool thread just now: it gets its own full deadline.
+                    deadline = started.get(index_name, now) + self.timeout
+                if deadline > now:
+                    live.append(future)
+                    deadlines.append(deadline)
+            if not live:
+                return
+            wait(live, timeout=min(deadlines) - now, return_when=FIRST_COMPLETED)
+
+    def get_relevant_documents(self, query):
+        started = {}
+        # Each search runs in a copy of the caller's context so per-request context variables (tracing) follow it.
+        futures = {
+            index_name: _executor.submit(contextvars.copy_context().run, self._search, started, index_name, query)
+            for index_name in self.index_names
+        }
+        self._wait(futures, started)
+
+        scored = {}
+        timed_out = []
+        failed = {}
+        for index_name, future in futures.items():
+            if future.cancelled() or not future.done():
+                timed_out.append(index_name)
+            elif future.exception() is not None:
+                failed[index_name] = str(future.exception())
+            else:
+                scored[index_name] = future.result()
+        if timed_out or failed:
+            print(f"Partial retrieval: timed out {timed_out}, failed {list(failed)}")
+        return RetrievalResult(self._merge(scored), timed_out=timed_out, failed=failed)
+
+    async def aget_relevant_documents(self, query):
+        outcomes = await asyncio.gather(
+            *[asyncio.wait_for(self.registry.asearch_with_score(index_name, query, self.per_index_k), timeout=self.timeout) for index_name in self.index_names],
+            return_exceptions=True
+        )
+
+        scored = {}
+        timed_out = []
+        failed = {}
+        for index_name, outcome in zip(self.index_names, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                timed_out.append(index_name)
+            elif isinstance(outcome, BaseException):
+                failed[index_name] = str(outcome)
+            else:
+                scored[index_name] = outcome
+        if timed_out or failed:
+            print(f"Partial retrieval: timed out {timed_out}, failed {list(failed)}")
+        return RetrievalResult(self._merge(scored), timed_out=timed_out, failed=failed)
+
+    def as_retriever(self):
+        return self
+
+    def with_config(self, config):
+        return self
+
+    def retrieve(self, input):
+        query = input['input']
+        return self.get_relevant_documents(query)
+
+    def invoke(
+        self, input: str, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> List[Document]:
+        return self.get_relevant_documents(input)
+
+    async def ainvoke(
+        self, input: str, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> List[Document]:
+        return await self.aget_relevant_documents(input)
@@ -0,0 +1,121 @@
+import fnmatch
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Directory walking behind the list_files_in_directory tool.
+
+DEFAULT_IGNORE = (".git", "__pycache__", "node_modules", ".venv", "venv", ".mypy_cache", ".pytest_cache",
+                  ".idea", ".DS_Store", ".local_vdb", ".ingestion_manifest", ".embedding_store")
+
+# (name, is_dir, size, mtime) as returned by one os.scandir pass; is_dir is False for symlinks to directories.
+Entry = Tuple[str, bool, int, float]
+
+class ScanCache:
+    """
+    Short-lived cache of os.scandir results per directory, so an agent re-listing the same tree
+    (e.g. to read the next page) does not stat it again.
+
+    An entry is reused for `ttl` seconds (DIR_LIST_CACHE_TTL, default 10) as long as the directory's own
+    mtime is unchanged, which catches files being added, removed or renamed; sizes of files modified in
+    place may be up to `ttl` seconds stale.
+    """
+    def __init__(self, ttl: Optional[float] = None, max_dirs: int = 4096):
+        self.ttl = ttl if ttl is not None else float(os.getenv("DIR_LIST_CACHE_TTL", "10"))
+        self.max_dirs = max_dirs
+        self._entries: Dict[str, Tuple[float, int, List[Entry]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def scan(self, path: str) -> List[Entry]:
+        mtime_ns = os.stat(path).st_mtime_ns
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None and now - cached[0] <= self.ttl and cached[1] == mtime_ns:
+                self.hits += 1
+                return cached[2]
+            self.misses += 1
+
+        entries = []
+        with os.scandir(path) as iterator:
+            for item in iterator:
+                try:
+                    # DirEntry caches the stat result, so each entry costs at most one stat call.
+                    stat = item.stat(follow_symlinks=False)
+                    is_dir = item.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                entries.append((item.name, is_dir, 0 if is_dir else stat.st_size, stat.st_mtime))
+
+        with self._lock:
+            if len(self._entries) >= self.max_dirs:
+                self._entries.clear()
+            self._entries[path] = (now, mtime_ns, entries)
+        return entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+scan_cache = ScanCache()
+
+def _ignored(name: str, rules: Iterable[str]) -> bool:
+    return any(fnmatch.fnmatch(name, rule) for rule in rules)
+
+def walk(root: str, max_depth: int, ignore: Iterable[str], max_entries: int, cache: ScanCache = scan_cache) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Lists `root` breadth-first down to `max_depth` levels (1 = only the directory itself), skipping names that
+    match an ignore rule. Returns the entries (relative path, type, size, mtime) and whether `max_entries` was hit.
+    """
+    rules = tuple(ignore)
+    found = []
+    pending = deque([("", 1)])
+    while pending:
+        relative, depth = pending.popleft()
+        try:
+            entries = cache.scan(os.path.join(root, relative) if relative else root)
+        except OSError:
+            continue
+        for name, is_dir, size, mtime in entries:
+            if _ignored(name, rules):
+                continue
+            path = os.path.join(relative, name) if relative else name
+            found.append({"name": path, "type": "dir" if is_dir else "file", "size": size, "mtime": mtime})
+            if len(found) >= max_entries:
+                return found, True
+            if is_dir and depth < max_depth:
+                pending.append((path, depth + 1))
+    return found, False
+
+def matches(entry: Dict[str, Any], pattern: Optional[str], extensions: Optional[List[str]]) -> bool:
+    if pattern and not (fnmatch.fnmatch(entry["name"], pattern) or fnmatch.fnmatch(os.path.basename(entry["name"]), pattern)):
+        return False
+    if extensions:
+        suffixes = tuple(e if e.startswith(".") else "." + e for e in extensions)
+        if not entry["name"].lower().endswith(tuple(s.lower() for s in suffixes)):
+            return False
+    return True
+
+def query_key(query: Dict[str, Any]) -> str:
+    """
+    Short fingerprint of the listing parameters, embedded in cursors so a cursor cannot be replayed
+    against a different listing.
+    """
+    return hashlib.sha1(json.dumps(query, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:8]
+
+def make_cursor(offset: int, key: str) -> str:
+    return f"{offset}:{key}"
+
+def parse_cursor(cursor: Optional[str], key: str) -> int:
+    if not cursor:
+        return 0
+    offset, _, cursor_key = str(cursor).partition(":")
+    if cursor_key != key or not offset.isdigit():
+        raise ValueError("The cursor does not belong to this listing; repeat the same parameters or start without a cursor.")
+    return int(offset)
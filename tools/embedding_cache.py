@@ -0,0 +1,218 @@
+import asyncio
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from langchain_core.embeddings import Embeddings
+from tools.retrieval_merge import normalize_text
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query vectors with a time-to-live, optionally persisted to a sqlite file.
+
+    Keys are (embedding model, normalized query), so the same question with different spacing or
+    casing maps to the same vector. The in-memory layer holds at most `max_entries` vectors; the sqlite
+    layer, when `path` is given, lets the vectors survive restarts and is consulted on in-memory misses.
+
+    Writes to sqlite are buffered and committed in batches of `flush_every` vectors (or after
+    `flush_interval` seconds), outside the lock of the in-memory layer. Each flush deletes the expired rows
+    and keeps only the `max_disk_entries` most recent ones, so the file stays bounded.
+    """
+    def __init__(self, max_entries: int = 2048, ttl: Optional[float] = 24 * 3600, path: Optional[str] = None,
+                 max_disk_entries: int = 100000, flush_every: int = 32, flush_interval: float = 5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._db = None
+        # Vectors not written to sqlite yet: key -> (created, blob).
+        self._pending: Dict[str, Any] = {}
+        self._last_flush = time.monotonic()
+        self._db_lock = threading.Lock()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS query_embeddings (key TEXT PRIMARY KEY, created REAL, vector BLOB)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS query_embeddings_created ON query_embeddings (created)")
+            self._db.commit()
+            atexit.register(self.flush)
+
+    @staticmethod
+    def make_key(model: str, query: str) -> str:
+        return hashlib.sha1(f"{model}\x00{normalize_text(query)}".encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, vector = entry
+                if not self._expired(created):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+            row = self._pending.get(key)
+
+        if row is None and self._db is not None:
+            with self._db_lock:
+                row = self._db.execute("SELECT created, vector FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+
+        with self._lock:
+            if row is not None and not self._expired(row[0]):
+                vector = array("f", row[1]).tolist()
+                self._put_memory(key, row[0], vector)
+                self.hits += 1
+                return vector
+            self.misses += 1
+            return None
+
+    def _put_memory(self, key: str, created: float, vector: List[float]):
+        self._entries[key] = (created, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def put(self, key: str, vector: List[float]):
+        created = time.time()
+        with self._lock:
+            self._put_memory(key, created, vector)
+            if self._db is None:
+                return
+            self._pending[key] = (created, array("f", vector).tobytes())
+            due = len(self._pending) >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered vectors to sqlite in one transaction, then prunes expired and excess rows.
+        """
+        if self._db is None:
+            return
+        with self._db_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._last_flush = time.monotonic()
+            self._db.executemany(
+                "INSERT OR REPLACE INTO query_embeddings (key, created, vector) VALUES (?, ?, ?)",
+                [(key, created, blob) for key, (created, blob) in pending.items()]
+            )
+            if self.ttl is not None:
+                self._db.execute("DELETE FROM query_embeddings WHERE created < ?", (time.time() - self.ttl,))
+            self._db.execute(
+                "DELETE FROM query_embeddings WHERE key NOT IN (SELECT key FROM query_embeddings ORDER BY created DESC LIMIT ?)",
+                (self.max_disk_entries,)
+            )
+            self._db.commit()
+
+    def clear(self):
+        with self._db_lock:
+            with self._lock:
+                self._entries.clear()
+                self._pending.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM query_embeddings")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "persistent": self._db is not None
+            }
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves embed_query from a QueryEmbeddingCache.
+
+    Concurrent misses for the same key (e.g. the same query fanned out to several indexes) wait for the
+    first caller instead of each calling the API. embed_documents is passed through untouched.
+    """
+    def __init__(self, embeddings: Embeddings, model: str, cache: QueryEmbeddingCache):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = QueryEmbeddingCache.make_key(self.model, text)
+        vector = self.cache.get(key)
+        if vector is not None:
+            return vector
+
+        with self._inflight_lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = threading.Event()
+                self._inflight[key] = event
+        if not leader:
+            event.wait()
+            vector = self.cache.get(key)
+            if vector is not None:
+                return vector
+            return self.embeddings.embed_query(text)
+
+        try:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(key, vector)
+            return vector
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+            event.set()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = QueryEmbeddingCache.make_key(self.model, text)
+        # With a sqlite file, get and put may hit the disk: keep that off the event loop.
+        persistent = self.cache.path is not None
+        vector = await asyncio.to_thread(self.cache.get, key) if persistent else self.cache.get(key)
+        if vector is not None:
+            return vector
+        vector = await self.embeddings.aembed_query(text)
+        if persistent:
+            await asyncio.to_thread(self.cache.put, key, vector)
+        else:
+            self.cache.put(key, vector)
+        return vector
+
+def cache_from_env() -> QueryEmbeddingCache:
+    """
+    Builds the query cache from QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL (seconds, 0 disables expiry),
+    QUERY_EMBEDDING_CACHE_PATH (sqlite file, unset keeps the cache in memory only) and
+    QUERY_EMBEDDING_CACHE_DISK_SIZE (rows kept in the sqlite file, default 100000).
+    """
+    ttl = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", str(24 * 3600)))
+    return QueryEmbeddingCache(
+        max_entries=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048")),
+        ttl=ttl or None,
+        path=os.getenv("QUERY_EMBEDDING_CACHE_PATH") or None,
+        max_disk_entries=int(os.getenv("QUERY_EMBEDDING_CACHE_DISK_SIZE", "100000"))
+    )
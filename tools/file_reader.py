@@ -0,0 +1,231 @@
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Reading helpers behind the load_file tool. Every function reads only the part of the file it returns
+# (plus, for line ranges, the bytes up to the first requested line), never the whole file.
+
+BLOCK_SIZE = 64 * 1024
+
+def output_budget() -> int:
+    return int(os.getenv("FILE_TOOL_MAX_CHARS", "8000"))
+
+def decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+def truncation_marker(reason: str) -> str:
+    return f"\n[... truncated: {reason} ...]"
+
+def read_bytes(path: str, start: int, end: Optional[int], budget: int) -> Tuple[str, bool]:
+    """
+    Returns the text of bytes [start, end) (end=None for end of file), at most `budget` bytes, and whether it was cut.
+    """
+    size = os.path.getsize(path)
+    start = max(0, min(start, size))
+    end = size if end is None else max(start, min(end, size))
+    with open(path, 'rb') as file:
+        file.seek(start)
+        data = file.read(min(end - start, budget))
+    return decode(data), end - start > budget
+
+def head(path: str, lines: int, budget: int) -> Tuple[str, bool]:
+    """
+    Returns the first `lines` lines, reading forward block by block until they are found or the budget is spent.
+    """
+    data = bytearray()
+    with open(path, 'rb') as file:
+        while data.count(b"\n") < lines and len(data) < budget:
+            block = file.read(BLOCK_SIZE)
+            if not block:
+                break
+            data += block
+    cut = _nth(data, b"\n", lines)
+    if cut is not None:
+        data = data[:cut + 1]
+    return decode(bytes(data[:budget])), len(data) > budget
+
+def tail(path: str, lines: int, budget: int) -> Tuple[str, bool]:
+    """
+    Returns the last `lines` lines, reading backward from the end of the file.
+    """
+    size = os.path.getsize(path)
+    data = b""
+    position = size
+    with open(path, 'rb') as file:
+        # The newline ending the last line doesn't separate lines, hence the rstrip.
+        while position > 0 and data.rstrip(b"\n").count(b"\n") < lines and len(data) < budget:
+            step = min(BLOCK_SIZE, position)
+            position -= step
+            file.seek(position)
+            data = file.read(step) + data
+    body = data[:-1] if data.endswith(b"\n") else data
+    starts = [m.end() for m in re.finditer(b"\n", body)]
+    if len(starts) >= lines:
+        data = data[starts[-lines]:]
+    cut = len(data) > budget
+    return decode(data[-budget:] if cut else data), cut
+
+def _nth(data, needle: bytes, n: int) -> Optional[int]:
+    position = -1
+    for _ in range(n):
+        position = data.find(needle, position + 1)
+        if position < 0:
+            return None
+    return position
+
+class LineIndex:
+    """
+    Sparse map from line numbers to byte offsets (one checkpoint every `every` lines), built lazily
+    as far as the deepest line requested so far. Paging through a big file then costs the page, not the prefix.
+    """
+    def __init__(self, every: int = 1000):
+        self.every = every
+        self.offsets = [0]
+        self._lock = threading.Lock()
+
+    def offset_of(self, mapped, line: int) -> Optional[int]:
+        """
+        Byte offset where 1-based `line` starts, or None past the end of the file.
+        """
+        with self._lock:
+            return self._offset_of(mapped, line)
+
+    def _offset_of(self, mapped, line: int) -> Optional[int]:
+        checkpoint = min((line - 1) // self.every, len(self.offsets) - 1)
+        position = self.offsets[checkpoint]
+        current = checkpoint * self.every + 1
+        while current < line:
+            newline = mapped.find(b"\n", position)
+            if newline < 0:
+                return None
+            position = newline + 1
+            current += 1
+            if (current - 1) % self.every == 0 and (current - 1) // self.every == len(self.offsets):
+                self.offsets.append(position)
+        return position if position < len(mapped) else None
+
+_line_indexes: "OrderedDict[Tuple[str, int, int], LineIndex]" = OrderedDict()
+_line_indexes_lock = threading.Lock()
+
+def _line_index(path: str) -> LineIndex:
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _line_indexes_lock:
+        index = _line_indexes.get(key)
+        if index is None:
+            index = _line_indexes[key] = LineIndex()
+            while len(_line_indexes) > 32:
+                _line_indexes.popitem(last=False)
+        _line_indexes.move_to_end(key)
+        return index
+
+def read_lines(path: str, start: int, end: Optional[int], budget: int) -> Tuple[str, bool]:
+    """
+    Returns lines start..end (1-based, inclusive; end=None for the rest of the file), at most `budget` bytes.
+    """
+    if os.path.getsize(path) == 0:
+        return "", False
+    start = max(1, start)
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        index = _line_index(path)
+        begin = index.offset_of(mapped, start)
+        if begin is None:
+            return "", False
+        if end is None:
+            stop = len(mapped)
+        else:
+            newline = _nth_from(mapped, begin, max(0, end - start + 1))
+            stop = len(mapped) if newline is None else newline + 1
+        data = mapped[begin:min(stop, begin + budget)]
+        return decode(data), stop - begin > budget
+
+def _nth_from(mapped, position: int, n: int) -> Optional[int]:
+    newline = position - 1
+    for _ in range(n):
+        newline = mapped.find(b"\n", newline + 1)
+        if newline < 0:
+            return None
+    return newline
+
+def search(path: str, pattern: str, context: int, max_matches: int, budget: int, ignore_case: bool = False) -> Tuple[str, int, bool]:
+    """
+    Scans the file through mmap for `pattern` (a regular expression) and returns grep-style output:
+    matching lines as "<line>: text", context lines as "<line>- text", "--" between non-adjacent groups.
+
+    Returns (text, matches found, truncated). Scanning stops after `max_matches` matching lines or once
+    the output budget is used up.
+    """
+    if os.path.getsize(path) == 0:
+        return "", 0, False
+    regex = re.compile(pattern.encode("utf-8"), re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+    entries: List[list] = []
+    printed: Dict[int, int] = {}
+    used = 0
+    matches = 0
+    truncated = False
+    counted_to, counted_lines = 0, 1
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        position = 0
+        while position <= len(mapped):
+            match = regex.search(mapped, position)
+            # After a trailing newline, EOF is not a line: an empty match there is not reported.
+            if match is None or (match.start() == len(mapped) and mapped[-1:] == b"\n"):
+                break
+            line_start = mapped.rfind(b"\n", 0, match.start()) + 1
+            line_end = mapped.find(b"\n", match.start())
+            line_end = len(mapped) if line_end < 0 else line_end
+            position = line_end + 1
+
+            counted_lines += mapped[counted_to:line_start].count(b"\n")
+            counted_to = line_start
+            line_number = counted_lines
+            matches += 1
+
+            block: Dict[int, Tuple[str, bytes]] = {}
+            start, number = line_start, line_number
+            for _ in range(context):
+                if start == 0:
+                    break
+                start = mapped.rfind(b"\n", 0, start - 1) + 1
+                number -= 1
+                block[number] = ("-", mapped[start:mapped.find(b"\n", start)])
+            block[line_number] = (":", mapped[line_start:line_end])
+            after, number = line_end, line_number
+            for _ in range(context):
+                if after >= len(mapped) - 1:
+                    break
+                next_end = mapped.find(b"\n", after + 1)
+                next_end = len(mapped) if next_end < 0 else next_end
+                number += 1
+                block[number] = ("-", mapped[after + 1:next_end])
+                after = next_end
+
+            for number in sorted(block):
+                separator, text = block[number]
+                if number in printed:
+                    # Already shown as context of the previous match; it is a match itself now.
+                    if separator == ":":
+                        entries[printed[number]][1] = ":"
+                    continue
+                line = decode(text)
+                used += len(line) + len(str(number)) + 3
+                if used > budget:
+                    truncated = True
+                    break
+                printed[number] = len(entries)
+                entries.append([number, separator, line])
+            if truncated:
+                break
+            if matches >= max_matches:
+                truncated = regex.search(mapped, position) is not None
+                break
+
+    output = []
+    for i, (number, separator, line) in enumerate(entries):
+        if i and number > entries[i - 1][0] + 1:
+            output.append("--")
+        output.append(f"{number}{separator} {line}")
+    return "\n".join(output), matches, truncated
@@ -2,41 +2,92 @@ import ast
 import subprocess
 import platform
 import os
+import re
 from langchain.agents import tool
+from tools import dir_listing, file_reader
+from tools.tool_memo import created_file_tags, describe_file_read, describe_listing, invalidates, memoized, path_tags
 
 @tool
-def list_files_in_directory(directory_path: str) -> list:
+@memoized(describe_listing)
+def list_files_in_directory(directory_definition: str) -> dict:
     """
-    Lists files in the given directory path and returns their names and sizes.
+    Lists files in the given directory path and returns their names and sizes, one page at a time.
+    
+    The input is either a plain directory path, which lists the files directly inside it, or a string
+    representation of a dictionary in the following format:
+    "{'directory_path': 'foo', 'recursive': True, 'pattern': '*.py'}"
     
     Parameters:
-        directory_path (str): The path to the directory to list files from.
+        directory_definition (str): A directory path, or a string representation of a dictionary containing:
+            - directory_path (str): The path to the directory to list files from.
+            - recursive (bool): Also list subdirectories (default False).
+            - max_depth (int): Levels to descend when recursive, 1 being the directory itself (default 5).
+            - pattern (str): Glob matched against the relative path or the file name, e.g. '*.py' or 'src/*.ts'.
+            - extensions (list): Only files with these extensions, e.g. ['.py', '.md'].
+            - include_dirs (bool): Also return directories (default False).
+            - ignore (list): Extra names or globs to skip; .git, __pycache__, node_modules, virtualenvs and
+              similar are always skipped.
+            - sort (str): 'name' (default), 'size' or 'mtime'.
+            - descending (bool): Reverse the sort order (default False).
+            - limit (int): Entries per page (default 100).
+            - cursor (str): The next_cursor of the previous page, with otherwise identical parameters.
     
     Returns:
-        list: A list of dictionaries containing the name and size of each file in bytes.
+        dict: {'entries': [{'name': relative path, 'size': bytes}, ...], 'total': matching entries,
+        'next_cursor': cursor of the next page or None}. Directories are marked with 'type': 'dir'.
+        
+    The input parameter must not contain any format specifiers such as:
+    ```json
+    ```
     """
-    files_info = []
-
     try:
+        definition = directory_definition.strip()
+        request = ast.literal_eval(definition) if definition.startswith("{") else {"directory_path": definition}
+        directory_path = request["directory_path"]
         # Check if the provided path is a directory
         if not os.path.isdir(directory_path):
             raise ValueError(f"The path '{directory_path}' is not a directory.")
-        
-        # List files in the directory
-        for file_name in os.listdir(directory_path):
-            file_path = os.path.join(directory_path, file_name)
-            
-            # Only process files (skip directories)
-            if os.path.isfile(file_path):
-                file_size = os.path.getsize(file_path)
-                files_info.append({"name": file_name, "size": file_size})
-    
+
+        max_depth = int(request.get("max_depth", 5)) if request.get("recursive") else 1
+        include_dirs = bool(request.get("include_dirs", False))
+        sort = request.get("sort", "name")
+        if sort not in ("name", "size", "mtime"):
+            raise ValueError(f"Unknown sort {sort!r}; use 'name', 'size' or 'mtime'.")
+        limit = max(1, int(request.get("limit", 100)))
+        query = {k: v for k, v in request.items() if k != "cursor"}
+        key = dir_listing.query_key({**query, "directory_path": os.path.abspath(directory_path)})
+        offset = dir_listing.parse_cursor(request.get("cursor"), key)
+
+        found, capped = dir_listing.walk(
+            directory_path, max_depth, dir_listing.DEFAULT_IGNORE + tuple(request.get("ignore", ())),
+            max_entries=int(os.getenv("DIR_LIST_MAX_ENTRIES", "50000"))
+        )
+        selected = [
+            entry for entry in found
+            if (include_dirs or entry["type"] == "file") and dir_listing.matches(entry, request.get("pattern"), request.get("extensions"))
+        ]
+        selected.sort(key=lambda entry: entry[sort], reverse=bool(request.get("descending", False)))
+
+        page = []
+        for entry in selected[offset:offset + limit]:
+            item = {"name": entry["name"], "size": entry["size"]}
+            if entry["type"] == "dir":
+                item["type"] = "dir"
+            page.append(item)
+        result = {
+            "entries": page,
+            "total": len(selected),
+            "next_cursor": dir_listing.make_cursor(offset + limit, key) if offset + limit < len(selected) else None
+        }
+        if capped:
+            result["warning"] = "The walk stopped early at DIR_LIST_MAX_ENTRIES entries; narrow the directory or lower max_depth."
+        return result
     except Exception as e:
         print(f"An error occurred: {e}")
-    
-    return files_info
+        return {"error": str(e)}
 
 @tool
+@invalidates(created_file_tags)
 def create_file_in_folder(file_definition:str) -> str:
     """
     Creates a file within a specified folder and writes given content to it.
@@ -82,30 +133,84 @@ def create_file_in_folder(file_definition:str) -> str:
         return(f"An error occurred: {e}")
     
 @tool
-def load_file(file_path: str) -> str:
+@memoized(describe_file_read)
+def load_file(file_definition: str) -> str:
     """
-    Loads a file from the given path and returns its contents.
+    Loads a file, or the part of it you ask for, and returns its contents.
+    
+    The input is either a plain file path, which returns the beginning of the file, or a string representation
+    of a dictionary in the following format:
+    "{'file_path': 'foo.log', 'mode': 'tail', 'lines': 50}"
     
     Parameters:
-        file_path (str): The path to the file to be loaded.
+        file_definition (str): A file path, or a string representation of a dictionary containing:
+            - file_path (str): The path to the file to be loaded.
+            - mode (str): One of:
+                'head'   - the first `lines` lines (default 50).
+                'tail'   - the last `lines` lines (default 50).
+                'lines'  - lines `start` to `end`, 1-based and inclusive (end optional).
+                'bytes'  - bytes `start` to `end` (end optional, exclusive).
+                'search' - the lines matching the regular expression `pattern`, each with `context` lines around
+                           it (default 2), as "<line number>: text" ("-" instead of ":" for context lines).
+                           Optional: 'max_matches' (default 50), 'ignore_case' (default False).
     
     Returns:
-        str: The contents of the file.
+        str: The requested contents. Output longer than the output budget is cut and ends with a
+        "[... truncated ...]" marker; narrow the request (ranges, tail, search) to see other parts.
         
-    Raises:
-        FileNotFoundError: If the file does not exist at the given path.
-        IOError: If there is an error reading the file.
+    The input parameter must not contain any format specifiers such as:
+    ```json
+    ```
+    
+    Example input:
+    "{'file_path': 'server.log', 'mode': 'search', 'pattern': 'ERROR|Traceback', 'context': 3}"
     """
     try:
-        with open(file_path, 'r') as file:
-            contents = file.read()
-        return contents
-    except FileNotFoundError:
-        return f"Error: The file at {file_path} was not found."
+        definition = file_definition.strip()
+        request = ast.literal_eval(definition) if definition.startswith("{") else {"file_path": definition, "mode": "bytes", "start": 0}
+        file_path = request["file_path"]
+        mode = request.get("mode", "bytes")
+        budget = file_reader.output_budget()
+        if not os.path.isfile(file_path):
+            return f"Error: The file at {file_path} was not found."
+
+        if mode == "head":
+            text, truncated = file_reader.head(file_path, int(request.get("lines", 50)), budget)
+        elif mode == "tail":
+            text, truncated = file_reader.tail(file_path, int(request.get("lines", 50)), budget)
+        elif mode == "lines":
+            end = request.get("end")
+            text, truncated = file_reader.read_lines(file_path, int(request.get("start", 1)), None if end is None else int(end), budget)
+        elif mode == "bytes":
+            end = request.get("end")
+            text, truncated = file_reader.read_bytes(file_path, int(request.get("start", 0)), None if end is None else int(end), budget)
+        elif mode == "search":
+            text, matches, truncated = file_reader.search(
+                file_path, request["pattern"], int(request.get("context", 2)), int(request.get("max_matches", 50)),
+                budget, bool(request.get("ignore_case", False))
+            )
+            if not matches:
+                return f"No lines of {file_path} match {request['pattern']!r}."
+        else:
+            return f"Error: Unknown mode {mode!r}; use 'head', 'tail', 'lines', 'bytes' or 'search'."
+
+        if truncated:
+            if mode == "search" and matches >= int(request.get("max_matches", 50)):
+                reason = f"more lines match after the first {matches}; raise 'max_matches' or narrow the pattern"
+            elif mode == "search":
+                reason = f"the output budget of {budget} characters was reached after {matches} matches; narrow the pattern or lower 'context'"
+            else:
+                reason = (f"the output budget of {budget} characters was reached (file size: {os.path.getsize(file_path)} bytes); "
+                          "use the 'lines', 'bytes', 'tail' or 'search' modes to read other parts")
+            text += file_reader.truncation_marker(reason)
+        return text
+    except (ValueError, SyntaxError, KeyError, re.error) as e:
+        return f"Error: Invalid input. {e}"
     except IOError as e:
         return f"Error: An error occurred while reading the file. {e}"
     
 @tool
+@invalidates(path_tags)
 def delete_file(file_path: str) -> str:
     """
     Deletes a file at the given path.
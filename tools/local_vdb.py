@@ -0,0 +1,291 @@
+import heapq
+import json
+import os
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+LOCAL_PREFIX = "local:"
+
+MANIFEST_FILE = "manifest.json"
+
+class _Segment:
+    """
+    One immutable pair of files written by a single add or delete: `vectors` (.npy, opened memory-mapped,
+    absent for deletes) and `docs` (.jsonl, one {"id", "text", "metadata"} line per matrix row,
+    or {"id", "deleted": true} tombstones).
+    """
+    def __init__(self, directory: str, entry: Dict[str, Optional[str]]):
+        self.entry = entry
+        self.vectors = np.load(os.path.join(directory, entry["vectors"]), mmap_mode="r") if entry.get("vectors") else None
+        self.ids = []
+        self.texts = []
+        self.metadatas = []
+        self.deleted = []
+        with open(os.path.join(directory, entry["docs"]), 'r', encoding="utf-8") as file:
+            for line in file:
+                row = json.loads(line)
+                if row.get("deleted"):
+                    self.deleted.append(row["id"])
+                else:
+                    self.ids.append(row["id"])
+                    self.texts.append(row["text"])
+                    self.metadatas.append(row["metadata"])
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store kept as NumPy matrices of L2-normalized float32 embeddings.
+
+    On disk an index is a folder under LOCAL_VDB_DIR (default ".local_vdb") holding append-only segments
+    (see _Segment) and manifest.json, which lists the live segments in write order. A write adds one segment
+    and then swaps the manifest atomically, so a batch costs I/O proportional to the batch and a crash leaves
+    either the old or the new version, never vectors and metadata out of sync. Later segments win for
+    a repeated id. Once there are more than `max_segments` segments (LOCAL_VDB_MAX_SEGMENTS, default 16),
+    or more replaced/deleted rows than live ones, the live rows are compacted into a single segment.
+
+    Every read and write first checks the manifest's mtime, so long-lived handles (e.g. the registry's)
+    see writes made by other handles or processes. Writers are expected to be one process at a time,
+    like the ingestion scripts.
+
+    Queries are scored with one matrix-vector product per segment (cosine similarity, higher is better),
+    so it can be used offline as a drop-in for PineconeVectorStore, including from_documents and as_retriever.
+    """
+    def __init__(self, index_name: str, embedding: Embeddings, root: Optional[str] = None, max_segments: Optional[int] = None):
+        self.index_name = index_name
+        self.embedding = embedding
+        self.root = root or os.getenv("LOCAL_VDB_DIR", ".local_vdb")
+        self.path = os.path.join(self.root, index_name)
+        self.max_segments = max_segments or int(os.getenv("LOCAL_VDB_MAX_SEGMENTS", "16"))
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._version = 0
+        self._entries: List[Dict[str, Optional[str]]] = []
+        self._segments: List[_Segment] = []
+        # Per segment, which of its rows are still the current version of their id.
+        self._masks: List[np.ndarray] = []
+        # id -> (segment position, row)
+        self._live: Dict[str, Tuple[int, int]] = {}
+        with self._lock:
+            self._refresh()
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding
+
+    def _manifest_file(self) -> str:
+        return os.path.join(self.path, MANIFEST_FILE)
+
+    def _current_fingerprint(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self._manifest_file())
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _read_manifest(self) -> Tuple[int, List[Dict[str, Optional[str]]]]:
+        try:
+            with open(self._manifest_file(), 'r', encoding="utf-8") as file:
+                manifest = json.load(file)
+            return manifest["version"], manifest["segments"]
+        except FileNotFoundError:
+            return 0, []
+
+    def _refresh(self):
+        """
+        Brings the in-memory view up to date with the manifest; caller holds the lock.
+        Appended segments are loaded incrementally, anything else (a compaction) reloads the index.
+        """
+        fingerprint = self._current_fingerprint()
+        if fingerprint == self._fingerprint:
+            return
+        version, entries = self._read_manifest()
+        if entries[:len(self._entries)] != self._entries:
+            self._entries, self._segments, self._masks, self._live = [], [], [], {}
+        for entry in entries[len(self._entries):]:
+            self._apply(_Segment(self.path, entry))
+        self._entries = entries
+        self._version = version
+        self._fingerprint = fingerprint
+
+    def _apply(self, segment: _Segment):
+        position = len(self._segments)
+        # Masks are replaced rather than modified, so searches running on an older snapshot stay consistent.
+        masks = self._masks + [np.ones(len(segment.ids), dtype=bool)]
+        copied = {position}
+
+        def drop(row_id: str):
+            previous = self._live.pop(row_id, None)
+            if previous is not None:
+                segment_position, row = previous
+                if segment_position not in copied:
+                    masks[segment_position] = masks[segment_position].copy()
+                    copied.add(segment_position)
+                masks[segment_position][row] = False
+
+        for row_id in segment.deleted:
+            drop(row_id)
+        for row, row_id in enumerate(segment.ids):
+            drop(row_id)
+            self._live[row_id] = (position, row)
+        self._segments = self._segments + [segment]
+        self._masks = masks
+
+    def _write_segment(self, vectors: Optional[np.ndarray], rows: List[dict]) -> Dict[str, Optional[str]]:
+        os.makedirs(self.path, exist_ok=True)
+        name = f"{self._version + 1:08d}-{uuid.uuid4().hex[:8]}"
+        entry = {"vectors": f"{name}.npy" if vectors is not None else None, "docs": f"{name}.jsonl"}
+        if vectors is not None:
+            with open(os.path.join(self.path, entry["vectors"]), 'wb') as file:
+                np.save(file, vectors)
+                file.flush()
+                os.fsync(file.fileno())
+        with open(os.path.join(self.path, entry["docs"]), 'w', encoding="utf-8") as file:
+            for row in rows:
+                file.write(json.dumps(row) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        return entry
+
+    def _commit(self, entries: List[Dict[str, Optional[str]]]):
+        """
+        Publishes a new list of segments by atomically replacing the manifest; caller holds the lock.
+        """
+        tmp = self._manifest_file() + ".tmp"
+        with open(tmp, 'w', encoding="utf-8") as file:
+            json.dump({"version": self._version + 1, "segments": entries}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, self._manifest_file())
+        self._refresh()
+
+    def _needs_compaction(self) -> bool:
+        rows = sum(len(segment.ids) for segment in self._segments)
+        return len(self._segments) > self.max_segments or rows - len(self._live) > len(self._live)
+
+    def _compact(self):
+        vectors, rows = [], []
+        for segment, mask in zip(self._segments, self._masks):
+            live_rows = np.flatnonzero(mask)
+            if len(live_rows):
+                vectors.append(np.asarray(segment.vectors[live_rows]))
+                rows.extend({"id": segment.ids[i], "text": segment.texts[i], "metadata": segment.metadatas[i]} for i in live_rows)
+        old_entries = self._entries
+        self._commit([self._write_segment(np.concatenate(vectors) if vectors else None, rows)])
+        # Readers in other processes may still map the old files: fine on POSIX, left behind where the OS refuses (Windows).
+        for entry in old_entries:
+            for name in (entry.get("vectors"), entry["docs"]):
+                if name:
+                    try:
+                        os.remove(os.path.join(self.path, name))
+                    except OSError:
+                        pass
+
+    def compact(self):
+        """
+        Rewrites the index as a single segment holding only the live rows.
+        """
+        with self._lock:
+            self._refresh()
+            if self._segments:
+                self._compact()
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._live)
+
+    def add_vectors(self, vectors: List[List[float]], texts: List[str], metadatas: Optional[List[dict]] = None,
+                    ids: Optional[List[str]] = None) -> List[str]:
+        """
+        Adds already computed embeddings. Existing rows with the same id are replaced;
+        within the batch, the last occurrence of an id wins.
+        """
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        new_vectors = self._normalize(np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1))
+        keep = sorted({row_id: position for position, row_id in enumerate(ids)}.values())
+        rows = [{"id": ids[i], "text": texts[i], "metadata": metadatas[i]} for i in keep]
+        with self._lock:
+            self._refresh()
+            self._commit(self._entries + [self._write_segment(new_vectors[keep], rows)])
+            if self._needs_compaction():
+                self._compact()
+        return ids
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = self.embedding.embed_documents(texts)
+        return self.add_vectors(vectors, texts, metadatas=metadatas, ids=ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        with self._lock:
+            self._refresh()
+            removed = [row_id for row_id in dict.fromkeys(ids) if row_id in self._live]
+            if not removed:
+                return False
+            self._commit(self._entries + [self._write_segment(None, [{"id": row_id, "deleted": True} for row_id in removed])])
+            if self._needs_compaction():
+                self._compact()
+        return True
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        with self._lock:
+            self._refresh()
+            segments, masks = self._segments, self._masks
+        query = self._normalize(np.asarray(embedding, dtype=np.float32))
+        # Best k of every segment, then the best k overall.
+        candidates = []
+        for segment, mask in zip(segments, masks):
+            live_rows = np.flatnonzero(mask)
+            if not len(live_rows):
+                continue
+            scores = (segment.vectors @ query)[live_rows]
+            count = min(k, len(scores))
+            for i in np.argpartition(-scores, count - 1)[:count]:
+                candidates.append((float(scores[i]), segment, int(live_rows[i])))
+        return [
+            (Document(page_content=segment.texts[row], metadata=dict(segment.metadatas[row])), score)
+            for score, segment, row in heapq.nlargest(k, candidates, key=lambda candidate: candidate[0])
+        ]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k=k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, k=k)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_by_vector_with_score(embedding, k=k)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   index_name: str = "default", ids: Optional[List[str]] = None, **kwargs: Any) -> "LocalVectorStore":
+        store = cls(index_name=index_name, embedding=embedding, root=kwargs.get("root"))
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+def is_local_index(index_name: str) -> bool:
+    return index_name.startswith(LOCAL_PREFIX)
+
+def strip_local_prefix(index_name: str) -> str:
+    return index_name[len(LOCAL_PREFIX):] if is_local_index(index_name) else index_name
@@ -1,7 +1,9 @@
 import platform
 from langchain.agents import tool
+from tools.tool_memo import describe_constant, memoized
 
 @tool
+@memoized(describe_constant)
 def get_os(param:str):
     """
     Returns the operating system name.
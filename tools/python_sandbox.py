@@ -0,0 +1,331 @@
+import atexit
+import json
+import os
+import selectors
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from langchain.agents import tool
+from tools.tool_context import current_session
+from tools.tool_memo import all_files, invalidates
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "python_worker.py")
+
+DEFAULT_PRELOAD = "math,json,re,datetime,collections,itertools,functools,statistics,random,decimal,fractions,csv"
+
+class SandboxResult:
+    """
+    Outcome of one run_python execution.
+    """
+    def __init__(self, output: str, error: Optional[str] = None, limit: Optional[str] = None, truncated: bool = False,
+                 restarted: bool = False, seconds: float = 0.0):
+        self.output = output
+        self.error = error
+        self.limit = limit
+        self.truncated = truncated
+        self.restarted = restarted
+        self.seconds = seconds
+
+class PythonWorker:
+    """
+    One sandboxed interpreter process (tools/python_worker.py) in its own process group.
+
+    Requests and responses are single JSON lines over the worker's stdin/stdout. The CPU and wall-clock
+    limits are enforced inside the worker, which interrupts the code and keeps its variables; `grace`
+    seconds after the wall-clock limit the worker is killed outright (code stuck in a C call, or
+    swallowing the interruption), which loses its state.
+    """
+    def __init__(self, python: str, preload: str, memory_mb: int):
+        env = {**os.environ, "PYTHON_WORKER_PRELOAD": preload, "PYTHON_WORKER_MEMORY_MB": str(memory_mb)}
+        self.process = subprocess.Popen(
+            [python, "-u", WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=env,
+            start_new_session=True
+        )
+        os.set_blocking(self.process.stdout.fileno(), False)
+        self._pending = b""
+        self.executions = 0
+        self.ready = False
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def _read_line(self, timeout: float) -> Optional[bytes]:
+        deadline = time.monotonic() + timeout
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.process.stdout, selectors.EVENT_READ)
+            while b"\n" not in self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not selector.select(remaining):
+                    return None
+                data = os.read(self.process.stdout.fileno(), 65536)
+                if not data:
+                    return None
+                self._pending += data
+        line, _, self._pending = self._pending.partition(b"\n")
+        return line
+
+    def wait_ready(self, timeout: float) -> bool:
+        if not self.ready:
+            line = self._read_line(timeout)
+            self.ready = line is not None and json.loads(line).get("ready", False)
+        return self.ready
+
+    def execute(self, code: str, cpu_seconds: float, wall_seconds: float, max_output: int, grace: float) -> Optional[Dict[str, Any]]:
+        """
+        Returns the worker's response, or None when the worker died or had to be killed.
+        """
+        request = {"code": code, "cpu_seconds": cpu_seconds, "wall_seconds": wall_seconds, "max_output": max_output}
+        try:
+            self.process.stdin.write((json.dumps(request) + "\n").encode("utf-8"))
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            return None
+        self.executions += 1
+        line = self._read_line(wall_seconds + grace)
+        return json.loads(line) if line is not None else None
+
+    def close(self):
+        if self.alive:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            stream.close()
+
+class _Session:
+    def __init__(self, worker: PythonWorker):
+        self.worker = worker
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        # Set (under self.lock) once the session was evicted or reset and its worker closed.
+        self.closed = False
+
+class PythonSandbox:
+    """
+    Pool of pre-started Python workers behind the run_python tool.
+
+    `size` workers are kept started and warm (common modules already imported), so an execution never
+    waits for an interpreter to boot. The first execution of a conversation (see tools/tool_context.py)
+    takes a warm worker and keeps it: variables, imports and functions persist across that conversation's
+    calls, and the pool is refilled in the background. Conversations idle for `session_ttl` seconds, or
+    beyond `max_sessions`, give their worker back to the OS, unless it is running code at that moment.
+
+    Each execution is limited in CPU time, wall-clock time and output size, and each worker in address
+    space. Everything runs outside the server process, so a runaway loop or a memory blow-up only costs
+    that conversation's interpreter. This is isolation, not a security boundary: the code runs with the
+    server's user, filesystem and network access.
+
+    Parameters (environment variable, default):
+        size (PYTHON_POOL_SIZE, 2): Warm workers kept ready.
+        max_sessions (PYTHON_MAX_SESSIONS, 16): Conversations holding an interpreter at once.
+        session_ttl (PYTHON_SESSION_TTL, 1800): Idle seconds before a conversation's interpreter is dropped.
+        cpu_seconds (PYTHON_CPU_SECONDS, 30): CPU time per execution.
+        wall_seconds (PYTHON_WALL_SECONDS, 60): Wall-clock time per execution.
+        memory_mb (PYTHON_MEMORY_MB, 1024): Address space per worker (0 disables the limit).
+        max_output (PYTHON_MAX_OUTPUT, 20000): Characters of output returned per execution.
+        preload (PYTHON_PRELOAD): Comma-separated modules imported by every worker at start.
+    """
+    def __init__(self, size: Optional[int] = None, max_sessions: Optional[int] = None, session_ttl: Optional[float] = None,
+                 cpu_seconds: Optional[float] = None, wall_seconds: Optional[float] = None, memory_mb: Optional[int] = None,
+                 max_output: Optional[int] = None, preload: Optional[str] = None, python: Optional[str] = None, grace: float = 2.0):
+        self.size = size if size is not None else int(os.getenv("PYTHON_POOL_SIZE", "2"))
+        self.max_sessions = max_sessions or int(os.getenv("PYTHON_MAX_SESSIONS", "16"))
+        self.session_ttl = session_ttl or float(os.getenv("PYTHON_SESSION_TTL", "1800"))
+        self.cpu_seconds = cpu_seconds or float(os.getenv("PYTHON_CPU_SECONDS", "30"))
+        self.wall_seconds = wall_seconds or float(os.getenv("PYTHON_WALL_SECONDS", "60"))
+        self.memory_mb = memory_mb if memory_mb is not None else int(os.getenv("PYTHON_MEMORY_MB", "1024"))
+        self.max_output = max_output or int(os.getenv("PYTHON_MAX_OUTPUT", "20000"))
+        self.preload = preload if preload is not None else os.getenv("PYTHON_PRELOAD", DEFAULT_PRELOAD)
+        self.python = python or sys.executable
+        self.grace = grace
+        self._lock = threading.Lock()
+        self._warm: List[PythonWorker] = []
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._refilling = False
+        self.spawned = 0
+        self.restarts = 0
+
+    def _spawn(self) -> PythonWorker:
+        worker = PythonWorker(self.python, self.preload, self.memory_mb)
+        with self._lock:
+            self.spawned += 1
+        return worker
+
+    def _refill(self):
+        try:
+            while True:
+                with self._lock:
+                    if len(self._warm) >= self.size:
+                        return
+                worker = self._spawn()
+                worker.wait_ready(30.0)
+                with self._lock:
+                    self._warm.append(worker)
+        finally:
+            with self._lock:
+                self._refilling = False
+
+    def prestart(self):
+        """
+        Starts the warm workers in the background (called on first use; call it at startup to warm up earlier).
+        """
+        with self._lock:
+            if self._refilling or len(self._warm) >= self.size:
+                return
+            self._refilling = True
+        threading.Thread(target=self._refill, name="python-sandbox-refill", daemon=True).start()
+
+    def _take_worker(self) -> PythonWorker:
+        with self._lock:
+            worker = self._warm.pop() if self._warm else None
+        self.prestart()
+        return worker if worker is not None and worker.alive else self._spawn()
+
+    def _evict(self, keep: str) -> List[PythonWorker]:
+        """
+        Drops expired conversations and the least recently used ones beyond max_sessions, never `keep`
+        (the conversation that just got its worker); caller holds the lock.
+
+        A conversation whose interpreter is running code is never a victim (the pool may stay above
+        max_sessions until it finishes): its session lock is taken without waiting, and a session that
+        lost the race to _session() is marked closed so execute() fetches a new one.
+        """
+        now = time.monotonic()
+        excess = len(self._sessions) - self.max_sessions
+        workers = []
+        for key, session in list(self._sessions.items()):
+            expired = now - session.last_used > self.session_ttl
+            if key == keep or not (expired or excess > 0) or not session.lock.acquire(blocking=False):
+                continue
+            try:
+                del self._sessions[key]
+                session.closed = True
+                workers.append(session.worker)
+            finally:
+                session.lock.release()
+            excess -= 1
+        return workers
+
+    def _session(self, session_id: str) -> _Session:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                return session
+        session = _Session(self._take_worker())
+        with self._lock:
+            existing = self._sessions.get(session_id)
+            if existing is None:
+                self._sessions[session_id] = session
+                stale = self._evict(session_id)
+            else:
+                stale = [session.worker]
+                session = existing
+        for worker in stale:
+            worker.close()
+        return session
+
+    def execute(self, code: str, session_id: str) -> SandboxResult:
+        """
+        Runs `code` in the interpreter of `session_id`, starting from a warm worker on its first call.
+        """
+        session = self._session(session_id)
+        session.lock.acquire()
+        while session.closed:
+            session.lock.release()
+            session = self._session(session_id)
+            session.lock.acquire()
+        try:
+            session.last_used = time.monotonic()
+            worker = session.worker
+            response = None
+            if worker.wait_ready(30.0):
+                response = worker.execute(code, self.cpu_seconds, self.wall_seconds, self.max_output, self.grace)
+            if response is None:
+                # Killed at the hard deadline, or crashed (e.g. a native allocation beyond the memory limit).
+                worker.close()
+                session.worker = self._take_worker()
+                with self._lock:
+                    self.restarts += 1
+                return SandboxResult(output="", error=f"The interpreter did not finish within {self.wall_seconds + self.grace:g} seconds or crashed, and was restarted.",
+                                     limit="wall", restarted=True)
+            session.last_used = time.monotonic()
+        finally:
+            session.lock.release()
+        return SandboxResult(output=response["output"], error=response["error"], limit=response["limit"],
+                             truncated=response["truncated"], seconds=response["seconds"])
+
+    def reset(self, session_id: str) -> bool:
+        """
+        Discards the interpreter state of `session_id`.
+        """
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        with session.lock:
+            session.closed = True
+            session.worker.close()
+        return True
+
+    def close(self):
+        with self._lock:
+            workers = self._warm + [session.worker for session in self._sessions.values()]
+            self._warm, self._sessions = [], OrderedDict()
+        for worker in workers:
+            worker.close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"warm": len(self._warm), "sessions": len(self._sessions), "spawned": self.spawned, "restarts": self.restarts}
+
+python_sandbox = PythonSandbox()
+atexit.register(python_sandbox.close)
+
+def _sanitize(code: str) -> str:
+    # Models often wrap the code in a markdown fence.
+    code = code.strip().strip("`")
+    if code.startswith("python\n") or code.startswith("py\n"):
+        code = code.split("\n", 1)[1]
+    return code.strip()
+
+@tool
+@invalidates(all_files)
+def run_python(code: str) -> str:
+    """
+    Executes Python code in a sandboxed interpreter and returns what it printed.
+
+    Variables, imports and functions defined in earlier calls of the same conversation are still available.
+    Use print(...) to see results; the value of a final expression is shown as well.
+    Each execution is limited in CPU time, wall-clock time, memory and output size.
+
+    Parameters:
+        code (str): The Python code to execute.
+
+    Returns:
+        str: The printed output, followed by the error traceback if the code raised.
+    """
+    result = python_sandbox.execute(_sanitize(code), current_session())
+    text = result.output
+    if result.truncated:
+        text += f"\n[... truncated: output is limited to {python_sandbox.max_output} characters ...]"
+    if result.limit == "cpu":
+        text += f"\nError: the code used more than {python_sandbox.cpu_seconds:g} seconds of CPU time and was interrupted; variables are kept."
+    elif result.limit == "wall" and not result.restarted:
+        text += f"\nError: the code ran longer than {python_sandbox.wall_seconds:g} seconds and was interrupted; variables are kept."
+    elif result.restarted:
+        text += f"\nError: {result.error} Variables and imports from earlier calls are lost."
+    elif result.error:
+        text += f"\n{result.error}"
+    return text.strip() or "(no output)"
@@ -0,0 +1,169 @@
+import ast
+import importlib
+import io
+import json
+import math
+import os
+import signal
+import sys
+import tempfile
+import time
+import traceback
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, only the parent's wall-clock kill applies.
+    resource = None
+
+# Worker process behind tools/python_sandbox.py, started as a plain script (`python python_worker.py`) so it
+# imports nothing from the app. It pre-imports PYTHON_WORKER_PRELOAD, caps its address space at
+# PYTHON_WORKER_MEMORY_MB, then executes one JSON request per line of stdin in a namespace that persists
+# between requests, answering with one JSON line on the original stdout.
+#
+# Request:  {"code": str, "cpu_seconds": float, "wall_seconds": float, "max_output": int}
+# Response: {"output": str, "error": str | null, "limit": "cpu" | "wall" | null, "truncated": bool, "seconds": float}
+
+class LimitExceeded(BaseException):
+    def __init__(self, limit: str, message: str):
+        super().__init__(message)
+        self.limit = limit
+
+def _cpu_exceeded(signum, frame):
+    raise LimitExceeded("cpu", "CPU time limit exceeded")
+
+def _wall_exceeded(signum, frame):
+    raise LimitExceeded("wall", "Wall-clock time limit exceeded")
+
+class CappedWriter(io.TextIOBase):
+    """
+    sys.stdout / sys.stderr replacement keeping the first `limit` characters written.
+    """
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+        self.dropped = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text) -> int:
+        text = str(text)
+        room = self.limit - self.size
+        if room > 0:
+            self.parts.append(text[:room])
+            self.size += min(room, len(text))
+        self.dropped += max(0, len(text) - max(room, 0))
+        return len(text)
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+def _cpu_used() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def _run(code: str, namespace: dict, writer: CappedWriter):
+    """
+    Executes `code` like a REPL cell: the value of a trailing expression is printed.
+    """
+    tree = ast.parse(code, "<sandbox>", "exec")
+    last = tree.body.pop() if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+    exec(compile(tree, "<sandbox>", "exec"), namespace)
+    if last is not None:
+        value = eval(compile(ast.Expression(last.value), "<sandbox>", "eval"), namespace)
+        if value is not None:
+            print(repr(value), file=writer)
+
+def _format_error(error: BaseException) -> str:
+    if isinstance(error, SyntaxError):
+        return "".join(traceback.format_exception_only(type(error), error))
+    # Skip the worker's own frames (_run and the exec call) so only the sandboxed code shows up.
+    tb = error.__traceback__
+    while tb is not None and tb.tb_frame.f_code.co_filename != "<sandbox>":
+        tb = tb.tb_next
+    return "".join(traceback.format_exception(type(error), error, tb))
+
+def execute(request: dict, namespace: dict) -> dict:
+    max_output = int(request.get("max_output", 20000))
+    writer = CappedWriter(max_output)
+    # Output written straight to the file descriptors (C extensions, subprocesses) lands in this file.
+    native = tempfile.TemporaryFile()
+    saved_fds = os.dup(1), os.dup(2)
+    os.dup2(native.fileno(), 1)
+    os.dup2(native.fileno(), 2)
+    saved_streams = sys.stdout, sys.stderr
+    sys.stdout = sys.stderr = writer
+
+    error, limit = None, None
+    start = time.perf_counter()
+    try:
+        if resource is not None and request.get("cpu_seconds"):
+            hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+            soft = math.ceil(_cpu_used() + float(request["cpu_seconds"]))
+            resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+        if hasattr(signal, "setitimer") and request.get("wall_seconds"):
+            signal.setitimer(signal.ITIMER_REAL, float(request["wall_seconds"]))
+        _run(request["code"], namespace, writer)
+    except LimitExceeded as e:
+        error, limit = str(e), e.limit
+    except SystemExit as e:
+        error = f"SystemExit: {e.code}"
+    except BaseException as e:
+        error = _format_error(e)
+    finally:
+        if hasattr(signal, "setitimer"):
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        if resource is not None:
+            hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        sys.stdout, sys.stderr = saved_streams
+        os.dup2(saved_fds[0], 1)
+        os.dup2(saved_fds[1], 2)
+        for fd in saved_fds:
+            os.close(fd)
+
+    native.seek(0)
+    raw = native.read(max_output + 1)
+    native.close()
+    output = writer.text() + raw[:max(0, max_output - writer.size)].decode("utf-8", errors="replace")
+    return {
+        "output": output,
+        "error": error,
+        "limit": limit,
+        "truncated": bool(writer.dropped) or len(raw) > max_output - writer.size,
+        "seconds": time.perf_counter() - start
+    }
+
+def main():
+    # The protocol keeps private copies of stdin/stdout; stray reads and writes go to /dev/null.
+    requests = os.fdopen(os.dup(0), "r", encoding="utf-8")
+    responses = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    sys.stdin = io.StringIO("")
+
+    for name in filter(None, os.getenv("PYTHON_WORKER_PRELOAD", "").split(",")):
+        try:
+            importlib.import_module(name.strip())
+        except Exception:
+            pass
+    memory_mb = int(os.getenv("PYTHON_WORKER_MEMORY_MB", "0"))
+    if resource is not None and memory_mb:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_mb * 1024 * 1024, memory_mb * 1024 * 1024))
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, _cpu_exceeded)
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _wall_exceeded)
+
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+    responses.write(json.dumps({"ready": True}) + "\n")
+    responses.flush()
+    for line in requests:
+        response = execute(json.loads(line), namespace)
+        responses.write(json.dumps(response) + "\n")
+        responses.flush()
+
+if __name__ == "__main__":
+    main()
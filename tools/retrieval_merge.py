@@ -0,0 +1,109 @@
+import hashlib
+import heapq
+import re
+from typing import Dict, List, Tuple
+from langchain_core.documents import Document
+
+ScoredDocuments = List[Tuple[Document, float]]
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+def content_hash(text: str) -> str:
+    """
+    Returns a stable hash of the whitespace/case-normalized text of a chunk.
+    """
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+class _Deduplicator:
+    """
+    Accepts chunks in ranking order and rejects the ones already covered by an accepted chunk,
+    either as an exact duplicate (same content hash) or as a fragment fully contained in it
+    (e.g. the same passage ingested with a different chunk size).
+    Neighbouring chunks that only share the splitter's overlap region are both kept: each carries text the other lacks.
+    """
+    def __init__(self):
+        self.hashes = set()
+        self.texts = []
+
+    def accept(self, document: Document) -> bool:
+        text = normalize_text(document.page_content)
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        if digest in self.hashes:
+            return False
+        for kept in self.texts:
+            if text in kept or kept in text:
+                return False
+        self.hashes.add(digest)
+        self.texts.append(text)
+        return True
+
+def _tag(document: Document, index_name: str, score: float) -> Document:
+    metadata = dict(document.metadata)
+    metadata.update({"index": index_name, "score": score})
+    return Document(page_content=document.page_content, metadata=metadata)
+
+def merge_by_score(results: Dict[str, ScoredDocuments], k: int) -> List[Document]:
+    """
+    Merges per-index (document, similarity) lists into a single global top-k.
+
+    Each list is sorted by descending score and the lists are combined lazily through a heap (k-way merge),
+    so only as many candidates as needed to fill k unique chunks are examined.
+    Scores are comparable across indexes as long as they share the embedding model and distance metric.
+    """
+    streams = [
+        [(-score, index_name, position, document) for position, (document, score) in enumerate(sorted(scored, key=lambda x: -x[1]))]
+        for index_name, scored in results.items()
+    ]
+    dedup = _Deduplicator()
+    merged = []
+    for negative_score, index_name, _, document in heapq.merge(*streams, key=lambda x: (x[0], x[1], x[2])):
+        if dedup.accept(document):
+            merged.append(_tag(document, index_name, -negative_score))
+            if len(merged) >= k:
+                break
+    return merged
+
+def merge_by_rrf(results: Dict[str, ScoredDocuments], k: int, rrf_k: int = 60) -> List[Document]:
+    """
+    Merges per-index lists with reciprocal-rank fusion: score(d) = sum(1 / (rrf_k + rank)).
+
+    Only ranks are used, which makes it the safer choice when the indexes' raw scores are not comparable.
+    Identical chunks returned by several indexes accumulate their contributions.
+    """
+    fused = {}
+    for index_name, scored in results.items():
+        ranked = sorted(scored, key=lambda x: -x[1])
+        for rank, (document, _) in enumerate(ranked, start=1):
+            digest = content_hash(document.page_content)
+            entry = fused.setdefault(digest, [0.0, index_name, document])
+            entry[0] += 1.0 / (rrf_k + rank)
+
+    dedup = _Deduplicator()
+    merged = []
+    for score, index_name, document in heapq.nlargest(len(fused), fused.values(), key=lambda x: x[0]):
+        if dedup.accept(document):
+            merged.append(_tag(document, index_name, score))
+            if len(merged) >= k:
+                break
+    return merged
+
+def merge_concat(results: Dict[str, ScoredDocuments], k: int) -> List[Document]:
+    """
+    Legacy behaviour: the indexes' results in index order, only dropping duplicates, cut at k.
+    """
+    dedup = _Deduplicator()
+    merged = []
+    for index_name, scored in results.items():
+        for document, score in scored:
+            if dedup.accept(document):
+                merged.append(_tag(document, index_name, score))
+                if len(merged) >= k:
+                    return merged
+    return merged
+
+MERGE_STRATEGIES = {
+    "score": merge_by_score,
+    "rrf": merge_by_rrf,
+    "concat": merge_concat
+}
@@ -0,0 +1,356 @@
+import atexit
+import os
+import platform
+import selectors
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from langchain.agents import tool
+from tools.tool_context import current_session
+
+BACKGROUND_PREFIX = "background:"
+
+class ShellJob:
+    """
+    A command running in its own process group, with stdout and stderr merged into one output stream,
+    owned by the conversation (`session`) that started it.
+
+    Only the last `max_output` bytes are kept; `dropped` counts the bytes discarded before them, so
+    offsets into the output stay absolute and a reader can resume where it stopped.
+    """
+    def __init__(self, command: str, process: subprocess.Popen, max_output: int, timeout: float, session: str):
+        self.id = uuid.uuid4().hex[:8]
+        self.command = command
+        self.session = session
+        self.process = process
+        self.max_output = max_output
+        self.started = time.monotonic()
+        self.deadline = self.started + timeout
+        self.ended: Optional[float] = None
+        self.exit_code: Optional[int] = None
+        self.state = "running"
+        self.kill_at: Optional[float] = None
+        self.cursor = 0
+        self._output = bytearray()
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def _append(self, data: bytes):
+        with self._lock:
+            self._output += data
+            overflow = len(self._output) - self.max_output
+            if overflow > 0:
+                del self._output[:overflow]
+                self.dropped += overflow
+
+    def _finish(self, exit_code: int):
+        self.exit_code = exit_code
+        self.ended = time.monotonic()
+        if self.state == "running":
+            self.state = "finished" if exit_code == 0 else "failed"
+
+    @property
+    def running(self) -> bool:
+        return self.ended is None
+
+    @property
+    def total_output(self) -> int:
+        return self.dropped + len(self._output)
+
+    def read(self, since: int) -> Tuple[str, int, int]:
+        """
+        Returns (text, next_offset, skipped): the output from absolute offset `since` on,
+        and how many bytes from `since` had already been dropped.
+        """
+        with self._lock:
+            skipped = max(0, self.dropped - since)
+            start = max(since, self.dropped) - self.dropped
+            data = bytes(self._output[start:])
+            return data.decode("utf-8", errors="replace"), self.dropped + len(self._output), skipped
+
+    def status(self) -> Dict[str, Any]:
+        end = self.ended if self.ended is not None else time.monotonic()
+        return {
+            "job_id": self.id,
+            "command": self.command,
+            "state": self.state,
+            "exit_code": self.exit_code,
+            "seconds": round(end - self.started, 1),
+            "output_bytes": self.total_output,
+            "unread_bytes": self.total_output - self.cursor
+        }
+
+class ShellJobManager:
+    """
+    Runs long shell commands in the background so the agent loop does not wait on them.
+
+    Each job belongs to the conversation that started it (see tools/tool_context.py): a conversation only
+    sees, reads and cancels its own jobs, and reset() kills them when the conversation goes away.
+
+    One daemon thread watches every job through a selector: it collects output, reaps exited jobs without
+    blocking (a job can close its output long before it exits, or exit while something it started keeps
+    the output open), kills jobs that exceed their wall-clock limit (or ignored a cancel for `grace` seconds)
+    together with their process group, and forgets finished jobs after `retention` seconds.
+
+    Parameters (environment variable, default):
+        max_jobs (SHELL_MAX_JOBS, 4): Concurrently running jobs.
+        timeout (SHELL_JOB_TIMEOUT, 1800): Wall-clock seconds before a job is killed.
+        max_output (SHELL_JOB_MAX_OUTPUT, 1048576): Bytes of output kept per job (the most recent ones).
+        retention (SHELL_JOB_RETENTION, 3600): Seconds a finished job stays queryable.
+        cpu_seconds (SHELL_JOB_CPU_SECONDS, unset): RLIMIT_CPU applied to the job's processes.
+        memory_mb (SHELL_JOB_MEMORY_MB, unset): RLIMIT_AS applied to the job's processes.
+    """
+    def __init__(self, max_jobs: Optional[int] = None, timeout: Optional[float] = None, max_output: Optional[int] = None,
+                 retention: Optional[float] = None, cpu_seconds: Optional[int] = None, memory_mb: Optional[int] = None,
+                 shell: Optional[str] = None, grace: float = 5.0):
+        self.max_jobs = max_jobs or int(os.getenv("SHELL_MAX_JOBS", "4"))
+        self.timeout = timeout or float(os.getenv("SHELL_JOB_TIMEOUT", "1800"))
+        self.max_output = max_output or int(os.getenv("SHELL_JOB_MAX_OUTPUT", str(1 << 20)))
+        self.retention = retention or float(os.getenv("SHELL_JOB_RETENTION", "3600"))
+        self.cpu_seconds = cpu_seconds or int(os.getenv("SHELL_JOB_CPU_SECONDS", "0")) or None
+        self.memory_mb = memory_mb or int(os.getenv("SHELL_JOB_MEMORY_MB", "0")) or None
+        self.shell = shell or os.getenv("SHELL_PATH") or ("/bin/bash" if os.path.exists("/bin/bash") else "/bin/sh")
+        self.grace = grace
+        self._jobs: Dict[str, ShellJob] = {}
+        self._new: List[ShellJob] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._selector = None
+        self._wake_r = self._wake_w = None
+
+    def _limits(self):
+        import resource
+        if self.cpu_seconds:
+            resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds))
+        if self.memory_mb:
+            limit = self.memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._selector = selectors.DefaultSelector()
+            self._wake_r, self._wake_w = os.pipe()
+            os.set_blocking(self._wake_r, False)
+            self._selector.register(self._wake_r, selectors.EVENT_READ)
+            self._thread = threading.Thread(target=self._watch, name="shell-jobs", daemon=True)
+            self._thread.start()
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b"x")
+        except BlockingIOError:
+            pass
+
+    def start(self, command: str, session_id: Optional[str] = None) -> ShellJob:
+        """
+        Starts `command` as a job of `session_id` (default: the current conversation).
+        """
+        if platform.system() == "Windows":
+            raise RuntimeError("Background jobs need a POSIX shell")
+        session_id = session_id or current_session()
+        with self._lock:
+            running = sum(job.running for job in self._jobs.values())
+            if running >= self.max_jobs:
+                raise RuntimeError(f"{running} jobs are already running (limit {self.max_jobs}); wait for one to finish or cancel one")
+            process = subprocess.Popen(
+                [self.shell, "-c", command],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+                preexec_fn=self._limits if (self.cpu_seconds or self.memory_mb) else None
+            )
+            os.set_blocking(process.stdout.fileno(), False)
+            job = ShellJob(command, process, self.max_output, self.timeout, session_id)
+            self._jobs[job.id] = job
+            self._ensure_thread()
+            self._new.append(job)
+        self._wake()
+        return job
+
+    def get(self, job_id: str, session_id: Optional[str] = None) -> ShellJob:
+        """
+        Returns job `job_id` of `session_id` (default: the current conversation); jobs of other
+        conversations are reported as unknown.
+        """
+        session_id = session_id or current_session()
+        job = self._jobs.get(job_id.strip())
+        if job is None or job.session != session_id:
+            raise KeyError(f"Unknown job id {job_id.strip()!r}")
+        return job
+
+    def jobs(self, session_id: Optional[str] = None) -> List[ShellJob]:
+        session_id = session_id or current_session()
+        with self._lock:
+            return [job for job in self._jobs.values() if job.session == session_id]
+
+    def cancel(self, job_id: str, session_id: Optional[str] = None) -> ShellJob:
+        """
+        Sends SIGTERM to the job's process group; the watcher follows up with SIGKILL after the grace period.
+        """
+        job = self.get(job_id, session_id)
+        if job.running:
+            job.state = "cancelled"
+            job.kill_at = time.monotonic() + self.grace
+            self._signal(job, signal.SIGTERM)
+            self._wake()
+        return job
+
+    def reset(self, session_id: str) -> int:
+        """
+        Kills the running jobs of `session_id` with their process groups and returns how many there were;
+        the watcher reaps them and drops them after `retention` like any finished job.
+        """
+        with self._lock:
+            owned = [job for job in self._jobs.values() if job.session == session_id]
+            for job in owned:
+                if job.running:
+                    job.state = "cancelled"
+                    job.kill_at = time.monotonic()
+        killed = 0
+        for job in owned:
+            if job.running:
+                self._signal(job, signal.SIGKILL)
+                killed += 1
+        if owned:
+            self._wake()
+        return killed
+
+    @staticmethod
+    def _signal(job: ShellJob, signum: int):
+        try:
+            os.killpg(job.process.pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _close_output(self, job: ShellJob):
+        stream = job.process.stdout
+        if stream.closed:
+            return
+        # Whatever the job wrote before exiting is still in the pipe.
+        try:
+            while True:
+                data = os.read(stream.fileno(), 65536)
+                if not data:
+                    break
+                job._append(data)
+        except BlockingIOError:
+            pass
+        self._selector.unregister(stream)
+        stream.close()
+
+    def _watch(self):
+        while True:
+            with self._lock:
+                new, self._new = self._new, []
+                # Exits are noticed by polling; poll faster while a job runs with its output already closed.
+                silent = any(job.running and job.process.stdout.closed for job in self._jobs.values())
+            for job in new:
+                self._selector.register(job.process.stdout, selectors.EVENT_READ, job)
+
+            for key, _ in self._selector.select(timeout=0.1 if silent else 1.0):
+                if key.data is None:
+                    try:
+                        while os.read(self._wake_r, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                job = key.data
+                data = os.read(key.fileobj.fileno(), 65536)
+                if data:
+                    job._append(data)
+                else:
+                    self._selector.unregister(key.fileobj)
+                    key.fileobj.close()
+
+            now = time.monotonic()
+            with self._lock:
+                for job_id, job in list(self._jobs.items()):
+                    if job in self._new:
+                        # Started after this pass registered the new jobs; handled next pass.
+                        continue
+                    if job.running:
+                        exit_code = job.process.poll()
+                        if exit_code is not None:
+                            self._close_output(job)
+                            job._finish(exit_code)
+                        elif now > job.deadline and job.state == "running":
+                            job.state = "timed out"
+                            self._signal(job, signal.SIGKILL)
+                        elif job.kill_at is not None and now > job.kill_at:
+                            self._signal(job, signal.SIGKILL)
+                    elif now - job.ended > self.retention:
+                        del self._jobs[job_id]
+
+    def shutdown(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            if job.running:
+                self._signal(job, signal.SIGKILL)
+
+shell_jobs = ShellJobManager()
+atexit.register(shell_jobs.shutdown)
+
+def _describe(job: ShellJob) -> str:
+    status = job.status()
+    text = f"Job {status['job_id']} is {status['state']} after {status['seconds']}s"
+    if status["exit_code"] is not None:
+        text += f" (exit code {status['exit_code']})"
+    return text + f", {status['unread_bytes']} bytes of unread output."
+
+def start_background_job(command: str) -> str:
+    try:
+        job = shell_jobs.start(command)
+    except Exception as e:
+        return f"Error: {e}"
+    return f"Started background job {job.id}. Use shell_job_status, shell_job_output and cancel_shell_job with this id."
+
+@tool
+def shell_job_status(job_id: str) -> str:
+    """
+    Returns the state (running, finished, failed, cancelled or timed out), exit code, elapsed time and
+    unread output size of a background shell job started with run_shell. Pass "all" to list every job of this conversation.
+    """
+    try:
+        if job_id.strip().lower() == "all":
+            return "\n".join(_describe(job) for job in shell_jobs.jobs()) or "No background jobs."
+        return _describe(shell_jobs.get(job_id))
+    except KeyError as e:
+        return f"Error: {e.args[0]}"
+
+@tool
+def shell_job_output(job_id: str) -> str:
+    """
+    Returns the output a background shell job produced since the last call for the same job id
+    (stdout and stderr combined), preceded by the job's status. Long output is cut to its last part.
+    """
+    try:
+        job = shell_jobs.get(job_id)
+    except KeyError as e:
+        return f"Error: {e.args[0]}"
+    text, offset, skipped = job.read(job.cursor)
+    job.cursor = offset
+    limit = int(os.getenv("SHELL_JOB_TAIL_CHARS", "4000"))
+    if len(text) > limit:
+        skipped += len(text) - limit
+        text = text[-limit:]
+    header = _describe(job)
+    if skipped:
+        header += f"\n[... {skipped} earlier characters skipped ...]"
+    return f"{header}\n{text}" if text else f"{header}\n(no new output)"
+
+@tool
+def cancel_shell_job(job_id: str) -> str:
+    """
+    Stops a running background shell job and everything it started.
+    """
+    try:
+        job = shell_jobs.cancel(job_id)
+    except KeyError as e:
+        return f"Error: {e.args[0]}"
+    return _describe(job)
@@ -1,108 +1,336 @@
-import subprocess
+import atexit
+import base64
+import os
 import platform
+import selectors
+import signal
 import subprocess
-import platform
 import threading
-import queue
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
 from langchain.agents import tool
+from tools.shell_jobs import BACKGROUND_PREFIX, start_background_job
+from tools.tool_context import current_session
+from tools.tool_memo import all_files, invalidates
+
+class ShellResult:
+    """
+    Outcome of one command run in a ShellSession.
+    """
+    def __init__(self, stdout: str, stderr: str, exit_code: Optional[int], timed_out: bool = False, truncated: bool = False):
+        self.stdout = stdout
+        self.stderr = stderr
+        self.exit_code = exit_code
+        self.timed_out = timed_out
+        self.truncated = truncated
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_code == 0 and not self.timed_out
+
+class _CappedBuffer:
+    """
+    Keeps the first and last `limit // 2` bytes written to it and counts what was dropped in between.
+    """
+    def __init__(self, limit: int):
+        self.half = max(1, limit // 2)
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.dropped = 0
+
+    def write(self, data: bytes):
+        room = self.half - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail += data
+            overflow = len(self.tail) - self.half
+            if overflow > 0:
+                del self.tail[:overflow]
+                self.dropped += overflow
+
+    def text(self) -> str:
+        middle = f"\n[... {self.dropped} bytes truncated ...]\n".encode() if self.dropped else b""
+        return bytes(self.head + middle + self.tail).decode("utf-8", errors="replace")
+
+class ShellSession:
+    """
+    A persistent POSIX shell process that runs commands one at a time.
+
+    Each command is sent base64-encoded and run through `eval` with stdin from /dev/null, so quoting or
+    syntax errors cannot desynchronize the session, and is followed by a random sentinel on stdout
+    (carrying the exit code) and on stderr. Both pipes are drained with a selector until both sentinels
+    arrive, so completion is detected exactly instead of by polling. The working directory and exported
+    variables persist between the commands of a session.
+    """
+    def __init__(self, shell: str):
+        self.process = subprocess.Popen(
+            [shell],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True
+        )
+        for stream in (self.process.stdout, self.process.stderr):
+            os.set_blocking(stream.fileno(), False)
+        self.commands_run = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def run(self, command: str, timeout: float, max_output: int) -> ShellResult:
+        sentinel = f"__SHELL_DONE_{uuid.uuid4().hex}__"
+        encoded = base64.b64encode(command.encode("utf-8")).decode("ascii")
+        script = (
+            f"eval \"$(printf '%s' '{encoded}' | base64 -d)\" < /dev/null\n"
+            f"printf '\\n%s %s\\n' '{sentinel}' \"$?\"\n"
+            f"printf '\\n%s\\n' '{sentinel}' >&2\n"
+        )
+        self.process.stdin.write(script.encode("utf-8"))
+        self.process.stdin.flush()
+        self.commands_run += 1
+
+        marker = f"\n{sentinel}".encode()
+        buffers = {self.process.stdout: _CappedBuffer(max_output), self.process.stderr: _CappedBuffer(max_output)}
+        # Only the not-yet-flushed end of each stream is kept raw, to find a sentinel split across reads.
+        pending = {stream: b"" for stream in buffers}
+        exit_code = None
+        selector = selectors.DefaultSelector()
+        for stream in buffers:
+            selector.register(stream, selectors.EVENT_READ)
+        deadline = time.monotonic() + timeout
+        try:
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                for key, _ in selector.select(remaining):
+                    stream = key.fileobj
+                    data = os.read(stream.fileno(), 65536)
+                    if not data:
+                        # The command exited the shell itself.
+                        selector.unregister(stream)
+                        buffers[stream].write(pending[stream])
+                        continue
+                    data = pending[stream] + data
+                    position = data.find(marker)
+                    if position >= 0:
+                        buffers[stream].write(data[:position])
+                        if stream is self.process.stdout:
+                            exit_code = int(data[position + len(marker):].split(b"\n")[0].strip() or -1)
+                        selector.unregister(stream)
+                        continue
+                    keep = len(marker) + 8
+                    buffers[stream].write(data[:-keep])
+                    pending[stream] = data[-keep:]
+        finally:
+            timed_out = bool(selector.get_map())
+            selector.close()
+
+        stdout, stderr = buffers[self.process.stdout], buffers[self.process.stderr]
+        return ShellResult(
+            stdout=stdout.text(),
+            stderr=stderr.text(),
+            exit_code=exit_code,
+            timed_out=timed_out,
+            truncated=bool(stdout.dropped or stderr.dropped)
+        )
+
+    def close(self):
+        if self.alive:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout, self.process.stderr):
+            stream.close()
 
 class ShellManager:
-    def __init__(self):
-        self.shell_process = None
-        self.output_queue = queue.Queue()
-        self.output_thread = None
-        self.stop_thread = threading.Event()
+    """
+    Up to `size` persistent ShellSessions shared by every caller of run_shell, one per conversation.
 
-    def open_shell(self) -> str:
+    Each conversation (see tools/tool_context.py) keeps its own shell, so its `cd`/`export` carry over
+    between its commands and never leak into another conversation; two commands of the same conversation
+    run one after the other. A conversation's first command takes a fresh shell warmed by open_shell, or
+    spawns one; when all `size` shells are taken, the least recently used idle one is closed (its
+    conversation starts over in a new shell) or, if every shell is busy, the command waits. A session
+    whose command timed out or that exited is killed (with its whole process group) and replaced on demand.
+
+    Parameters:
+        size (int): Maximum number of shells (SHELL_POOL_SIZE, default 4).
+        timeout (float): Default per-command timeout in seconds (SHELL_COMMAND_TIMEOUT, default 60).
+        max_output (int): Bytes kept per stream and command, head and tail (SHELL_MAX_OUTPUT, default 65536).
+        shell (str): Shell executable (SHELL_PATH, default /bin/bash, or /bin/sh when bash is missing).
+    """
+    def __init__(self, size: Optional[int] = None, timeout: Optional[float] = None, max_output: Optional[int] = None, shell: Optional[str] = None):
+        self.size = size or int(os.getenv("SHELL_POOL_SIZE", "4"))
+        self.timeout = timeout or float(os.getenv("SHELL_COMMAND_TIMEOUT", "60"))
+        self.max_output = max_output or int(os.getenv("SHELL_MAX_OUTPUT", "65536"))
+        self.shell = shell or os.getenv("SHELL_PATH") or ("/bin/bash" if os.path.exists("/bin/bash") else "/bin/sh")
+        # Conversation id -> its shell, least recently used first.
+        self._sessions: "OrderedDict[str, ShellSession]" = OrderedDict()
+        self._busy = set()
+        # Fresh shells no conversation has used yet.
+        self._spare: List[ShellSession] = []
+        self._count = 0
+        self._condition = threading.Condition()
+        self.spawned = 0
+
+    def _spawn(self) -> ShellSession:
         """
-        Opens a shell process based on the system type and prepares it to execute commands.
-        
-        Returns:
-            str: A message indicating the status of the shell opening process.
-            
-        Functionality:
-            1. Determines the system type (Windows or Linux) and selects the appropriate shell command.
-            2. Opens a shell process using subprocess.Popen with stdin, stdout, and stderr configured for text mode.
-            3. Starts a background thread to read the shell's output.
-            4. Handles any exceptions that occur during the process initiation.
-            5. Returns a status message indicating whether the shell was opened successfully or if it was already open.
+        Starts a shell in a slot already counted in self._count, giving the slot back on failure.
         """
-        cmd = "cmd" if platform.system() == "Windows" else "bin/bash"
-        if self.shell_process is None:
-            try:
-                self.shell_process = subprocess.Popen(
-                    [cmd],
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    bufsize=1
-                )
-                
-                # Start the output reading thread
-                self.output_thread = threading.Thread(target=self._read_output)
-                self.output_thread.daemon = True
-                self.output_thread.start()
-                return "Shell opened successfully and ready to execute commands"
-            except Exception as e:
-                return (f"An error occurred: {e}")
-        else:
-            return "Shell opened successfully and ready to execute commands"
-    
-    def issue_command(self, command):
+        try:
+            session = ShellSession(self.shell)
+        except Exception:
+            with self._condition:
+                self._count -= 1
+                self._condition.notify_all()
+            raise
+        self.spawned += 1
+        return session
+
+    def _take_shell(self, session_id: str, stale: List[ShellSession]) -> Optional[ShellSession]:
         """
-        Issues a command to the opened shell.
+        Claims the conversation's shell, or a spare one, or a slot for a new one (None); caller holds the lock
+        and has checked that the conversation is not busy. Dead shells found on the way go to `stale`.
         """
-        if self.shell_process is not None:
+        session = self._sessions.pop(session_id, None)
+        if session is not None and not session.alive:
+            self._count -= 1
+            stale.append(session)
+            session = None
+        while session is None and self._spare:
+            session = self._spare.pop()
+            if not session.alive:
+                self._count -= 1
+                stale.append(session)
+                session = None
+        if session is not None:
+            return session
+        if self._count < self.size:
+            self._count += 1
+            return None
+        idle = next(key for key in self._sessions if key not in self._busy)
+        # Reuse the slot of the least recently used idle conversation.
+        stale.append(self._sessions.pop(idle))
+        return None
+
+    def _has_room(self) -> bool:
+        return self._count < self.size or bool(self._spare) or any(key not in self._busy for key in self._sessions)
+
+    def _acquire(self, session_id: str) -> ShellSession:
+        stale = []
+        with self._condition:
+            while session_id in self._busy or (session_id not in self._sessions and not self._has_room()):
+                self._condition.wait()
+            self._busy.add(session_id)
+            session = self._take_shell(session_id, stale)
+            if session is not None:
+                self._sessions[session_id] = session
+        for old in stale:
+            old.close()
+        if session is None:
             try:
-                self.shell_process.stdin.write(command + '\n')
-                self.shell_process.stdin.flush()
-                return self._get_output()
-            except Exception as e:
-                return (f"An error occurred: {e}")
-        else:
-            return("Shell is not opened.")
+                session = self._spawn()
+            except Exception:
+                with self._condition:
+                    self._busy.discard(session_id)
+                    self._condition.notify_all()
+                raise
+            with self._condition:
+                self._sessions[session_id] = session
+        return session
 
-    def close_shell(self):
+    def _release(self, session_id: str, session: ShellSession, healthy: bool):
+        with self._condition:
+            self._busy.discard(session_id)
+            if not (healthy and session.alive):
+                if self._sessions.get(session_id) is session:
+                    del self._sessions[session_id]
+                self._count -= 1
+            self._condition.notify_all()
+        if not healthy:
+            session.close()
+
+    def run(self, command: str, timeout: Optional[float] = None, session_id: Optional[str] = None) -> ShellResult:
         """
-        Closes the opened shell process and stops the output thread.
+        Runs `command` in the shell of `session_id` (default: the current conversation) and waits for it
+        to finish, at most `timeout` seconds.
         """
-        if self.shell_process is not None:
-            self.shell_process.stdin.write('exit\n')
-            self.shell_process.stdin.flush()
-            self.shell_process.stdin.close()
-            self.shell_process.terminate()
-            self.shell_process = None
-            
-            # Stop the output reading thread
-            self.stop_thread.set()
-            self.output_thread.join()
-            self.output_thread = None
-            return "Shell closed"
-        else:
-            return ("Shell is not opened.")
-
-    def _read_output(self):
+        session_id = session_id or current_session()
+        session = self._acquire(session_id)
+        healthy = False
+        try:
+            result = session.run(command, timeout or self.timeout, self.max_output)
+            healthy = not result.timed_out and result.exit_code is not None
+            return result
+        finally:
+            self._release(session_id, session, healthy)
+
+    def open_shell(self) -> str:
         """
-        Reads the output from the shell process and puts it into a queue.
+        Warms up one spare shell so the next conversation's first command does not pay the spawn cost.
         """
-        while not self.stop_thread.is_set():
-            line = self.shell_process.stdout.readline()
-            if line:
-                self.output_queue.put(line.strip())
-            if self.shell_process.poll() is not None:
-                break
-
-    def _get_output(self):
+        with self._condition:
+            if self._count >= self.size:
+                return "Shell opened successfully and ready to execute commands"
+            self._count += 1
+        try:
+            session = self._spawn()
+        except Exception as e:
+            return (f"An error occurred: {e}")
+        with self._condition:
+            self._spare.append(session)
+            self._condition.notify_all()
+        return "Shell opened successfully and ready to execute commands"
+
+    def reset(self, session_id: str) -> bool:
         """
-        Retrieves all lines from the output queue.
+        Closes the shell of `session_id` (working directory and variables are lost) unless it is running a command.
         """
-        output = []
-        while not self.output_queue.empty():
-            output.append(self.output_queue.get())
-        return '\n'.join(output)
+        with self._condition:
+            session = self._sessions.get(session_id)
+            if session is None or session_id in self._busy:
+                return False
+            del self._sessions[session_id]
+            self._count -= 1
+            self._condition.notify_all()
+        session.close()
+        return True
+
+    def issue_command(self, command):
+        """
+        Issues a command to a pooled shell and returns its output.
+        """
+        result = self.run(command)
+        return result.stdout if result.ok else result.stdout + result.stderr
+
+    def close_shell(self):
+        """
+        Closes every idle shell of the pool.
+        """
+        with self._condition:
+            idle = self._spare + [self._sessions.pop(key) for key in [key for key in self._sessions if key not in self._busy]]
+            self._spare = []
+            self._count -= len(idle)
+            self._condition.notify_all()
+        for session in idle:
+            session.close()
+        return "Shell closed"
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {"size": self.size, "open": self._count, "idle": self._count - len(self._busy), "conversations": len(self._sessions),
+                    "spawned": self.spawned}
 
 shell_manager = ShellManager()
+atexit.register(shell_manager.close_shell)
 
 # @tool
 # def open_shell(cmd:str) -> str:
@@ -162,11 +390,15 @@ shell_manager = ShellManager()
 
 
 @tool
+@invalidates(all_files)
 def run_shell(command: str) -> str:
     """
     Useful tool to run a single shell command and receive the output of it.
     
     This function supports running commands on both Windows and Unix-like systems.
+    For long commands (package installs, builds, test runs) prefix the command with "background:" to start it
+    as a background job: the job id is returned immediately and the job is followed with shell_job_status,
+    shell_job_output and cancel_shell_job.
     
     Parameters:
         command (str): The shell command to be executed.
@@ -174,13 +406,26 @@ def run_shell(command: str) -> str:
     Returns:
         str: The output of the command or an error message if the command fails.
     """
-    try:
-        # Determine the shell to use based on the operating system
-        if platform.system() == "Windows":
+    if command.strip().lower().startswith(BACKGROUND_PREFIX):
+        return start_background_job(command.strip()[len(BACKGROUND_PREFIX):].strip())
+
+    # Windows has no POSIX shell to keep around, so each command still gets its own cmd process there.
+    if platform.system() == "Windows":
+        try:
             result = subprocess.run(["cmd", "/c", command], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        else:
-            result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        return f"Error: {e.stderr}"
\ No newline at end of file
+            return result.stdout
+        except subprocess.CalledProcessError as e:
+            return f"Error: {e.stderr}"
+
+    try:
+        result = shell_manager.run(command)
+    except Exception as e:
+        return f"Error: {e}"
+    if result.timed_out:
+        return f"Error: command timed out after {shell_manager.timeout:g} seconds and its shell was killed.\n{result.stdout}{result.stderr}"
+    if result.exit_code is None:
+        return ("Error: the command ended the shell session (e.g. `exit` or `exec`); the next command runs in a new shell, "
+                f"with the working directory and variables reset.\n{result.stdout}{result.stderr}")
+    if result.exit_code != 0:
+        return f"Error: {result.stderr}"
+    return result.stdout
@@ -0,0 +1,17 @@
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    """
+    Counts tokens with tiktoken's cl100k_base encoding, falling back to a 4 characters per token
+    estimate when the encoding cannot be loaded (e.g. offline).
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding is False:
+        return max(1, len(text) // 4)
+    return len(_encoding.encode(text, disallowed_special=()))
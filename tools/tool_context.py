@@ -0,0 +1,38 @@
+import contextvars
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Conversation (and agent run) the running tool call belongs to, so tools can keep per-conversation state
+# (e.g. the interpreter of run_python, the memoized tool results). backend/core_agent.py sets it around
+# each agent run; the worker threads that run tools get a copy of the caller's context and see the same values.
+
+DEFAULT_SESSION = "default"
+
+_current_session: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("tool_session", default=None)
+_current_run: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("tool_run", default=None)
+
+def current_session() -> str:
+    """
+    Id of the conversation of the current tool call, DEFAULT_SESSION outside of any session_scope.
+    """
+    return _current_session.get() or DEFAULT_SESSION
+
+def current_run() -> Optional[str]:
+    """
+    Id of the agent run (one answer) of the current tool call, None outside of any session_scope.
+    """
+    return _current_run.get()
+
+@contextmanager
+def session_scope(session_id: Optional[str]) -> Iterator[None]:
+    """
+    Marks the code inside (one agent run) as belonging to conversation `session_id`.
+    """
+    session_token = _current_session.set(session_id)
+    run_token = _current_run.set(uuid.uuid4().hex)
+    try:
+        yield
+    finally:
+        _current_run.reset(run_token)
+        _current_session.reset(session_token)
@@ -0,0 +1,256 @@
+import ast
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Optional, Tuple
+from tools.retrieval_merge import normalize_text
+from tools.tool_context import current_run, current_session
+
+# How a memoized tool call is identified: (normalized input, invalidation tags, fingerprint).
+# A cached result is reused only while the fingerprint (e.g. a file's mtime and size) is unchanged.
+CallKey = Tuple[str, FrozenSet[str], Any]
+
+# Tags: "fs" marks results read from the filesystem, "file:<abs path>" / "dir:<abs path>" what they read.
+FS_TAG = "fs"
+
+class _Entry:
+    def __init__(self, result: Any, tags: FrozenSet[str], fingerprint: Any, run: Optional[str]):
+        self.result = result
+        self.tags = tags
+        self.fingerprint = fingerprint
+        self.created = time.monotonic()
+        self.run = run
+
+class ToolMemo:
+    """
+    Session-scoped memoization of the read-only tools (load_file, list_files_in_directory,
+    retrieve_context_info, get_os).
+
+    Results are keyed by conversation (tools/tool_context.py), tool and normalized input, and reused while
+    the input's fingerprint is unchanged (file mtime and size, directory mtime, index generation) and
+    for at most `ttl` seconds. Side-effecting tools invalidate by tag: create_file_in_folder and delete_file
+    drop the entries of the path and of its parent directories, run_shell and run_python every filesystem
+    entry, in every conversation, since they all share the filesystem.
+
+    A repeat of a call already answered in the same agent run returns the cached result prefixed with a
+    note that nothing changed since; the full result is kept because the earlier observation may have
+    been dropped or condensed (parallel steps, chat-history summarization).
+
+    Parameters (environment variable, default):
+        max_entries (TOOL_MEMO_SIZE, 256): Results kept per conversation.
+        max_sessions (TOOL_MEMO_SESSIONS, 64): Conversations kept.
+        ttl (TOOL_MEMO_TTL, 300): Seconds a result is reused at most.
+        max_result_chars (TOOL_MEMO_MAX_CHARS, 50000): Longer results are not kept.
+        enabled (TOOL_MEMO_ENABLED, true).
+    """
+    def __init__(self, max_entries: Optional[int] = None, max_sessions: Optional[int] = None, ttl: Optional[float] = None,
+                 max_result_chars: Optional[int] = None, enabled: Optional[bool] = None):
+        self.max_entries = max_entries or int(os.getenv("TOOL_MEMO_SIZE", "256"))
+        self.max_sessions = max_sessions or int(os.getenv("TOOL_MEMO_SESSIONS", "64"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("TOOL_MEMO_TTL", "300"))
+        self.max_result_chars = max_result_chars or int(os.getenv("TOOL_MEMO_MAX_CHARS", "50000"))
+        self.enabled = enabled if enabled is not None else os.getenv("TOOL_MEMO_ENABLED", "true").lower() in ("1", "true", "yes")
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, OrderedDict[Tuple[str, str], _Entry]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _entries(self, session: str) -> "OrderedDict[Tuple[str, str], _Entry]":
+        entries = self._sessions.get(session)
+        if entries is None:
+            entries = self._sessions[session] = OrderedDict()
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session)
+        return entries
+
+    def lookup(self, session: str, tool: str, key: str, fingerprint: Any) -> Optional[_Entry]:
+        with self._lock:
+            entries = self._entries(session)
+            entry = entries.get((tool, key))
+            if entry is not None and entry.fingerprint == fingerprint and time.monotonic() - entry.created <= self.ttl:
+                entries.move_to_end((tool, key))
+                self.hits += 1
+                return entry
+            if entry is not None:
+                del entries[(tool, key)]
+            self.misses += 1
+            return None
+
+    def store(self, session: str, tool: str, key: str, result: Any, tags: FrozenSet[str], fingerprint: Any, run: Optional[str]):
+        if len(str(result)) > self.max_result_chars:
+            return
+        with self._lock:
+            entries = self._entries(session)
+            entries[(tool, key)] = _Entry(result, tags, fingerprint, run)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def invalidate(self, tags: Iterable[str]):
+        """
+        Drops every entry, in every conversation, carrying one of `tags`.
+        """
+        tags = frozenset(tags)
+        with self._lock:
+            for entries in self._sessions.values():
+                for call in [call for call, entry in entries.items() if entry.tags & tags]:
+                    del entries[call]
+                    self.invalidations += 1
+
+    def clear(self, session: Optional[str] = None):
+        with self._lock:
+            if session is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "entries": sum(len(entries) for entries in self._sessions.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations
+            }
+
+tool_memo = ToolMemo()
+
+def _single_input(args: tuple, kwargs: dict) -> Optional[str]:
+    # LangChain calls single-input tools either positionally or with the parameter name.
+    values = list(args) + list(kwargs.values())
+    return str(values[0]) if len(values) == 1 else None
+
+def _failed(result: Any) -> bool:
+    if isinstance(result, dict):
+        return "error" in result
+    return str(result).startswith("Error")
+
+def memoized(describe: Callable[[str], Optional[CallKey]]):
+    """
+    Decorator for a read-only tool function (put it under @tool). `describe(input)` returns the call's
+    (normalized input, tags, fingerprint), or None for calls that should not be memoized.
+    Failed calls (results starting with "Error", dicts with an "error" key) are never kept.
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            tool_input = _single_input(args, kwargs)
+            call = describe(tool_input) if tool_memo.enabled and tool_input is not None else None
+            if call is None:
+                return function(*args, **kwargs)
+            key, tags, fingerprint = call
+            session, run = current_session(), current_run()
+            entry = tool_memo.lookup(session, function.__name__, key, fingerprint)
+            if entry is not None:
+                repeat = run is not None and entry.run == run
+                entry.run = run
+                if repeat and isinstance(entry.result, str):
+                    return (f"(Same result as the earlier {function.__name__} call with this input in this answer; "
+                            f"nothing changed since.)\n{entry.result}")
+                return entry.result
+            result = function(*args, **kwargs)
+            if not _failed(result):
+                tool_memo.store(session, function.__name__, key, result, tags, fingerprint, run)
+            return result
+        return wrapper
+    return decorate
+
+def invalidates(tags_of: Callable[[str], Iterable[str]]):
+    """
+    Decorator for a side-effecting tool function: after each call, drops the memoized results
+    carrying one of `tags_of(input)`.
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            tool_input = _single_input(args, kwargs)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                tool_memo.invalidate(tags_of(tool_input) if tool_input is not None else {FS_TAG})
+        return wrapper
+    return decorate
+
+def _definition(text: str, path_key: str) -> Dict[str, Any]:
+    text = str(text).strip()
+    return ast.literal_eval(text) if text.startswith("{") else {path_key: text}
+
+def _stat(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+def _canonical(request: Dict[str, Any]) -> str:
+    return json.dumps(request, sort_keys=True, default=str)
+
+def describe_file_read(file_definition: str) -> Optional[CallKey]:
+    """
+    load_file: keyed on the request with an absolute path, valid while the file's mtime and size are unchanged.
+    """
+    try:
+        request = _definition(file_definition, "file_path")
+        path = os.path.abspath(request["file_path"])
+    except (ValueError, SyntaxError, KeyError, TypeError):
+        return None
+    return _canonical({**request, "file_path": path}), frozenset({FS_TAG, f"file:{path}"}), _stat(path)
+
+def describe_listing(directory_definition: str) -> Optional[CallKey]:
+    """
+    list_files_in_directory: keyed on the request with an absolute path. Valid while the directory's mtime
+    is unchanged, which misses changes deeper down a recursive listing made outside the tools until the TTL.
+    """
+    try:
+        request = _definition(directory_definition, "directory_path")
+        path = os.path.abspath(request["directory_path"])
+    except (ValueError, SyntaxError, KeyError, TypeError):
+        return None
+    return _canonical({**request, "directory_path": path}), frozenset({FS_TAG, f"dir:{path}"}), _stat(path)
+
+def describe_query(query: str) -> Optional[CallKey]:
+    """
+    retrieve_context_info: keyed on the normalized query, valid until an index is re-ingested.
+    """
+    from tools.vdb_registry import index_generation
+    return normalize_text(str(query)), frozenset({"vdb"}), index_generation()
+
+def describe_constant(_input: str) -> Optional[CallKey]:
+    """
+    Tools whose result does not depend on the input (get_os).
+    """
+    return "", frozenset(), None
+
+def path_tags(path: str) -> FrozenSet[str]:
+    """
+    Tags touched by writing or deleting `path`: the file itself and the listings of every parent directory.
+    """
+    path = os.path.abspath(path)
+    tags = {f"file:{path}"}
+    parent = os.path.dirname(path)
+    while True:
+        tags.add(f"dir:{parent}")
+        if os.path.dirname(parent) == parent:
+            return frozenset(tags)
+        parent = os.path.dirname(parent)
+
+def created_file_tags(file_definition: str) -> FrozenSet[str]:
+    """
+    create_file_in_folder: the created file; anything on the filesystem when the input can't be parsed.
+    """
+    try:
+        definition = ast.literal_eval(str(file_definition).strip())
+        return path_tags(os.path.join(definition["folder_path"], definition["file_name"]))
+    except (ValueError, SyntaxError, KeyError, TypeError):
+        return frozenset({FS_TAG})
+
+def all_files(_input: str) -> FrozenSet[str]:
+    """
+    Tools with unknown effects on the filesystem (run_shell, run_python).
+    """
+    return frozenset({FS_TAG})
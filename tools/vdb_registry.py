@@ -0,0 +1,210 @@
+import ast
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from tools.embedding_cache import CachedQueryEmbeddings, QueryEmbeddingCache, cache_from_env
+from tools.local_vdb import LocalVectorStore, is_local_index, strip_local_prefix
+
+def vector_store_backend(index_name: str) -> Tuple[type, str]:
+    """
+    Returns the vector store class and the bare index name for an entry of MULTI_INDEX_LIST.
+    Names prefixed with "local:" use the in-process LocalVectorStore, anything else Pinecone.
+    """
+    if is_local_index(index_name):
+        return LocalVectorStore, strip_local_prefix(index_name)
+    # The Pinecone and OpenAI clients are imported on first use, keeping them out of the app's startup.
+    from langchain_pinecone import PineconeVectorStore
+    return PineconeVectorStore, index_name
+
+class VectorStoreRegistry:
+    """
+    Long-lived owner of the embeddings client and of one vector store handle per index.
+
+    Both the agent tool (retrieve_context_info) and the retrieval chain (run_llm) get their stores
+    from here, so MULTI_INDEX_LIST is parsed once and the OpenAIEmbeddings / PineconeVectorStore
+    objects are built once per process instead of once per call.
+
+    Index names prefixed with "local:" are served by LocalVectorStore instead of Pinecone.
+    Handles are keyed by the embeddings model and index name, so changing OPENAI_EMBEDDINGS_MODEL
+    naturally yields new handles. Call clear() to drop everything explicitly.
+
+    Query embeddings go through a QueryEmbeddingCache (see tools/embedding_cache.py) unless
+    QUERY_EMBEDDING_CACHE_SIZE is set to 0.
+    """
+    def __init__(self, query_cache: Optional[QueryEmbeddingCache] = None):
+        self._lock = threading.Lock()
+        self.query_cache = query_cache
+        self._index_list_raw = None
+        self._index_names = []
+        self._embeddings = {}
+        self._stores = {}
+        self._hits = 0
+        self._constructions = 0
+        self._latency = {}
+        # Called with (index_name, seconds) after every search, e.g. by backend/instrumentation.py.
+        self.latency_listeners: List[Callable[[str, float], None]] = []
+
+    def index_names(self) -> List[str]:
+        """
+        Returns the parsed MULTI_INDEX_LIST, re-parsing only when the environment value changes.
+        """
+        raw = os.environ['MULTI_INDEX_LIST']
+        if raw != self._index_list_raw:
+            with self._lock:
+                if raw != self._index_list_raw:
+                    self._index_names = list(ast.literal_eval(raw))
+                    self._index_list_raw = raw
+        return list(self._index_names)
+
+    def get_embeddings(self, model: Optional[str] = None):
+        model = model or os.environ["OPENAI_EMBEDDINGS_MODEL"]
+        embeddings = self._embeddings.get(model)
+        if embeddings is None:
+            with self._lock:
+                embeddings = self._embeddings.get(model)
+                if embeddings is None:
+                    from langchain_openai import OpenAIEmbeddings
+                    embeddings = OpenAIEmbeddings(model=model)
+                    if self.query_cache is None and int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048")) > 0:
+                        self.query_cache = cache_from_env()
+                    if self.query_cache is not None:
+                        embeddings = CachedQueryEmbeddings(embeddings, model, self.query_cache)
+                    self._embeddings[model] = embeddings
+        return embeddings
+
+    def get_store(self, index_name: str):
+        model = os.environ["OPENAI_EMBEDDINGS_MODEL"]
+        key = (model, index_name)
+        store = self._stores.get(key)
+        if store is not None:
+            with self._lock:
+                self._hits += 1
+            return store
+        embeddings = self.get_embeddings(model)
+        with self._lock:
+            store = self._stores.get(key)
+            if store is None:
+                store_cls, name = vector_store_backend(index_name)
+                store = store_cls(index_name=name, embedding=embeddings)
+                self._stores[key] = store
+                self._constructions += 1
+            else:
+                self._hits += 1
+        return store
+
+    def get_stores(self, index_names: Optional[List[str]] = None) -> List[Any]:
+        if index_names is None:
+            index_names = self.index_names()
+        return [self.get_store(index_name) for index_name in index_names]
+
+    def record_latency(self, index_name: str, seconds: float):
+        with self._lock:
+            entry = self._latency.setdefault(index_name, {"count": 0, "total": 0.0, "max": 0.0})
+            entry["count"] += 1
+            entry["total"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+        for listener in self.latency_listeners:
+            listener(index_name, seconds)
+
+    def search(self, index_name: str, query: str, **kwargs) -> List[Any]:
+        """
+        Runs a retrieval against one index and records how long it took.
+        """
+        store = self.get_store(index_name)
+        start = time.perf_counter()
+        try:
+            return store.as_retriever(**kwargs).invoke(query)
+        finally:
+            self.record_latency(index_name, time.perf_counter() - start)
+
+    async def asearch(self, index_name: str, query: str, **kwargs) -> List[Any]:
+        """
+        Async counterpart of search(), using the store's native ainvoke.
+        """
+        store = self.get_store(index_name)
+        start = time.perf_counter()
+        try:
+            return await store.as_retriever(**kwargs).ainvoke(query)
+        finally:
+            self.record_latency(index_name, time.perf_counter() - start)
+
+    def search_with_score(self, index_name: str, query: str, k: int = 4, **kwargs) -> List[Tuple[Any, float]]:
+        """
+        Runs a similarity search returning (document, score) pairs and records how long it took.
+        """
+        store = self.get_store(index_name)
+        start = time.perf_counter()
+        try:
+            return store.similarity_search_with_score(query, k=k, **kwargs)
+        finally:
+            self.record_latency(index_name, time.perf_counter() - start)
+
+    async def asearch_with_score(self, index_name: str, query: str, k: int = 4, **kwargs) -> List[Tuple[Any, float]]:
+        store = self.get_store(index_name)
+        start = time.perf_counter()
+        try:
+            return await store.asimilarity_search_with_score(query, k=k, **kwargs)
+        finally:
+            self.record_latency(index_name, time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latency = {
+                name: {
+                    "count": entry["count"],
+                    "avg_ms": 1000 * entry["total"] / entry["count"] if entry["count"] else 0.0,
+                    "max_ms": 1000 * entry["max"]
+                }
+                for name, entry in self._latency.items()
+            }
+            return {
+                "hits": self._hits,
+                "constructions": self._constructions,
+                "embeddings_clients": len(self._embeddings),
+                "stores": len(self._stores),
+                "latency": latency,
+                "query_cache": self.query_cache.stats() if self.query_cache is not None else None
+            }
+
+    def clear(self):
+        """
+        Drops every cached handle and resets the counters. Latency listeners stay registered.
+        """
+        with self._lock:
+            self._index_list_raw = None
+            self._index_names = []
+            self._embeddings = {}
+            self._stores = {}
+            self._hits = 0
+            self._constructions = 0
+            self._latency = {}
+
+vdb_registry = VectorStoreRegistry()
+
+def _generation_file() -> str:
+    return os.getenv("INDEX_GENERATION_FILE", ".index_generation.json")
+
+def bump_index_generation(index_name: str):
+    """
+    Records that the content of an index changed. Called by the ingestion scripts after writing
+    to an index so that caches derived from its content (e.g. the semantic answer cache) are dropped.
+    """
+    path = _generation_file()
+    generations = {}
+    if os.path.exists(path):
+        with open(path, 'r') as file:
+            generations = json.load(file)
+    generations[index_name] = generations.get(index_name, 0) + 1
+    with open(path, 'w') as file:
+        json.dump(generations, file)
+
+def index_generation() -> int:
+    """
+    Returns a token that changes every time any index is re-ingested (the generation file's mtime).
+    """
+    try:
+        return os.stat(_generation_file()).st_mtime_ns
+    except FileNotFoundError:
+        return 0